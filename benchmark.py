@@ -1,58 +1,187 @@
-from msms_compression import SpectrumCompressorF32, SpectrumCompressorF32Url, SpectrumCompressorGzip, SpectrumCompressorUrlGzip, SpectrumCompressorF32UrlLzstring
-
-import urllib.parse
-import random
-
-from msms_compression.data_compressor import SpectrumCompressorF32UrlLossy, SpectrumCompressorF32Lossy
-
-
-def generate_random_data(size=500):
-    """ Generate random mz and intensity values for testing """
-    mz_values = []
-    intensity_values = []
-
-    for i in range(size):
-        mz_values.append(random.random() * 2000)
-        intensity_values.append(random.random() * 10_000)
-
-    mz_values.sort()
-
-    return mz_values, intensity_values
+"""
+Throughput / ratio benchmark of every SpectrumCompressor x DataCompressor x Encoder combination.
 
+Spectra are synthetic but peptide like: b/y fragment ladders with isotope peaks plus uniform noise, with log-normal
+intensities. For every combination and spectrum size the benchmark reports compress / decompress spectra/s and MB/s,
+p50 / p99 latencies, compression ratio and the reconstruction error of lossy compressors. Results are written as
+JSON so runs of different versions can be compared.
 
-def calculate_compression_stats(original_data, compressed_data):
-    original_size = len(str(original_data))
-    original_url_size = len(urllib.parse.urlencode({'data': original_data}))
-    compressed_size = len(compressed_data)
-    url_encoded_size = len(urllib.parse.urlencode({'data': compressed_data}))
-    compression_ratio = original_size / compressed_size
-    url_compression_ratio = original_url_size / url_encoded_size
-    return original_size, compressed_size, url_encoded_size, compression_ratio, url_compression_ratio
+    python benchmark.py --sizes 50 200 1000 --spectra 20 --output results.json
+"""
 
-
-def test_compression(strategy, mz_values, intensity_values):
-    print(f"Testing {strategy.__class__.__name__}...")
-    compressed = strategy.compress(mz_values, intensity_values)
-    decompressed_mz, decompressed_intensity = strategy.decompress(compressed)
-
-    original_size, compressed_size, url_encoded_size, compression_ratio, url_compression_ratio = calculate_compression_stats(
-        (mz_values, intensity_values), compressed)
-
-    print(f"Original Size: {original_size} bytes")
-    print(f"Compressed Size: {compressed_size} bytes")
-    print(f"URL Encoded Size: {url_encoded_size} bytes")
-    print(f"Compression Ratio: {compression_ratio:.2f}")
-    print(f"URL Compression Ratio: {url_compression_ratio:.2f}")
-    print(f"compressed spectrum: {compressed}")
-    print()
-
-
-# Generate random data
-mz_values, intensity_values = generate_random_data()
-
-for strategy in [SpectrumCompressorF32(), SpectrumCompressorF32Url(),
-                 SpectrumCompressorGzip(), SpectrumCompressorUrlGzip(),
-                 SpectrumCompressorF32UrlLzstring(), SpectrumCompressorF32UrlLossy(),
-                 SpectrumCompressorF32Lossy()]:
-
-    test_compression(strategy, mz_values, intensity_values)
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+import msms_compression
+from msms_compression import BaseCompressor, SpectrumCompressorF32, SpectrumCompressorF32Lossy, \
+    SpectrumCompressorString, SpectrumCompressorStringLossy, SpectrumCompressorI32, SpectrumCompressorBinary, \
+    SpectrumCompressorBinaryLossy, SpectrumCompressorPpm, SpectrumCompressorI32Binary, SpectrumCompressorBinaryBlocks, \
+    BrotliCompressor, GzipCompressor, SkipCompressor, DictionaryCompressor, B85Encoder, UrlEncoder, LzStringEncoder, \
+    LzStringUriEncoder, train_dictionary
+from msms_compression.encoder import SkipEncoder
+
+# raw size of a peak: float32 m/z + float32 intensity
+RAW_BYTES_PER_PEAK = 8
+
+AMINO_ACID_MASSES = [57.02146, 71.03711, 87.03203, 97.05276, 99.06841, 101.04768, 103.00919, 113.08406, 114.04293,
+                     115.02694, 128.05858, 128.09496, 129.04259, 131.04049, 137.05891, 147.06841, 156.10111,
+                     163.06333, 186.07931]
+PROTON = 1.007276
+WATER = 18.010565
+ISOTOPE_SPACING = 1.003355
+
+
+def generate_spectrum(n_peaks: int, rng: random.Random) -> Tuple[List[float], List[float]]:
+    """Peptide-like spectrum: b/y ions (charge 1 and 2) with isotope envelopes, topped up with noise peaks."""
+    peaks = {}
+    while len(peaks) < n_peaks * 0.6:
+        residues = [rng.choice(AMINO_ACID_MASSES) for _ in range(rng.randint(7, 25))]
+        prefix = np.cumsum(residues)[:-1]
+        suffix = np.cumsum(residues[::-1])[:-1] + WATER
+        for neutral in np.concatenate([prefix, suffix]):
+            for charge in (1, 2):
+                base_intensity = rng.lognormvariate(9, 1.5) / charge
+                for isotope in range(3):
+                    mz = round((neutral + isotope * ISOTOPE_SPACING + charge * PROTON) / charge, 4)
+                    peaks[mz] = round(base_intensity * (0.6 ** isotope), 1)
+    while len(peaks) < n_peaks:
+        peaks[round(rng.uniform(100, 2000), 4)] = round(rng.lognormvariate(6, 1.5), 1)
+
+    mzs = sorted(rng.sample(sorted(peaks), n_peaks))
+    return mzs, [peaks[mz] for mz in mzs]
+
+
+def spectrum_compressors():
+    return [SpectrumCompressorF32(), SpectrumCompressorF32Lossy(2), SpectrumCompressorF32Lossy(3),
+            SpectrumCompressorString(2, 1), SpectrumCompressorStringLossy(2, 1), SpectrumCompressorI32(2, 1),
+            SpectrumCompressorI32(3, 1), SpectrumCompressorI32Binary(2, 1),
+            SpectrumCompressorI32Binary(2, 1, block_size=128), SpectrumCompressorBinary(),
+            SpectrumCompressorBinaryLossy(), SpectrumCompressorBinaryLossy(max_error=0.01), SpectrumCompressorPpm(5),
+            SpectrumCompressorPpm(1), SpectrumCompressorBinaryBlocks()]
+
+
+def data_compressors(spectrum_compressor, training_spectra):
+    samples = [spectrum_compressor.compress(mzs, intensities) for mzs, intensities in training_spectra]
+    return [BrotliCompressor(), GzipCompressor(), SkipCompressor(), DictionaryCompressor(train_dictionary(samples))]
+
+
+def encoders(spectrum_compressor, data_compressor):
+    encoders = [B85Encoder(), UrlEncoder(), LzStringEncoder(), LzStringUriEncoder()]
+    # BaseCompressor decodes the encoder output as UTF-8, without an encoder that only works for uncompressed text
+    if isinstance(data_compressor, SkipCompressor) and not getattr(spectrum_compressor, 'binary', False):
+        encoders.append(SkipEncoder())
+    return encoders
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else float('nan')
+
+
+def reconstruction_error(spectra, decompressed) -> dict:
+    mz_error, intensity_error = [], []
+    for (mzs, intensities), (out_mzs, out_intensities) in zip(spectra, decompressed):
+        if len(mzs) != len(out_mzs) or len(intensities) != len(out_intensities):
+            raise ValueError("Decompressed spectrum has a different number of peaks")
+        # reference values are the float32 inputs, the lossless codecs reproduce them exactly
+        mzs, intensities = np.float32(mzs).astype(np.float64), np.float32(intensities).astype(np.float64)
+        mz_error.append(np.abs(np.asarray(out_mzs, dtype=np.float64) - mzs))
+        intensity_error.append(np.abs(np.asarray(out_intensities, dtype=np.float64) - intensities) / intensities)
+    mz_error, intensity_error = np.concatenate(mz_error), np.concatenate(intensity_error)
+    return {'max_mz_error': float(mz_error.max(initial=0)),
+            'max_intensity_rel_error': float(intensity_error.max(initial=0)),
+            'mean_intensity_rel_error': float(intensity_error.mean()) if len(intensity_error) else 0.0}
+
+
+def run_combination(compressor: BaseCompressor, spectra) -> dict:
+    compress_times, decompress_times, compressed, decompressed = [], [], [], []
+    for mzs, intensities in spectra:
+        start = time.perf_counter()
+        s = compressor.compress(mzs, intensities)
+        compress_times.append(time.perf_counter() - start)
+        compressed.append(s)
+
+    for s in compressed:
+        start = time.perf_counter()
+        decompressed.append(compressor.decompress(s))
+        decompress_times.append(time.perf_counter() - start)
+
+    raw_bytes = sum(len(mzs) for mzs, _ in spectra) * RAW_BYTES_PER_PEAK
+    compressed_bytes = sum(len(s) for s in compressed)
+    compress_total, decompress_total = sum(compress_times), sum(decompress_times)
+    return {
+        'compressed_bytes_mean': compressed_bytes / len(spectra),
+        'ratio': raw_bytes / compressed_bytes,
+        'compress_spectra_per_s': len(spectra) / compress_total,
+        'decompress_spectra_per_s': len(spectra) / decompress_total,
+        'compress_mb_per_s': raw_bytes / compress_total / 1e6,
+        'decompress_mb_per_s': raw_bytes / decompress_total / 1e6,
+        'compress_p50_ms': percentile(compress_times, 50) * 1e3,
+        'compress_p99_ms': percentile(compress_times, 99) * 1e3,
+        'decompress_p50_ms': percentile(decompress_times, 50) * 1e3,
+        'decompress_p99_ms': percentile(decompress_times, 99) * 1e3,
+        **reconstruction_error(spectra, decompressed),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 1000], help='peaks per spectrum')
+    parser.add_argument('--spectra', type=int, default=20, help='spectra per size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--filter', default='', help='only run combinations whose name contains this string')
+    parser.add_argument('--output', default='-', help='JSON output file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    datasets = {size: [generate_spectrum(size, rng) for _ in range(args.spectra)] for size in args.sizes}
+    training_spectra = [generate_spectrum(rng.choice(args.sizes), rng) for _ in range(50)]
+
+    results = []
+    print(f"{'combination':<80}{'peaks':>6}{'ratio':>8}{'comp/s':>9}{'decomp/s':>10}{'p99 ms':>8}", file=sys.stderr)
+    for spectrum_compressor in spectrum_compressors():
+        for data_compressor in data_compressors(spectrum_compressor, training_spectra):
+            for encoder in encoders(spectrum_compressor, data_compressor):
+                compressor = BaseCompressor(spectrum_compressor, data_compressor, encoder)
+                name = str(compressor)
+                if args.filter not in name:
+                    continue
+                for size, spectra in datasets.items():
+                    result = {'compressor': name, 'spectrum_compressor': str(spectrum_compressor),
+                              'data_compressor': str(data_compressor), 'encoder': str(encoder), 'peaks': size}
+                    try:
+                        result.update(run_combination(compressor, spectra))
+                    except Exception as e:
+                        result['error'] = f'{type(e).__name__}: {e}'
+                        print(f"{name:<80}{size:>6}  error: {type(e).__name__}", file=sys.stderr)
+                    else:
+                        print(f"{name:<80}{size:>6}{result['ratio']:>8.2f}{result['compress_spectra_per_s']:>9.0f}"
+                              f"{result['decompress_spectra_per_s']:>10.0f}{result['compress_p99_ms']:>8.2f}",
+                              file=sys.stderr)
+                    results.append(result)
+
+    report = {
+        'version': msms_compression.__version__,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'sizes': args.sizes, 'spectra': args.spectra, 'seed': args.seed,
+                   'raw_bytes_per_peak': RAW_BYTES_PER_PEAK},
+        'results': results,
+    }
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
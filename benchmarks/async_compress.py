@@ -0,0 +1,67 @@
+"""
+Throughput of BaseCompressor.acompress_many / adecompress_many against the synchronous path.
+
+"sync" compresses one spectrum after the other. "async" runs acompress_many, which keeps the spectrum encoding on the
+event loop and overlaps the data compression stages on the shared thread pool; it only pays off with more than one
+core and a data compressor that releases the GIL (brotli, gzip, zlib).
+
+    python benchmarks/async_compress.py --spectra 500 --peaks 1000 --limits 1 4 16
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from msms_compression import BaseCompressor, SpectrumCompressorF32, SpectrumCompressorBinary, BrotliCompressor, \
+    GzipCompressor, B85Encoder
+from msms_compression.aio import data_executor
+
+
+def random_spectrum(n_peaks):
+    mzs = sorted(round(random.uniform(100, 2000), 4) for _ in range(n_peaks))
+    return mzs, [round(random.lognormvariate(8, 2), 1) for _ in range(n_peaks)]
+
+
+def bench_sync(compressor, spectra):
+    start = time.perf_counter()
+    compressed = [compressor.compress(mzs, intensities) for mzs, intensities in spectra]
+    compress_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for s in compressed:
+        compressor.decompress(s)
+    return compress_time, time.perf_counter() - start
+
+
+async def bench_async(compressor, spectra, limit):
+    start = time.perf_counter()
+    compressed = await compressor.acompress_many(spectra, limit)
+    compress_time = time.perf_counter() - start
+    start = time.perf_counter()
+    await compressor.adecompress_many(compressed, limit)
+    return compress_time, time.perf_counter() - start
+
+
+def main(args):
+    random.seed(0)
+    spectra = [random_spectrum(args.peaks) for _ in range(args.spectra)]
+    pipelines = [BaseCompressor(SpectrumCompressorF32(), BrotliCompressor(), B85Encoder()),
+                 BaseCompressor(SpectrumCompressorBinary(), BrotliCompressor(), B85Encoder()),
+                 BaseCompressor(SpectrumCompressorBinary(), GzipCompressor(), B85Encoder())]
+    print(f"cpus: {os.cpu_count()}, pool threads: {data_executor()._max_workers}")
+    print(f"{'pipeline':<55}{'mode':<12}{'compress/s':>12}{'decompress/s':>14}")
+    for compressor in pipelines:
+        runs = [('sync', bench_sync(compressor, spectra))]
+        runs += [(f'async({limit})', asyncio.run(bench_async(compressor, spectra, limit))) for limit in args.limits]
+        for mode, (compress_time, decompress_time) in runs:
+            print(f"{str(compressor):<55}{mode:<12}{len(spectra) / compress_time:>12.0f}"
+                  f"{len(spectra) / decompress_time:>14.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spectra', type=int, default=500)
+    parser.add_argument('--peaks', type=int, default=1000)
+    parser.add_argument('--limits', type=int, nargs='+', default=[1, 4, 16])
+    main(parser.parse_args())
@@ -0,0 +1,67 @@
+"""
+Size and throughput of SpectrumCompressorBinary vs SpectrumCompressorF32 for every DataCompressor / Encoder pair.
+
+    python benchmarks/binary_codec.py --peaks 500 --spectra 200
+"""
+
+import argparse
+import random
+import time
+
+from msms_compression import BaseCompressor, SpectrumCompressorF32, SpectrumCompressorBinary, BrotliCompressor, \
+    GzipCompressor, SkipCompressor, B85Encoder, UrlEncoder, LzStringEncoder, LzStringUriEncoder
+from msms_compression.encoder import SkipEncoder
+
+
+def generate_spectra(n_spectra, n_peaks):
+    spectra = []
+    for _ in range(n_spectra):
+        mzs = sorted(round(random.uniform(100, 2000), 4) for _ in range(n_peaks))
+        intensities = [round(random.lognormvariate(8, 1.5), 1) for _ in range(n_peaks)]
+        spectra.append((mzs, intensities))
+    return spectra
+
+
+def run(compressor, spectra):
+    start = time.perf_counter()
+    compressed = [compressor.compress(mzs, intensities) for mzs, intensities in spectra]
+    compress_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for s in compressed:
+        compressor.decompress(s)
+    decompress_time = time.perf_counter() - start
+
+    size = sum(len(s) for s in compressed) / len(compressed)
+    return size, len(spectra) / compress_time, len(spectra) / decompress_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peaks', type=int, default=500)
+    parser.add_argument('--spectra', type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    spectra = generate_spectra(args.spectra, args.peaks)
+
+    print(f"{'spectrum':<28}{'data':<20}{'encoder':<22}{'avg size':>10}{'comp/s':>10}{'decomp/s':>10}")
+    for data_compressor in (BrotliCompressor(), GzipCompressor(), SkipCompressor()):
+        for encoder in (B85Encoder(), UrlEncoder(), SkipEncoder(), LzStringEncoder(), LzStringUriEncoder()):
+            for spectrum_compressor in (SpectrumCompressorF32(), SpectrumCompressorBinary()):
+                # the output is decoded as UTF-8, without an encoder that only works for uncompressed text
+                if isinstance(encoder, SkipEncoder) and (spectrum_compressor.binary or
+                                                         not isinstance(data_compressor, SkipCompressor)):
+                    continue
+                compressor = BaseCompressor(spectrum_compressor, data_compressor, encoder)
+                prefix = f"{str(spectrum_compressor):<28}{str(data_compressor):<20}{str(encoder):<22}"
+                try:
+                    size, compress_rate, decompress_rate = run(compressor, spectra)
+                except Exception as e:
+                    print(f"{prefix}error: {type(e).__name__}")
+                    continue
+                print(f"{prefix}{size:>10.0f}{compress_rate:>10.0f}{decompress_rate:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
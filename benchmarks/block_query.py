@@ -0,0 +1,64 @@
+"""
+m/z window queries on SpectrumCompressorBinaryBlocks against decoding the whole spectrum and filtering.
+
+Times the spectrum compressor stage only (the data compressor and encoder always process the whole payload) and
+reports the share of peak blocks a query decodes.
+
+    python benchmarks/block_query.py --peaks 1000 5000 --block-sizes 32 64 128 --window 126 135
+"""
+
+import argparse
+import random
+import timeit
+
+import numpy as np
+
+from msms_compression import SpectrumCompressorBinary, SpectrumCompressorBinaryBlocks
+
+
+def random_spectrum(n_peaks):
+    mzs = np.sort(np.random.uniform(100, 2000, n_peaks))
+    return mzs, np.random.lognormal(8, 2, n_peaks)
+
+
+def main(args):
+    np.random.seed(0)
+    random.seed(0)
+    lo, hi = args.window
+    print(f"window {lo}-{hi}")
+    print(f"{'peaks':>7}{'codec':>42}{'full ms':>10}{'query ms':>10}{'blocks read':>13}")
+    for n_peaks in args.peaks:
+        mzs, intensities = random_spectrum(n_peaks)
+        binary = SpectrumCompressorBinary()
+        b = binary.compress(mzs, intensities)
+
+        def full():
+            decoded_mzs, decoded_intensities = binary.decompress(b, as_numpy=True)
+            mask = (decoded_mzs >= lo) & (decoded_mzs <= hi)
+            return decoded_mzs[mask], decoded_intensities[mask]
+
+        full_time = min(timeit.repeat(full, number=args.number, repeat=3)) / args.number
+        print(f"{n_peaks:>7}{str(binary):>42}{full_time * 1e3:>10.3f}{'':>10}{'100%':>13}")
+
+        for block_size in args.block_sizes:
+            blocks = SpectrumCompressorBinaryBlocks(block_size)
+            b_blocks = blocks.compress(mzs, intensities)
+            query_time = min(timeit.repeat(lambda: blocks.query(b_blocks, lo, hi, as_numpy=True),
+                                           number=args.number, repeat=3)) / args.number
+            full_blocks_time = min(timeit.repeat(lambda: blocks.decompress(b_blocks, as_numpy=True),
+                                                 number=args.number, repeat=3)) / args.number
+            _, _, index, _ = blocks._index(b_blocks)
+            first = max(int(np.searchsorted(index['mz'], lo, side='left')) - 1, 0)
+            last = int(np.searchsorted(index['mz'], hi, side='right')) - 1
+            share = max(last - first + 1, 0) / len(index)
+            print(f"{n_peaks:>7}{str(blocks):>42}{full_blocks_time * 1e3:>10.3f}{query_time * 1e3:>10.3f}"
+                  f"{share:>13.1%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peaks', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--block-sizes', type=int, nargs='+', default=[32, 64, 128])
+    parser.add_argument('--window', type=float, nargs=2, default=[126.0, 135.0])
+    parser.add_argument('--number', type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,64 @@
+"""
+BaseCompressor.compress_bytes / decompress_bytes against compress / decompress: time per call, plus the peak traced
+memory and the number of allocations still alive at that peak (tracemalloc) for one call.
+
+compress builds the spectrum payload as a str, encodes it to bytes, runs the data compressor and encoder and decodes
+the result to a str again. compress_bytes has the spectrum compressor write into a reusable per-thread buffer and
+returns the encoder output as bytes.
+
+    python benchmarks/bytes_pipeline.py --peaks 100 1000 10000
+"""
+
+import argparse
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from msms_compression import SpectrumCompressorB85, SpectrumCompressorBinaryB85, SpectrumCompressorUrl
+
+
+def random_spectrum(n_peaks):
+    mzs = np.sort(np.random.uniform(100, 2000, n_peaks)).astype(np.float32)
+    return mzs, np.random.lognormal(8, 2, n_peaks).astype(np.float32)
+
+
+def traced(f):
+    """Peak traced bytes and the number of traced blocks alive at the end of one call of ``f``."""
+    f()  # warm up, so the reusable buffer and lazily built state don't count
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    f()
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+    return peak, blocks
+
+
+def main(args):
+    np.random.seed(0)
+    pipelines = [('f32 b85', SpectrumCompressorB85), ('f32 url', SpectrumCompressorUrl),
+                 ('binary b85', SpectrumCompressorBinaryB85)]
+    print(f"{'peaks':>7}{'pipeline':>12}{'call':>20}{'ms':>9}{'peak KiB':>11}{'blocks':>8}")
+    for n_peaks in args.peaks:
+        mzs, intensities = random_spectrum(n_peaks)
+        for name, compressor in pipelines:
+            if compressor.compress_bytes(mzs, intensities) != compressor.compress(mzs, intensities).encode('utf-8'):
+                raise AssertionError(f"compress_bytes output differs from compress for {name}")
+            s = compressor.compress(mzs, intensities)
+            b = s.encode('utf-8')
+            calls = [('compress', lambda: compressor.compress(mzs, intensities)),
+                     ('compress_bytes', lambda: compressor.compress_bytes(mzs, intensities)),
+                     ('decompress', lambda: compressor.decompress(s, as_numpy=True)),
+                     ('decompress_bytes', lambda: compressor.decompress_bytes(b, as_numpy=True))]
+            for call, f in calls:
+                t = min(timeit.repeat(f, number=args.number, repeat=3)) / args.number
+                peak, blocks = traced(f)
+                print(f"{n_peaks:>7}{name:>12}{call:>20}{t * 1e3:>9.3f}{peak / 1024:>11.1f}{blocks:>8}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peaks', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--number', type=int, default=50)
+    main(parser.parse_args())
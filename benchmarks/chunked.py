@@ -0,0 +1,59 @@
+"""
+ChunkedCompressor against the unchunked pipeline on very large spectra: compress / decompress wall time and size per
+chunk size and thread count. Also checks both decompress to the same peaks.
+
+Speedups need as many cores as threads; on a single core the chunked pipeline only shows its overhead.
+
+    python benchmarks/chunked.py --peaks 200000 --chunk-sizes 16384 65536 --workers 1 4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from msms_compression import ChunkedCompressor, SpectrumCompressorB85, SpectrumCompressorBinaryB85
+
+
+def random_spectrum(n_peaks):
+    mzs = np.sort(np.random.uniform(100, 2000, n_peaks))
+    return mzs, np.random.lognormal(8, 2, n_peaks)
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - start
+
+
+def main(args):
+    np.random.seed(0)
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'peaks':>8}{'pipeline':>60}{'chunk':>8}{'threads':>9}{'compress s':>12}{'decompress s':>14}{'KiB':>9}")
+    for n_peaks in args.peaks:
+        mzs, intensities = random_spectrum(n_peaks)
+        for compressor in (SpectrumCompressorB85, SpectrumCompressorBinaryB85):
+            s, compress_time = timed(lambda: compressor.compress(mzs, intensities))
+            expected, decompress_time = timed(lambda: compressor.decompress(s, as_numpy=True))
+            print(f"{n_peaks:>8}{str(compressor):>60}{'-':>8}{'-':>9}{compress_time:>12.3f}{decompress_time:>14.3f}"
+                  f"{len(s) / 1024:>9.0f}")
+            for chunk_size in args.chunk_sizes:
+                for workers in args.workers:
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        chunked = ChunkedCompressor(compressor, chunk_size, executor)
+                        s, compress_time = timed(lambda: chunked.compress(mzs, intensities))
+                        actual, decompress_time = timed(lambda: chunked.decompress(s, as_numpy=True))
+                    if not all(np.array_equal(e, a) for e, a in zip(expected, actual)):
+                        raise AssertionError(f"{chunked} decompresses to different peaks")
+                    print(f"{n_peaks:>8}{str(compressor):>60}{chunk_size:>8}{workers:>9}{compress_time:>12.3f}"
+                          f"{decompress_time:>14.3f}{len(s) / 1024:>9.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peaks', type=int, nargs='+', default=[200000])
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[16384, 65536])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    main(parser.parse_args())
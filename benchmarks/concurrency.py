@@ -0,0 +1,88 @@
+"""
+Latency of GET /retrieve while /store requests compress spectra concurrently, for each executor mode of main.py.
+
+With the "inline" mode compression runs on the event loop and every /retrieve waits behind it; with the thread or
+process executor the reads stay fast.
+
+    python benchmarks/concurrency.py --modes inline thread process --writers 8 --seconds 5
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def random_spectrum(n_peaks):
+    return {'mzs': [random.uniform(100, 2000) for _ in range(n_peaks)],
+            'intensities': [random.uniform(1, 10_000) for _ in range(n_peaks)]}
+
+
+async def writer(client, spectra, stop, counts):
+    while not stop.is_set():
+        response = await client.post('/store', json=random.choice(spectra))
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+async def reader(client, keys, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(f'/retrieve/{random.choice(keys)}')
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.001)
+
+
+async def run_mode(app_module, mode, args):
+    app_module.offload = app_module.CompressionExecutor(mode, args.workers, args.queue_size)
+    app_module.response_cache = app_module.ResponseCache(app_module.CACHE_BYTES)
+    await app_module.startup_event()
+    try:
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            spectra = [random_spectrum(args.peaks) for _ in range(20)]
+            keys = [(await client.post('/store', json=s)).json()['key'] for s in spectra]
+
+            stop = asyncio.Event()
+            counts, latencies = {}, []
+            tasks = [asyncio.create_task(writer(client, spectra, stop, counts)) for _ in range(args.writers)]
+            tasks.append(asyncio.create_task(reader(client, keys, stop, latencies)))
+            await asyncio.sleep(args.seconds)
+            stop.set()
+            await asyncio.gather(*tasks)
+    finally:
+        await app_module.shutdown_event()
+
+    latencies.sort()
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    stores = sum(counts.values())
+    print(f"{mode:<10}{len(latencies):>10}{statistics.median(latencies) * 1e3:>10.2f}{p99 * 1e3:>10.2f}"
+          f"{stores / args.seconds:>10.1f}{counts.get(503, 0):>8}")
+
+
+async def main(args):
+    os.environ['MSMS_DB_FILE'] = os.path.join(tempfile.mkdtemp(), 'spectra.db')
+    import main as app_module
+
+    random.seed(0)
+    print(f"{'mode':<10}{'reads':>10}{'p50 ms':>10}{'p99 ms':>10}{'stores/s':>10}{'503s':>8}")
+    for mode in args.modes:
+        await run_mode(app_module, mode, args)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=['inline', 'thread', 'process'])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--peaks', type=int, default=1000)
+    parser.add_argument('--seconds', type=float, default=5)
+    asyncio.run(main(parser.parse_args()))
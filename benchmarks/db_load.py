@@ -0,0 +1,112 @@
+"""
+Load test of the storage endpoints in main.py against a local SQLite file.
+
+Compares the old connection-per-request store (SELECT + INSERT + commit per row) with the pooled WAL database, then
+drives /store, /store/batch and /retrieve through the ASGI app with concurrent clients.
+
+    python benchmarks/db_load.py --requests 500 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import aiosqlite
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def random_spectrum(n_peaks=200):
+    return {'mzs': [random.uniform(100, 2000) for _ in range(n_peaks)],
+            'intensities': [random.uniform(1, 10_000) for _ in range(n_peaks)]}
+
+
+async def legacy_store(db_file, key, compressed_data):
+    async with aiosqlite.connect(db_file) as db:
+        async with db.execute("SELECT 1 FROM spectra WHERE id = ?", (key,)) as cursor:
+            if await cursor.fetchone() is None:
+                await db.execute("INSERT INTO spectra (id, compressed_data) VALUES (?, ?)", (key, compressed_data))
+                await db.commit()
+
+
+async def gather_limited(coroutines, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run(coroutine):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await coroutine
+            latencies.append(time.perf_counter() - start)
+            return result
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run(c) for c in coroutines))
+    return results, time.perf_counter() - start, latencies
+
+
+def report(name, n, elapsed, latencies=None):
+    line = f"{name:<34}{n / elapsed:>10.0f} /s"
+    if latencies:
+        latencies = sorted(latencies)
+        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+        line += f"   p50 {statistics.median(latencies) * 1e3:7.2f} ms   p99 {p99 * 1e3:7.2f} ms"
+    print(line)
+
+
+async def main(args):
+    tmp = tempfile.mkdtemp()
+    os.environ['MSMS_DB_FILE'] = os.path.join(tmp, 'spectra.db')
+    import main as app_module
+
+    random.seed(0)
+    spectra = [random_spectrum() for _ in range(args.requests)]
+    compressed = [app_module.compressor.compress(*app_module.sort_spectrum(app_module.SpectrumData(**s)))
+                  for s in spectra]
+    rows = [(app_module.spectrum_key(c), c) for c in compressed]
+
+    # raw storage: connection per request vs pooled writer
+    legacy_file = os.path.join(tmp, 'legacy.db')
+    async with aiosqlite.connect(legacy_file) as db:
+        await db.execute("CREATE TABLE spectra (id TEXT PRIMARY KEY, compressed_data TEXT NOT NULL)")
+        await db.commit()
+    _, elapsed, latencies = await gather_limited((legacy_store(legacy_file, *row) for row in rows), args.concurrency)
+    report('legacy connect-per-request', len(rows), elapsed, latencies)
+
+    await app_module.startup_event()
+    try:
+        _, elapsed, latencies = await gather_limited((app_module.db.insert_many([row]) for row in rows),
+                                                     args.concurrency)
+        report('pooled insert per row', len(rows), elapsed, latencies)
+
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            responses, elapsed, latencies = await gather_limited(
+                (client.post('/store', json=s) for s in spectra), args.concurrency)
+            report('POST /store', len(spectra), elapsed, latencies)
+            keys = [r.json()['key'] for r in responses]
+
+            start = time.perf_counter()
+            for i in range(0, len(spectra), args.batch_size):
+                await client.post('/store/batch', json={'spectra': spectra[i:i + args.batch_size]})
+            report(f'POST /store/batch ({args.batch_size})', len(spectra), time.perf_counter() - start)
+
+            _, elapsed, latencies = await gather_limited((client.get(f'/retrieve/{key}') for key in keys),
+                                                         args.concurrency)
+            report('GET /retrieve', len(keys), elapsed, latencies)
+    finally:
+        await app_module.shutdown_event()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,60 @@
+"""
+Decode time vs spectrum size for the streaming decoders in msms_compression.utils.
+
+With offset based decoding the time per peak should stay flat from 100 to 1M peaks.
+
+    python benchmarks/decode_scaling.py
+"""
+
+import argparse
+import random
+import time
+
+from msms_compression import utils, np_utils
+
+
+def generate_spectrum(size):
+    mzs = sorted(random.uniform(100, 2000) for _ in range(size))
+    intensities = [random.uniform(1, 10_000) for _ in range(size)]
+    return mzs, intensities
+
+
+def time_decode(func, s, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in func(s):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+    decoders = [
+        ('delta_decode_single_string_float', utils.delta_decode_single_string_float, 'mz'),
+        ('hex_decode', utils.hex_decode, 'intensity'),
+        ('hex_decode_lossy', utils.hex_decode_lossy, 'lossy'),
+        ('np_utils.delta_decode_single_string_float', np_utils.delta_decode_single_string_float, 'mz'),
+    ]
+
+    print(f"{'decoder':<45}{'peaks':>10}{'seconds':>12}{'ns/peak':>10}")
+    for size in args.sizes:
+        mzs, intensities = generate_spectrum(size)
+        encoded = {
+            'mz': np_utils.delta_encode_single_string_float(mzs),
+            'intensity': np_utils.hex_encode(intensities),
+            'lossy': utils.hex_encode_lossy(intensities),
+        }
+        for name, func, kind in decoders:
+            seconds = time_decode(func, encoded[kind], args.repeats)
+            print(f"{name:<45}{size:>10}{seconds:>12.4f}{seconds / size * 1e9:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
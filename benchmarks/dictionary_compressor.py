@@ -0,0 +1,57 @@
+"""
+Ratio and speed of DictionaryCompressor vs BrotliCompressor / GzipCompressor on short (URL sized) spectra.
+
+A dictionary is trained on one set of spectra and evaluated on another.
+
+    python benchmarks/dictionary_compressor.py --peaks 10 60
+"""
+
+import argparse
+import random
+import time
+
+from msms_compression import SpectrumCompressorF32, SpectrumCompressorF32Lossy, SpectrumCompressorI32, \
+    BrotliCompressor, GzipCompressor, DictionaryCompressor, UrlEncoder, train_dictionary
+
+
+def generate_spectrum(min_peaks, max_peaks):
+    n_peaks = random.randint(min_peaks, max_peaks)
+    mzs = sorted(round(random.uniform(100, 2000), 4) for _ in range(n_peaks))
+    intensities = [round(random.lognormvariate(8, 1.5), 1) for _ in range(n_peaks)]
+    return mzs, intensities
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peaks', type=int, nargs=2, default=[10, 60], metavar=('MIN', 'MAX'))
+    parser.add_argument('--train', type=int, default=1000)
+    parser.add_argument('--test', type=int, default=500)
+    parser.add_argument('--dictionary-size', type=int, default=4096)
+    args = parser.parse_args()
+
+    random.seed(0)
+    url_encoder = UrlEncoder()
+    print(f"{'spectrum':<32}{'data':<34}{'bytes':>8}{'url chars':>10}{'comp us':>9}{'decomp us':>10}")
+    for spectrum_compressor in (SpectrumCompressorF32(), SpectrumCompressorF32Lossy(2), SpectrumCompressorI32()):
+        train = [spectrum_compressor.compress(*generate_spectrum(*args.peaks)) for _ in range(args.train)]
+        test = [spectrum_compressor.compress(*generate_spectrum(*args.peaks)).encode() for _ in range(args.test)]
+        dictionary = train_dictionary(train, size=args.dictionary_size)
+
+        for data_compressor in (BrotliCompressor(), GzipCompressor(), DictionaryCompressor(dictionary)):
+            start = time.perf_counter()
+            compressed = [data_compressor.compress(b) for b in test]
+            compress_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for b in compressed:
+                data_compressor.decompress(b)
+            decompress_time = time.perf_counter() - start
+
+            size = sum(len(b) for b in compressed) / len(test)
+            url_size = sum(len(url_encoder.encode(b)) for b in compressed) / len(test)
+            print(f"{str(spectrum_compressor):<32}{str(data_compressor):<34}{size:>8.1f}{url_size:>10.1f}"
+                  f"{compress_time / len(test) * 1e6:>9.1f}{decompress_time / len(test) * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compression ratio and random access cost of FrameCompressor against compressing spectra one by one.
+
+Spectra are drawn from a simulated run: every scan is one of a pool of precursor "templates" (a peptide-like peak
+list) with some peaks dropped, intensities jittered and noise peaks added, so neighbouring scans share fragments the
+way repeated MS2 scans of abundant precursors do.
+
+    python benchmarks/frames.py --spectra 512 --templates 64 --frame-sizes 1 4 16 64
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from msms_compression import BaseCompressor, FrameCompressor, SpectrumCompressorF32, SpectrumCompressorBinary, \
+    BrotliCompressor, GzipCompressor, B85Encoder
+
+
+def template(rng, n_peaks):
+    mzs = np.round(rng.uniform(100, 2000, n_peaks), 4)
+    return mzs, np.round(rng.lognormal(8, 2, n_peaks), 1)
+
+
+def scan(rng, mzs, intensities, noise):
+    keep = rng.random(len(mzs)) > 0.2
+    noise_mzs = np.round(rng.uniform(100, 2000, noise), 4)
+    all_mzs = np.concatenate([mzs[keep], noise_mzs])
+    all_intensities = np.concatenate([np.round(intensities[keep] * rng.uniform(0.8, 1.2, keep.sum()), 1),
+                                      np.round(rng.lognormal(5, 1, noise), 1)])
+    order = np.argsort(all_mzs)
+    return all_mzs[order].tolist(), all_intensities[order].tolist()
+
+
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    random.seed(args.seed)
+    templates = [template(rng, args.peaks) for _ in range(args.templates)]
+    spectra = [scan(rng, *templates[rng.integers(len(templates))], args.peaks // 5) for _ in range(args.spectra)]
+    pipelines = [BaseCompressor(SpectrumCompressorF32(), BrotliCompressor(), B85Encoder()),
+                 BaseCompressor(SpectrumCompressorBinary(), BrotliCompressor(), B85Encoder()),
+                 BaseCompressor(SpectrumCompressorBinary(), GzipCompressor(), B85Encoder())]
+
+    print(f"{'pipeline':<52}{'frame':>6}{'chars/spectrum':>16}{'ratio gain':>12}{'get ms':>9}")
+    for compressor in pipelines:
+        single = sum(len(compressor.compress(mzs, intensities)) for mzs, intensities in spectra)
+        for frame_size in args.frame_sizes:
+            frames = FrameCompressor(compressor, frame_size)
+            compressed = frames.compress(spectra)
+            size = sum(len(frame) for frame in compressed)
+
+            # random access: every lookup lands in a different frame than the last one
+            indexes = random.sample(range(len(spectra)), min(200, len(spectra)))
+            start = time.perf_counter()
+            for i in indexes:
+                frames._last = None
+                frames.get_spectrum(compressed, i)
+            get_time = (time.perf_counter() - start) / len(indexes)
+            print(f"{str(compressor):<52}{frame_size:>6}{size / len(spectra):>16.0f}{single / size:>12.2f}"
+                  f"{get_time * 1e3:>9.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spectra', type=int, default=512)
+    parser.add_argument('--templates', type=int, default=64)
+    parser.add_argument('--peaks', type=int, default=300)
+    parser.add_argument('--frame-sizes', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--seed', type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,59 @@
+"""
+Integer codecs for the m/z deltas of SpectrumCompressorI32: the hex nibble string (delta_encode_single_string_int)
+against LEB128 varints and frame-of-reference bit packing, raw and after brotli, with encode / decode times.
+
+    python benchmarks/int_packing.py --peaks 200 1000 5000 --precisions 2 3 4
+"""
+
+import argparse
+import timeit
+
+import brotli
+import numpy as np
+
+from msms_compression.np_utils import delta_encode_single_string_int, delta_decode_single_string_int, \
+    varint_encode, varint_decode, for_encode, for_decode
+
+
+def codecs(block_sizes):
+    yield 'hex', lambda ints: delta_encode_single_string_int(ints).encode('ascii'), \
+        lambda b, n: delta_decode_single_string_int(b.decode('ascii'))
+
+    def delta(ints):
+        return np.diff(ints, prepend=0).astype(np.uint32)
+
+    yield 'varint', lambda ints: varint_encode(delta(ints)), \
+        lambda b, n: np.cumsum(varint_decode(b, n)[0], dtype=np.uint32)
+    for block_size in block_sizes:
+        # the first value is stored apart so it doesn't widen the first frame, as in SpectrumCompressorI32Binary
+        yield f'for{block_size}', \
+            lambda ints, bs=block_size: varint_encode(ints[:1]) + for_encode(np.diff(ints).astype(np.uint32), bs), \
+            lambda b, n, bs=block_size: np.cumsum(np.concatenate(
+                [varint_decode(b, 1)[0], for_decode(b, n - 1, varint_decode(b, 1)[1], bs)[0]]), dtype=np.uint32)
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    print(f"{'peaks':>6}{'prec':>5}{'codec':>9}{'bytes':>8}{'brotli':>8}{'encode us':>11}{'decode us':>11}")
+    for n_peaks in args.peaks:
+        mzs = np.sort(rng.uniform(100, 2000, n_peaks))
+        for precision in args.precisions:
+            ints = np.rint(mzs * 10 ** precision).astype(np.int64)
+            for name, encode, decode in codecs(args.block_sizes):
+                b = encode(ints)
+                if not np.array_equal(decode(b, len(ints)), ints):
+                    raise AssertionError(f"{name} doesn't round trip")
+                encode_time = min(timeit.repeat(lambda: encode(ints), number=args.number, repeat=3)) / args.number
+                decode_time = min(timeit.repeat(lambda: decode(b, len(ints)), number=args.number,
+                                                repeat=3)) / args.number
+                print(f"{n_peaks:>6}{precision:>5}{name:>9}{len(b):>8}{len(brotli.compress(b)):>8}"
+                      f"{encode_time * 1e6:>11.1f}{decode_time * 1e6:>11.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peaks', type=int, nargs='+', default=[200, 1000, 5000])
+    parser.add_argument('--precisions', type=int, nargs='+', default=[2, 3, 4])
+    parser.add_argument('--block-sizes', type=int, nargs='+', default=[32, 128])
+    parser.add_argument('--number', type=int, default=100)
+    main(parser.parse_args())
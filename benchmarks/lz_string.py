@@ -0,0 +1,51 @@
+"""
+msms_compression.lz_string against the pure-python ``lzstring`` package (pip install lzstring), on the JSON text
+payloads of SpectrumCompressorF32 that SpectrumCompressorF32LzstringUri encodes. Also checks both produce the same
+output.
+
+    python benchmarks/lz_string.py --peaks 100 1000 5000
+"""
+
+import argparse
+import random
+import timeit
+
+from msms_compression import SpectrumCompressorF32, lz_string
+
+try:
+    import lzstring
+except ImportError:
+    lzstring = None
+
+
+def main(args):
+    random.seed(0)
+    reference = lzstring.LZString() if lzstring is not None else None
+    if reference is None:
+        print("lzstring isn't installed, only timing msms_compression.lz_string")
+    print(f"{'peaks':>6}{'chars':>8}{'impl':>14}{'compress ms':>13}{'decompress ms':>15}")
+    for n_peaks in args.peaks:
+        mzs = sorted(random.uniform(100, 2000) for _ in range(n_peaks))
+        intensities = [random.lognormvariate(8, 2) for _ in range(n_peaks)]
+        s = SpectrumCompressorF32().compress(mzs, intensities)
+        compressed = lz_string.compress_to_encoded_uri_component(s)
+
+        impls = [('lz_string', lz_string.compress_to_encoded_uri_component,
+                  lz_string.decompress_from_encoded_uri_component)]
+        if reference is not None:
+            if reference.compressToEncodedURIComponent(s) != compressed:
+                raise AssertionError("lz_string output differs from lzstring")
+            impls.append(('lzstring', reference.compressToEncodedURIComponent,
+                          reference.decompressFromEncodedURIComponent))
+        for name, compress, decompress in impls:
+            compress_time = min(timeit.repeat(lambda: compress(s), number=args.number, repeat=3)) / args.number
+            decompress_time = min(timeit.repeat(lambda: decompress(compressed), number=args.number,
+                                                repeat=3)) / args.number
+            print(f"{n_peaks:>6}{len(s):>8}{name:>14}{compress_time * 1e3:>13.2f}{decompress_time * 1e3:>15.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peaks', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--number', type=int, default=5)
+    main(parser.parse_args())
@@ -1,52 +1,429 @@
+import asyncio
 import hashlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import cached_property
 
 import aiosqlite
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from mangum import Mangum
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, model_validator
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-# Import your compression strategies
-from msms_compression import SpectrumCompressorB85, SpectrumCompressorUrl
+# Import your compression strategies. msms_compression loads its codecs (and numpy, brotli) on first use, the
+# pipelines below are only built by the first request that needs them to keep Lambda cold starts short.
+import msms_compression
+from msms_compression import BaseCompressor
+from msms_compression.instrumentation import PrometheusSink
 
 app = FastAPI()
 
 
-class SpectrumData(BaseModel):
+class SpectrumPeaks(BaseModel):
+    # a spectrum of a batch, mismatched lengths are reported for the item by check_lengths
     mzs: List[float]
     intensities: List[float]
 
 
+def check_lengths(data: SpectrumPeaks):
+    # sort_spectrum would otherwise silently drop the unmatched peaks
+    if len(data.mzs) != len(data.intensities):
+        raise ValueError(f"Got {len(data.mzs)} mzs and {len(data.intensities)} intensities")
+
+
+class SpectrumData(SpectrumPeaks):
+    @model_validator(mode="after")
+    def check_lengths(self):
+        # single spectrum endpoints reject mismatched lengths with a 422
+        check_lengths(self)
+        return self
+
+
 class CompressedData(BaseModel):
     compressed_data: str
 
 
-compressor = SpectrumCompressorB85
-compressor_url = SpectrumCompressorUrl
+class BatchSpectrumData(BaseModel):
+    spectra: List[SpectrumPeaks]
+
+
+# Per-stage timings / sizes of the pipelines below, served on /metrics. With MSMS_EXECUTOR=process the offloaded
+# calls run in worker processes and are not reported.
+METRICS = os.environ.get("MSMS_METRICS", "1") == "1"
+metrics = PrometheusSink() if METRICS else None
+
+
+class Pipelines:
+    """The compressors of the API, each built on first use."""
+
+    # Same pipelines as SpectrumCompressorB85 / SpectrumCompressorUrl, with their own instrumentation
+    @cached_property
+    def compressor(self) -> BaseCompressor:
+        return BaseCompressor(msms_compression.spectrum_compressor_f32, msms_compression.brotli_compressor,
+                              msms_compression.b85_encoder, instrumentation=metrics)
+
+    @cached_property
+    def compressor_url(self) -> BaseCompressor:
+        return BaseCompressor(msms_compression.spectrum_compressor_f32, msms_compression.brotli_compressor,
+                              msms_compression.url_encoder, instrumentation=metrics)
+
+    @cached_property
+    def auto_compressor(self) -> "msms_compression.AutoCompressor":
+        return msms_compression.AutoCompressor()
+
+    def decompress(self, compressed_data: str) -> (List[float], List[float]):
+        # self-describing payloads as well as plain SpectrumCompressorB85 output
+        return msms_compression.decompress(compressed_data, default=self.compressor)
+
+    async def adecompress(self, compressed_data: str) -> (List[float], List[float]):
+        return await msms_compression.adecompress(compressed_data, default=self.compressor)
 
-# Database setup
-DB_FILE = "spectra.db"
 
+pipelines = Pipelines()
+batch_executor = ThreadPoolExecutor()
 
-async def init_db():
-    async with aiosqlite.connect(DB_FILE) as db:
-        await db.execute("""
+# Database setup
+DB_FILE = os.environ.get("MSMS_DB_FILE", "spectra.db")
+DB_READERS = int(os.environ.get("MSMS_DB_READERS", "4"))
+
+INSERT_SPECTRUM = "INSERT OR IGNORE INTO spectra (id, compressed_data) VALUES (?, ?)"
+SELECT_SPECTRUM = "SELECT compressed_data FROM spectra WHERE id = ?"
+EXISTS_SPECTRUM = "SELECT 1 FROM spectra WHERE id = ?"
+INSERT_DIGEST = "INSERT OR IGNORE INTO digests (digest, id) VALUES (?, ?)"
+SELECT_DIGEST = "SELECT id FROM digests WHERE digest = ?"
+# digests per IN (...) lookup, below SQLite's default limit of 999 bound parameters before 3.32
+DIGEST_LOOKUP_CHUNK = 500
+
+
+class Database:
+    """
+    One long-lived writer connection plus a pool of reader connections, opened at startup. The database runs in WAL
+    mode so reads don't block on writes. sqlite3 caches prepared statements per connection (keyed by SQL text), so
+    with persistent connections each statement is only compiled once.
+    """
+
+    def __init__(self, path: str, readers: int = 4):
+        self.path = path
+        self.n_readers = readers
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._readers: Optional[asyncio.Queue] = None
+
+    async def open(self):
+        # created here so they belong to the running event loop
+        self._write_lock = asyncio.Lock()
+        self._readers = asyncio.Queue()
+        self._writer = await aiosqlite.connect(self.path)
+        await self._writer.execute("PRAGMA journal_mode=WAL")
+        # with WAL, NORMAL only fsyncs at checkpoints and is still safe against corruption
+        await self._writer.execute("PRAGMA synchronous=NORMAL")
+        await self._writer.execute("""
             CREATE TABLE IF NOT EXISTS spectra (
                 id TEXT PRIMARY KEY,
                 compressed_data TEXT NOT NULL
             )
         """)
-        await db.commit()
+        # digest of the submitted peaks -> key of their stored spectrum, see DedupIndex
+        await self._writer.execute("""
+            CREATE TABLE IF NOT EXISTS digests (
+                digest BLOB PRIMARY KEY,
+                id TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        await self._writer.commit()
+        for _ in range(self.n_readers):
+            await self._readers.put(await aiosqlite.connect(self.path))
+
+    async def close(self):
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+        while self._readers is not None and not self._readers.empty():
+            await self._readers.get_nowait().close()
+
+    @asynccontextmanager
+    async def reader(self):
+        db = await self._readers.get()
+        try:
+            yield db
+        finally:
+            self._readers.put_nowait(db)
+
+    async def insert_many(self, rows: List[Tuple[str, str]], digests: List[Tuple[bytes, str]] = ()):
+        # a single transaction (and fsync) for all rows, digests only ever point at committed spectra
+        async with self._write_lock:
+            try:
+                await self._writer.executemany(INSERT_SPECTRUM, rows)
+                await self._writer.executemany(INSERT_DIGEST, digests)
+                await self._writer.commit()
+            except BaseException:
+                # otherwise the rows written before the failure would be committed with the next batch
+                await self._writer.rollback()
+                raise
+
+    async def get(self, key: str) -> Optional[str]:
+        async with self.reader() as db:
+            async with db.execute(SELECT_SPECTRUM, (key,)) as cursor:
+                row = await cursor.fetchone()
+        return None if row is None else row[0]
+
+    async def exists(self, key: str) -> bool:
+        # served from the primary key index, the stored data isn't read
+        async with self.reader() as db:
+            async with db.execute(EXISTS_SPECTRUM, (key,)) as cursor:
+                return await cursor.fetchone() is not None
+
+    async def get_key(self, digest: bytes) -> Optional[str]:
+        async with self.reader() as db:
+            async with db.execute(SELECT_DIGEST, (digest,)) as cursor:
+                row = await cursor.fetchone()
+        return None if row is None else row[0]
+
+    async def get_keys(self, digests: List[bytes]) -> Dict[bytes, str]:
+        """Keys of the stored digests among ``digests``, one query per DIGEST_LOOKUP_CHUNK digests."""
+        keys = {}
+        async with self.reader() as db:
+            for start in range(0, len(digests), DIGEST_LOOKUP_CHUNK):
+                chunk = digests[start:start + DIGEST_LOOKUP_CHUNK]
+                query = f"SELECT id, digest FROM digests WHERE digest IN ({', '.join('?' * len(chunk))})"
+                async with db.execute(query, chunk) as cursor:
+                    keys.update({digest: key async for key, digest in cursor})
+        return keys
+
+
+db = Database(DB_FILE, DB_READERS)
+
+CACHE_BYTES = int(os.environ.get("MSMS_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+class ResponseCache:
+    """
+    LRU cache of serialized /retrieve responses, bounded by their total size in bytes. Keys are content hashes, so
+    entries never go stale.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        # doesn't count as a hit / miss or refresh the entry
+        return key in self._entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: str, body: bytes):
+        if len(body) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self._entries),
+                "size_bytes": self.size, "max_bytes": self.max_bytes}
+
+
+response_cache = ResponseCache(CACHE_BYTES)
+
+DEDUP_ENTRIES = int(os.environ.get("MSMS_DEDUP_ENTRIES", "100000"))
+
+
+def spectrum_digest(data: SpectrumPeaks) -> bytes:
+    """
+    Hash of the peaks sorted by m/z, the same order they are compressed in. Resubmitting a spectrum (in any peak
+    order) gives the same digest without compressing it again.
+    """
+    import numpy as np
+    check_lengths(data)
+    mzs = np.asarray(data.mzs, dtype=np.float64)
+    intensities = np.asarray(data.intensities, dtype=np.float64)
+    order = np.argsort(mzs, kind="stable")
+    digest = hashlib.blake2b(len(mzs).to_bytes(8, "little"), digest_size=16)
+    digest.update(mzs[order].tobytes())
+    digest.update(intensities[order].tobytes())
+    return digest.digest()
+
+
+class DedupIndex:
+    """
+    LRU map of spectrum digests to stored keys, bounded by its number of entries. Misses fall back to the digests
+    table, which keeps every digest ever stored, so resubmissions are recognised across restarts and evictions.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[bytes, str]" = OrderedDict()
+
+    async def get(self, digest: bytes) -> Optional[str]:
+        key = self._entries.get(digest)
+        if key is not None:
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return key
+        key = await db.get_key(digest)
+        if key is None:
+            self.misses += 1
+            return None
+        self.db_hits += 1
+        self.put(digest, key)
+        return key
+
+    async def get_many(self, digests: List[bytes]) -> Dict[bytes, str]:
+        """Keys of the known digests among the distinct ``digests``, the rest looked up in a single query."""
+        keys = {}
+        missing = []
+        for digest in digests:
+            key = self._entries.get(digest)
+            if key is None:
+                missing.append(digest)
+            else:
+                self._entries.move_to_end(digest)
+                keys[digest] = key
+        self.hits += len(keys)
+        if missing:
+            db_keys = await db.get_keys(missing)
+            self.db_hits += len(db_keys)
+            self.misses += len(missing) - len(db_keys)
+            for digest, key in db_keys.items():
+                self.put(digest, key)
+            keys.update(db_keys)
+        return keys
+
+    def put(self, digest: bytes, key: str):
+        if self.max_entries <= 0:
+            return
+        self._entries[digest] = key
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.db_hits + self.misses
+        return {"hits": self.hits, "db_hits": self.db_hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": (self.hits + self.db_hits) / lookups if lookups else 0.0, "entries": len(self._entries),
+                "max_entries": self.max_entries}
+
+
+dedup_index = DedupIndex(DEDUP_ENTRIES)
+
+# CPU bound work of the async endpoints runs on this executor: "thread", "process", "inline" (on the event loop) or
+# "async" (spectrum encoding on the event loop, brotli on the shared thread pool of BaseCompressor.acompress)
+EXECUTOR = os.environ.get("MSMS_EXECUTOR", "thread")
+EXECUTOR_WORKERS = int(os.environ.get("MSMS_EXECUTOR_WORKERS", str(os.cpu_count() or 1)))
+EXECUTOR_QUEUE_SIZE = int(os.environ.get("MSMS_EXECUTOR_QUEUE_SIZE", "64"))
+BATCH_CHUNK_SIZE = 64
+
+
+class CompressionExecutor:
+    """
+    Dispatches compression work off the event loop. At most max_pending requests may have work queued or running,
+    further requests are rejected with a 503 instead of piling up.
+    """
+
+    def __init__(self, kind: str, workers: int, max_pending: int):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    def start(self):
+        if self.kind == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        elif self.kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        elif self.kind not in ("inline", "async"):
+            raise ValueError(f"Unknown executor {self.kind!r}, expected thread, process, inline or async")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.pending >= self.max_pending:
+            raise HTTPException(status_code=503, detail="Server busy", headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    async def run(self, func: Callable, *args):
+        if self._executor is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def submit(self, func: Callable, *args):
+        async with self.slot():
+            return await self.run(func, *args)
+
+    async def compress(self, data: SpectrumPeaks) -> str:
+        if self.kind == "async":
+            async with self.slot():
+                return await acompress_spectrum(data)
+        return await self.submit(compress_spectrum, data)
+
+    async def compress_many(self, spectra: List[SpectrumPeaks]) -> List[Union[str, Exception]]:
+        # one slot for the whole batch
+        async with self.slot():
+            if self.kind == "async":
+                return await msms_compression.agather(acompress_spectrum(data) for data in spectra)
+            chunks = [spectra[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(spectra), BATCH_CHUNK_SIZE)]
+            compressed_chunks = await asyncio.gather(*(self.run(compress_spectra, chunk) for chunk in chunks))
+            return [result for chunk in compressed_chunks for result in chunk]
+
+    async def decompress_response(self, compressed_data: str) -> bytes:
+        if self.kind == "async":
+            async with self.slot():
+                mzs, intensities = await pipelines.adecompress(compressed_data)
+                return spectrum_response(mzs, intensities)
+        return await self.submit(decompress_response, compressed_data)
+
+
+offload = CompressionExecutor(EXECUTOR, EXECUTOR_WORKERS, EXECUTOR_QUEUE_SIZE)
+
 
 @app.on_event("startup")
 async def startup_event():
-    await init_db()
+    offload.start()
+    await db.open()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await db.close()
+    offload.shutdown()
 
 
 @app.post("/compress/url", status_code=200)
 def compress_url(data: SpectrumData):
     try:
-        compressed_data = compressor_url.compress(data.mzs, data.intensities)
+        compressed_data = pipelines.compressor_url.compress(data.mzs, data.intensities)
         return {"compressed_data": compressed_data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -55,20 +432,53 @@ def compress_url(data: SpectrumData):
 @app.post("/decompress/url", status_code=200)
 def decompress_url(data: CompressedData):
     try:
-        mzs, intensities = compressor_url.decompress(data.compressed_data)
+        mzs, intensities = pipelines.compressor_url.decompress(data.compressed_data)
         return {"mzs": mzs, "intensities": intensities}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def sort_spectrum(data: SpectrumPeaks) -> (List[float], List[float]):
+    # Sort the mzs and intensities together based on mzs
+    check_lengths(data)
+    sorted_pairs = sorted(zip(data.mzs, data.intensities), key=lambda pair: pair[0])
+    return [mz for mz, _ in sorted_pairs], [intensity for _, intensity in sorted_pairs]
+
+
 @app.post("/compress", status_code=200)
 def compress(data: SpectrumData):
     try:
-        # Sort the mzs and intensities together based on mzs
-        sorted_pairs = sorted(zip(data.mzs, data.intensities), key=lambda pair: pair[0])
-        sorted_mzs, sorted_intensities = zip(*sorted_pairs)
+        sorted_mzs, sorted_intensities = sort_spectrum(data)
+        compressed_data = pipelines.compressor.compress(sorted_mzs, sorted_intensities)
+        return {"compressed_data": compressed_data}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        compressed_data = compressor.compress(list(sorted_mzs), list(sorted_intensities))
+
+@app.post("/compress/batch", status_code=200)
+def compress_batch(data: BatchSpectrumData):
+    # Failed spectra are reported per item, the rest of the batch is still compressed
+    results: List[Optional[dict]] = [None] * len(data.spectra)
+    valid = []
+    for i, spectrum in enumerate(data.spectra):
+        try:
+            valid.append((i, sort_spectrum(spectrum)))
+        except ValueError as e:
+            results[i] = {"error": str(e)}
+    compressed = pipelines.compressor.compress_many((spectrum for _, spectrum in valid), executor=batch_executor)
+    for (i, _), result in zip(valid, compressed):
+        if isinstance(result, Exception):
+            results[i] = {"error": str(result)}
+        else:
+            results[i] = {"compressed_data": result}
+    return {"results": results}
+
+
+@app.post("/compress/auto", status_code=200)
+def compress_auto(data: SpectrumData):
+    # Self-describing output of whichever pipeline is smallest for this spectrum, readable by /decompress
+    try:
+        compressed_data = pipelines.auto_compressor.compress(*sort_spectrum(data))
         return {"compressed_data": compressed_data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -76,56 +486,166 @@ def compress(data: SpectrumData):
 
 @app.post("/decompress", status_code=200)
 def decompress(data: CompressedData):
+    # Accepts self-describing payloads as well as plain SpectrumCompressorB85 output
     try:
-        mzs, intensities = compressor.decompress(data.compressed_data)
+        mzs, intensities = pipelines.decompress(data.compressed_data)
         return {"mzs": mzs, "intensities": intensities}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def store_compressed_data(compressed_data: str) -> str:
+def spectrum_key(compressed_data: str) -> str:
     # Generate a key using a hash of the compressed data
-    key = hashlib.sha256(compressed_data.encode()).hexdigest()
+    return hashlib.sha256(compressed_data.encode()).hexdigest()
 
-    async with aiosqlite.connect(DB_FILE) as db:
-        # Check if the key already exists
-        async with db.execute("SELECT 1 FROM spectra WHERE id = ?", (key,)) as cursor:
-            if await cursor.fetchone() is None:
-                # Insert new entry if key does not exist
-                await db.execute("INSERT INTO spectra (id, compressed_data) VALUES (?, ?)", (key, compressed_data))
-                await db.commit()
 
+async def store_compressed_data(compressed_data: str, digest: Optional[bytes] = None) -> str:
+    key = spectrum_key(compressed_data)
+    await db.insert_many([(key, compressed_data)], [] if digest is None else [(digest, key)])
+    if digest is not None:
+        dedup_index.put(digest, key)
     return key
 
 
+def compress_spectrum(data: SpectrumPeaks) -> str:
+    return pipelines.compressor.compress(*sort_spectrum(data))
+
+
+async def acompress_spectrum(data: SpectrumPeaks) -> str:
+    return await pipelines.compressor.acompress(*sort_spectrum(data))
+
+
+def compress_spectra(spectra: List[SpectrumPeaks]) -> List[Union[str, Exception]]:
+    results = []
+    for data in spectra:
+        try:
+            results.append(compress_spectrum(data))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def spectrum_response(mzs: List[float], intensities: List[float]) -> bytes:
+    return json.dumps({"mzs": mzs, "intensities": intensities}, separators=(",", ":")).encode("utf-8")
+
+
+def decompress_response(compressed_data: str) -> bytes:
+    return spectrum_response(*pipelines.decompress(compressed_data))
+
+
 @app.post("/store", status_code=200)
 async def store_spectrum(data: SpectrumData):
     try:
-        # Sort the mzs and intensities together based on mzs
-        sorted_pairs = sorted(zip(data.mzs, data.intensities), key=lambda pair: pair[0])
-        sorted_mzs, sorted_intensities = zip(*sorted_pairs)
+        # A spectrum that was stored before already has a key, no need to compress it again
+        digest = spectrum_digest(data)
+        key = await dedup_index.get(digest)
+        if key is not None:
+            return {"key": key}
         # Compress the data first
-        compressed_data = compressor.compress(sorted_mzs, sorted_intensities)
+        compressed_data = await offload.compress(data)
         # Then store the compressed data
-        key = await store_compressed_data(compressed_data)
+        key = await store_compressed_data(compressed_data, digest)
         return {"key": key}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/retrieve/{key}", status_code=200)
-async def retrieve_spectrum(key: str):
+@app.post("/store/batch", status_code=200)
+async def store_batch(data: BatchSpectrumData):
+    # Every spectrum that compresses is stored in one transaction, failures are reported per item
     try:
-        async with aiosqlite.connect(DB_FILE) as db:
-            async with db.execute("SELECT compressed_data FROM spectra WHERE id = ?", (key,)) as cursor:
-                row = await cursor.fetchone()
-                if row is None:
-                    raise HTTPException(status_code=404, detail="Key not found")
+        results: List[Optional[dict]] = [None] * len(data.spectra)
+        # positions of every distinct spectrum, resubmissions within the batch are only compressed once
+        positions: Dict[bytes, List[int]] = {}
+        for i, spectrum in enumerate(data.spectra):
+            try:
+                positions.setdefault(spectrum_digest(spectrum), []).append(i)
+            except ValueError as e:
+                results[i] = {"error": str(e)}
+        # only spectra that weren't stored before are compressed
+        keys = await dedup_index.get_many(list(positions))
+        new = []
+        for digest, indices in positions.items():
+            if digest in keys:
+                for i in indices:
+                    results[i] = {"key": keys[digest]}
+            else:
+                new.append((digest, indices))
+
+        rows = []
+        digests = []
+        compressed = await offload.compress_many([data.spectra[indices[0]] for _, indices in new]) if new else []
+        for (digest, indices), compressed_data in zip(new, compressed):
+            if isinstance(compressed_data, Exception):
+                result = {"error": str(compressed_data)}
+            else:
+                key = spectrum_key(compressed_data)
+                rows.append((key, compressed_data))
+                digests.append((digest, key))
+                result = {"key": key}
+            for i in indices:
+                results[i] = result
+        await db.insert_many(rows, digests)
+        for digest, key in digests:
+            dedup_index.put(digest, key)
+        return {"results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        compressed_data = row[0]
-        mzs, intensities = compressor.decompress(compressed_data)
-        return {"mzs": mzs, "intensities": intensities}
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    # If-None-Match uses weak comparison, and may list several tags or "*"
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+@app.get("/retrieve/{key}", status_code=200)
+async def retrieve_spectrum(key: str, if_none_match: Optional[str] = Header(None)):
+    # Keys are hashes of the stored data, so responses are immutable and can be cached forever
+    headers = {"ETag": f'"{key}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    try:
+        if etag_matches(headers["ETag"], if_none_match):
+            # the ETag is the key, only answer 304 for keys that exist but don't read or decompress the data
+            if key not in response_cache and not await db.exists(key):
+                raise HTTPException(status_code=404, detail="Key not found")
+            return Response(status_code=304, headers=headers)
+
+        body = response_cache.get(key)
+        if body is None:
+            compressed_data = await db.get(key)
+            if compressed_data is None:
+                raise HTTPException(status_code=404, detail="Key not found")
+
+            body = await offload.decompress_response(compressed_data)
+            response_cache.put(key, body)
+        return Response(content=body, media_type="application/json", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.get("/cache/stats", status_code=200)
+async def cache_stats():
+    return response_cache.stats()
+
+
+@app.get("/store/stats", status_code=200)
+async def store_stats():
+    # /store and /store/batch submissions answered from the dedup index instead of compressing
+    return dedup_index.stats()
+
+
+@app.get("/metrics", status_code=200)
+async def metrics_endpoint():
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (MSMS_METRICS=0)")
+    return Response(content=metrics.render(), media_type=PrometheusSink.CONTENT_TYPE)
+
 handler = Mangum(app)
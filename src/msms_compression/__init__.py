@@ -1,34 +1,93 @@
 __version__ = '0.3.0'
 
-from msms_compression.base_compressor import BaseCompressor
-from msms_compression.data_compressor import BrotliCompressor, GzipCompressor, SkipCompressor
-from msms_compression.encoder import B85Encoder, UrlEncoder, LzStringEncoder, LzStringUriEncoder
-from msms_compression.spectrum_compressor import SpectrumCompressorF32, SpectrumCompressorF32Lossy, \
-    SpectrumCompressorString, SpectrumCompressorStringLossy, SpectrumCompressorI32
-
-# Compression algorithms
-spectrum_compressor_f32 = SpectrumCompressorF32()
-spectrum_compressor_f32_lossy2 = SpectrumCompressorF32Lossy(2)
-spectrum_compressor_f32_lossy3 = SpectrumCompressorF32Lossy(3)
-spectrum_compressor_string = SpectrumCompressorString(2, 1)
-spectrum_compressor_string_lossy = SpectrumCompressorStringLossy(2, 1)
-spectrum_compressor_i32 = SpectrumCompressorI32(2, 1)
-spectrum_compressor_i32_3 = SpectrumCompressorI32(3, 1)
-
-# Data compressors
-brotli_compressor = BrotliCompressor()
-gzip_compressor = GzipCompressor()
-skip_compressor = SkipCompressor()
-
-# Data Encoders
-b85_encoder = B85Encoder()
-url_encoder = UrlEncoder()
-lzstring_encoder = LzStringEncoder()
-lzstring_uri_encoder = LzStringUriEncoder()
+# Everything below is imported / built on first access (PEP 562), so ``import msms_compression`` stays cheap for
+# cold starts (e.g. the API on AWS Lambda) and numpy, brotli and the codecs only load once a compressor is used.
+# Default instances are built once and then cached in the module namespace.
+
+# public name -> module that defines it
+_LAZY_IMPORTS = {
+    'BaseCompressor': 'base_compressor',
+    'BrotliCompressor': 'data_compressor',
+    'GzipCompressor': 'data_compressor',
+    'SkipCompressor': 'data_compressor',
+    'DictionaryCompressor': 'data_compressor',
+    'train_dictionary': 'dictionary',
+    'B85Encoder': 'encoder',
+    'UrlEncoder': 'encoder',
+    'LzStringEncoder': 'encoder',
+    'LzStringUriEncoder': 'encoder',
+    'agather': 'aio',
+    'FrameCompressor': 'frame',
+    'ChunkedCompressor': 'chunked',
+    'SelfDescribingCompressor': 'header',
+    'AutoCompressor': 'header',
+    'decompress': 'header',
+    'adecompress': 'header',
+    'SpectrumCompressorF32': 'spectrum_compressor',
+    'SpectrumCompressorF32Lossy': 'spectrum_compressor',
+    'SpectrumCompressorString': 'spectrum_compressor',
+    'SpectrumCompressorStringLossy': 'spectrum_compressor',
+    'SpectrumCompressorI32': 'spectrum_compressor',
+    'SpectrumCompressorBinary': 'spectrum_compressor',
+    'SpectrumCompressorBinaryLossy': 'spectrum_compressor',
+    'SpectrumCompressorPpm': 'spectrum_compressor',
+    'SpectrumCompressorBinaryBlocks': 'spectrum_compressor',
+    'SpectrumCompressorI32Binary': 'spectrum_compressor',
+}
+
+# default instance -> (class, arguments)
+_DEFAULT_INSTANCES = {
+    # Compression algorithms
+    'spectrum_compressor_f32': ('SpectrumCompressorF32', ()),
+    'spectrum_compressor_f32_lossy2': ('SpectrumCompressorF32Lossy', (2,)),
+    'spectrum_compressor_f32_lossy3': ('SpectrumCompressorF32Lossy', (3,)),
+    'spectrum_compressor_string': ('SpectrumCompressorString', (2, 1)),
+    'spectrum_compressor_string_lossy': ('SpectrumCompressorStringLossy', (2, 1)),
+    'spectrum_compressor_i32': ('SpectrumCompressorI32', (2, 1)),
+    'spectrum_compressor_i32_3': ('SpectrumCompressorI32', (3, 1)),
+    'spectrum_compressor_i32_binary': ('SpectrumCompressorI32Binary', (2, 1)),
+    'spectrum_compressor_binary': ('SpectrumCompressorBinary', ()),
+    'spectrum_compressor_binary_lossy': ('SpectrumCompressorBinaryLossy', ()),
+    'spectrum_compressor_ppm': ('SpectrumCompressorPpm', (5,)),
+    'spectrum_compressor_binary_blocks': ('SpectrumCompressorBinaryBlocks', ()),
+
+    # Data compressors
+    'brotli_compressor': ('BrotliCompressor', ()),
+    'gzip_compressor': ('GzipCompressor', ()),
+    'skip_compressor': ('SkipCompressor', ()),
+
+    # Data Encoders
+    'b85_encoder': ('B85Encoder', ()),
+    'url_encoder': ('UrlEncoder', ()),
+    'lzstring_encoder': ('LzStringEncoder', ()),
+    'lzstring_uri_encoder': ('LzStringUriEncoder', ()),
+}
 
 # Default spectrum compressors (Can make your own by defining a new BaseCompressor)
-SpectrumCompressorUrl = BaseCompressor(spectrum_compressor_f32, brotli_compressor, url_encoder)
-SpectrumCompressorB85 = BaseCompressor(spectrum_compressor_f32, brotli_compressor, b85_encoder)
-SpectrumCompressorF32LzstringUri = BaseCompressor(spectrum_compressor_f32, skip_compressor, lzstring_uri_encoder)
+_DEFAULT_PIPELINES = {
+    'SpectrumCompressorUrl': ('spectrum_compressor_f32', 'brotli_compressor', 'url_encoder'),
+    'SpectrumCompressorB85': ('spectrum_compressor_f32', 'brotli_compressor', 'b85_encoder'),
+    'SpectrumCompressorBinaryB85': ('spectrum_compressor_binary', 'brotli_compressor', 'b85_encoder'),
+    'SpectrumCompressorF32LzstringUri': ('spectrum_compressor_f32', 'skip_compressor', 'lzstring_uri_encoder'),
+}
+
+__all__ = ['__version__', *_LAZY_IMPORTS, *_DEFAULT_INSTANCES, *_DEFAULT_PIPELINES]
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        import importlib
+        value = getattr(importlib.import_module(f'{__name__}.{_LAZY_IMPORTS[name]}'), name)
+    elif name in _DEFAULT_INSTANCES:
+        cls, args = _DEFAULT_INSTANCES[name]
+        value = __getattr__(cls)(*args)
+    elif name in _DEFAULT_PIPELINES:
+        value = __getattr__('BaseCompressor')(*(__getattr__(part) for part in _DEFAULT_PIPELINES[name]))
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
 
 
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,48 @@
+"""
+asyncio support: the shared thread pool that runs the data compression stage of ``BaseCompressor.acompress`` /
+``adecompress``, and ``agather`` to run many of them with bounded concurrency.
+
+brotli, gzip and zlib release the GIL while they work, so data compression stages running on the pool overlap with
+each other and with the spectrum encoding, which stays on the calling task.
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Union
+
+_DATA_EXECUTOR: Optional[Executor] = None
+
+
+def data_executor() -> Executor:
+    """The executor data compression stages run on, a thread per CPU unless ``set_data_executor`` was called."""
+    global _DATA_EXECUTOR
+    if _DATA_EXECUTOR is None:
+        _DATA_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='msms-data')
+    return _DATA_EXECUTOR
+
+
+def set_data_executor(executor: Optional[Executor]) -> None:
+    """Use ``executor`` for the data compression stages (None: go back to the default pool on next use)."""
+    global _DATA_EXECUTOR
+    _DATA_EXECUTOR = executor
+
+
+async def agather(aws: Iterable[Awaitable], limit: int = 32) -> List[Union[Any, Exception]]:
+    """
+    Await ``aws`` with at most ``limit`` running at a time, returning their results in order. ``aws`` is consumed
+    lazily, so it can be a generator of coroutines. An awaitable that raises returns its exception instead.
+    """
+    aws = enumerate(aws)
+    results: Dict[int, Union[Any, Exception]] = {}
+
+    async def worker():
+        # the iterator is shared by the workers, each takes the next awaitable when it is done with its last one
+        for i, aw in aws:
+            try:
+                results[i] = await aw
+            except Exception as e:
+                results[i] = e
+
+    await asyncio.gather(*(worker() for _ in range(limit)))
+    return [results[i] for i in range(len(results))]
@@ -0,0 +1,182 @@
+"""
+Indexed spectrum archive with random access by scan number.
+
+Layout::
+
+    header   '<4sBI' magic, version, metadata length, followed by the JSON metadata
+    records  per spectrum: DataCompressor(SpectrumCompressor(mzs, intensities)), concatenated
+    index    one INDEX_DTYPE entry per spectrum, sorted by scan
+    footer   '<QQ4s' index offset, spectrum count, magic
+
+Archives are read through ``mmap``: opening one only reads the footer and maps the index, and fetching a spectrum
+only touches the bytes of its own record.
+"""
+
+import json
+import mmap
+import os
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from msms_compression.data_compressor import DataCompressor, BrotliCompressor
+from msms_compression.spectrum_compressor import SpectrumCompressor, SpectrumCompressorBinary, Peaks
+
+MAGIC = b'MSCA'
+VERSION = 1
+INDEX_DTYPE = np.dtype([('scan', '<u4'), ('precursor_mz', '<f8'), ('offset', '<u8'), ('length', '<u4')])
+
+_HEADER = struct.Struct('<4sBI')
+_FOOTER = struct.Struct('<QQ4s')
+
+
+def _metadata(spectrum_compressor: SpectrumCompressor, data_compressor: DataCompressor) -> dict:
+    return {'spectrum_compressor': str(spectrum_compressor), 'data_compressor': str(data_compressor)}
+
+
+class ArchiveWriter:
+    """
+    Write spectra to an archive. Scans must be unique; they can be added in any order.
+
+        with ArchiveWriter('run.msca') as writer:
+            writer.add(scan, precursor_mz, mzs, intensities)
+    """
+
+    def __init__(self, path: str, spectrum_compressor: Optional[SpectrumCompressor] = None,
+                 data_compressor: Optional[DataCompressor] = None):
+        self._spectrum_compressor = spectrum_compressor or SpectrumCompressorBinary()
+        self._data_compressor = data_compressor or BrotliCompressor()
+        self._binary = getattr(self._spectrum_compressor, 'binary', False)
+        self._index: List[Tuple[int, float, int, int]] = []
+        self._scans = set()
+
+        self._f = open(path, 'wb')
+        metadata = json.dumps(_metadata(self._spectrum_compressor, self._data_compressor)).encode('utf-8')
+        self._f.write(_HEADER.pack(MAGIC, VERSION, len(metadata)) + metadata)
+        self._offset = _HEADER.size + len(metadata)
+
+    def add(self, scan: int, precursor_mz: float, mzs: Peaks, intensities: Peaks) -> None:
+        if scan in self._scans:
+            raise ValueError(f"Scan {scan} is already in the archive")
+        s = self._spectrum_compressor.compress(mzs, intensities)
+        b = self._data_compressor.compress(s if self._binary else s.encode('utf-8'))
+        self._f.write(b)
+        self._index.append((scan, precursor_mz, self._offset, len(b)))
+        self._scans.add(scan)
+        self._offset += len(b)
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        index = np.array(self._index, dtype=INDEX_DTYPE)
+        index.sort(order='scan')
+        self._f.write(index.tobytes())
+        self._f.write(_FOOTER.pack(self._offset, len(index), MAGIC))
+        self._f.close()
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class Archive:
+    """
+    Read-only, memory-mapped view of an archive written by ``ArchiveWriter``. The compressors must match the ones
+    the archive was written with.
+    """
+
+    def __init__(self, path: str, spectrum_compressor: Optional[SpectrumCompressor] = None,
+                 data_compressor: Optional[DataCompressor] = None):
+        self._spectrum_compressor = spectrum_compressor or SpectrumCompressorBinary()
+        self._data_compressor = data_compressor or BrotliCompressor()
+        self._binary = getattr(self._spectrum_compressor, 'binary', False)
+
+        with open(path, 'rb') as f:
+            # empty files can't be mapped, and shorter ones can't hold a header and a footer
+            if os.fstat(f.fileno()).st_size < _HEADER.size + _FOOTER.size:
+                raise ValueError(f"{path} is not a spectrum archive")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, metadata_length = _HEADER.unpack_from(self._mm)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a spectrum archive")
+            if version != VERSION:
+                raise ValueError(f"Unsupported archive version {version}")
+            index_offset, count, magic = _FOOTER.unpack_from(self._mm, len(self._mm) - _FOOTER.size)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is truncated (missing index)")
+
+            metadata = json.loads(self._mm[_HEADER.size:_HEADER.size + metadata_length])
+            expected = _metadata(self._spectrum_compressor, self._data_compressor)
+            if metadata != expected:
+                raise ValueError(f"Archive was written with {metadata}, not {expected}")
+
+            self.index = np.frombuffer(self._mm, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+        except BaseException:
+            self._mm.close()
+            raise
+        self._precursor_order = None
+        self._precursor_mzs = None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, scan: int) -> bool:
+        i = np.searchsorted(self.index['scan'], scan)
+        return i < len(self.index) and self.index['scan'][i] == scan
+
+    @property
+    def scans(self) -> np.ndarray:
+        # a copy, arrays still viewing the map would keep close() from unmapping it
+        return self.index['scan'].copy()
+
+    def _read(self, i: int, as_numpy: bool) -> (Peaks, Peaks):
+        entry = self.index[i]
+        offset = int(entry['offset'])
+        b = self._data_compressor.decompress(self._mm[offset:offset + int(entry['length'])])
+        s = b if self._binary else b.decode('utf-8')
+        if as_numpy:
+            return self._spectrum_compressor.decompress(s, as_numpy=True)
+        return self._spectrum_compressor.decompress(s)
+
+    def get(self, scan: int, as_numpy: bool = False) -> (Peaks, Peaks):
+        i = np.searchsorted(self.index['scan'], scan)
+        if i == len(self.index) or self.index['scan'][i] != scan:
+            raise KeyError(scan)
+        return self._read(i, as_numpy)
+
+    def __getitem__(self, scan: int) -> (Peaks, Peaks):
+        return self.get(scan)
+
+    def query_precursor(self, mz_lo: float, mz_hi: float,
+                        as_numpy: bool = False) -> Iterator[Tuple[int, Peaks, Peaks]]:
+        """Yield (scan, mzs, intensities) for every spectrum with mz_lo <= precursor m/z <= mz_hi."""
+        if self._precursor_order is None:
+            self._precursor_order = np.argsort(self.index['precursor_mz'], kind='stable')
+            self._precursor_mzs = self.index['precursor_mz'][self._precursor_order]
+        precursor_mzs = self._precursor_mzs
+        lo = np.searchsorted(precursor_mzs, mz_lo, side='left')
+        hi = np.searchsorted(precursor_mzs, mz_hi, side='right')
+        for i in self._precursor_order[lo:hi]:
+            yield (int(self.index['scan'][i]), *self._read(i, as_numpy))
+
+    def __iter__(self) -> Iterator[Tuple[int, Peaks, Peaks]]:
+        for i in range(len(self.index)):
+            yield (int(self.index['scan'][i]), *self._read(i, False))
+
+    def close(self) -> None:
+        # the index is a view of the map, drop it first so the map can be closed
+        self.index = None
+        self._precursor_order = None
+        self._precursor_mzs = None
+        self._mm.close()
+
+    def __enter__(self) -> 'Archive':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
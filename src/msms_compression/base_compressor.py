@@ -1,32 +1,256 @@
-from typing import List
+from __future__ import annotations
 
-from msms_compression.data_compressor import DataCompressor
+import threading
+import time
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple, Union
+
+from msms_compression.data_compressor import DataCompressor, SkipCompressor
 from msms_compression.encoder import Encoder
-from msms_compression.spectrum_compressor import SpectrumCompressor
+
+# Only needed for annotations. Importing BaseCompressor doesn't pull in numpy (spectrum_compressor), asyncio (aio) or
+# concurrent.futures (batch); the methods that use them import them on first call.
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from msms_compression.instrumentation import Sink
+    from msms_compression.spectrum_compressor import SpectrumCompressor, Peaks
+
+
+# Decompressing fewer bytes than this inline is quicker than handing them to a pool thread (~40us for the hop,
+# brotli decompresses 8KB in ~60us)
+_INLINE_DECOMPRESS_BYTES = 8192
+
+# Reusable per-thread buffer that compress_bytes has spectrum compressors write into. Buffers that grew past
+# _MAX_KEPT_BUFFER_BYTES for an unusually large spectrum are dropped after the call instead of being kept.
+_BUFFERS = threading.local()
+_MAX_KEPT_BUFFER_BYTES = 1 << 22
 
 
 class BaseCompressor:
+    # per-stage timings / sizes are reported to this sink, see msms_compression.instrumentation
+    instrumentation: Optional[Sink] = None
 
-    def __init__(self, _compressor: SpectrumCompressor, _data_compressor: DataCompressor, _encoder: Encoder):
+    def __init__(self, _compressor: SpectrumCompressor, _data_compressor: DataCompressor, _encoder: Encoder,
+                 instrumentation: Optional[Sink] = None):
         self._spectrum_compressor: SpectrumCompressor = _compressor
         self._compressor: DataCompressor = _data_compressor
         self._encoder: Encoder = _encoder
+        self._binary: bool = getattr(_compressor, 'binary', False)
+        # acompress / adecompress only hand the data stage to the thread pool when there is work to hand over
+        self._offload_data: bool = not isinstance(_data_compressor, SkipCompressor)
+        self.instrumentation = instrumentation
 
-    def compress(self, mzs: List[float], intensities: List[float]) -> str:
+    def compress(self, mzs: Peaks, intensities: Peaks) -> str:
+        if self.instrumentation is not None:
+            return self._compress_instrumented(mzs, intensities)
         s = self._spectrum_compressor.compress(mzs, intensities)
-        b = s.encode('utf-8')
+        b = s if self._binary else s.encode('utf-8')
         b = self._compressor.compress(b)
         b = self._encoder.encode(b)
         s = b.decode('utf-8')
         return s
 
-    def decompress(self, s: str) -> (List[float], List[float]):
+    def decompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
+        if self.instrumentation is not None:
+            return self._decompress_instrumented(s, as_numpy)
         b = s.encode('utf-8')
         b = self._encoder.decode(b)
         b = self._compressor.decompress(b)
-        s = b.decode('utf-8')
+        s = b if self._binary else b.decode('utf-8')
+        if as_numpy:
+            return self._spectrum_compressor.decompress(s, as_numpy=True)
         mzs, intensities = self._spectrum_compressor.decompress(s)
         return mzs, intensities
 
+    def compress_bytes(self, mzs: Peaks, intensities: Peaks) -> bytes:
+        """
+        ``compress`` returning the encoded bytes instead of a str. Spectrum compressors with ``compress_into`` write
+        their payload to a reusable per-thread buffer that is handed to the data compressor as a memoryview, so the
+        only full size allocations are the outputs of the data compressor and the encoder.
+        """
+        if self.instrumentation is not None:
+            return self.compress(mzs, intensities).encode('utf-8')
+        compress_into = getattr(self._spectrum_compressor, 'compress_into', None)
+        if compress_into is None:
+            s = self._spectrum_compressor.compress(mzs, intensities)
+            return bytes(self._encoder.encode(self._compressor.compress(s if self._binary else s.encode('utf-8'))))
+
+        buf = getattr(_BUFFERS, 'buf', None)
+        if buf is None:
+            buf = _BUFFERS.buf = bytearray()
+        n = compress_into(mzs, intensities, buf)
+        with memoryview(buf) as view, view[:n] as payload:
+            # bytes() is a no-op for bytes, it only copies when the data compressor and encoder pass the view through
+            b = bytes(self._encoder.encode(self._compressor.compress(payload)))
+        if len(buf) > _MAX_KEPT_BUFFER_BYTES:
+            _BUFFERS.buf = None
+        return b
+
+    def decompress_bytes(self, b: Union[bytes, memoryview], as_numpy: bool = False) -> (Peaks, Peaks):
+        """``decompress`` for the bytes of ``compress_bytes`` (or any bytes-like object), no str round trip."""
+        if self.instrumentation is not None:
+            return self.decompress(bytes(b).decode('utf-8'), as_numpy)
+        payload = self._compressor.decompress(self._encoder.decode(b))
+        if not self._binary:
+            payload = payload.decode('utf-8')
+        if as_numpy:
+            return self._spectrum_compressor.decompress(payload, as_numpy=True)
+        return self._spectrum_compressor.decompress(payload)
+
+    def _spectrum_payload(self, s: str) -> Union[str, bytes]:
+        b = self._compressor.decompress(self._encoder.decode(s.encode('utf-8')))
+        return b if self._binary else b.decode('utf-8')
+
+    def query(self, s: str, mz_lo: float, mz_hi: float, as_numpy: bool = False) -> (Peaks, Peaks):
+        """
+        Peaks with mz_lo <= m/z <= mz_hi. Spectrum compressors with a ``query`` method (block layouts) only decode
+        the part of the spectrum that can hold them, others are decoded in full and filtered.
+        """
+        payload = self._spectrum_payload(s)
+        if hasattr(self._spectrum_compressor, 'query'):
+            return self._spectrum_compressor.query(payload, mz_lo, mz_hi, as_numpy)
+        mzs, intensities = self._spectrum_compressor.decompress(payload, as_numpy=True)
+        mask = (mzs >= mz_lo) & (mzs <= mz_hi)
+        if as_numpy:
+            return mzs[mask], intensities[mask]
+        return mzs[mask].tolist(), intensities[mask].tolist()
+
+    def iter_peaks(self, s: str) -> Iterator[Tuple[float, float]]:
+        """Yield (mz, intensity) pairs, lazily for spectrum compressors with an ``iter_peaks`` method."""
+        payload = self._spectrum_payload(s)
+        if hasattr(self._spectrum_compressor, 'iter_peaks'):
+            return self._spectrum_compressor.iter_peaks(payload)
+        return zip(*self._spectrum_compressor.decompress(payload))
+
+    def _compress_instrumented(self, mzs: Peaks, intensities: Peaks) -> str:
+        t0 = time.perf_counter()
+        s = self._spectrum_compressor.compress(mzs, intensities)
+        t1 = time.perf_counter()
+        b = s if self._binary else s.encode('utf-8')
+        t2 = time.perf_counter()
+        c = self._compressor.compress(b)
+        t3 = time.perf_counter()
+        e = self._encoder.encode(c)
+        t4 = time.perf_counter()
+        s = e.decode('utf-8')
+        t5 = time.perf_counter()
+        self.instrumentation.record(
+            str(self), 'compress',
+            [('spectrum', t1 - t0), ('utf8', t2 - t1 + t5 - t4), ('data', t3 - t2), ('encoder', t4 - t3),
+             ('total', t5 - t0)],
+            [('spectrum', len(b)), ('data', len(c)), ('encoder', len(e))])
+        return s
+
+    def _decompress_instrumented(self, s: str, as_numpy: bool) -> (Peaks, Peaks):
+        t0 = time.perf_counter()
+        e = s.encode('utf-8')
+        t1 = time.perf_counter()
+        c = self._encoder.decode(e)
+        t2 = time.perf_counter()
+        b = self._compressor.decompress(c)
+        t3 = time.perf_counter()
+        s = b if self._binary else b.decode('utf-8')
+        t4 = time.perf_counter()
+        if as_numpy:
+            result = self._spectrum_compressor.decompress(s, as_numpy=True)
+        else:
+            result = self._spectrum_compressor.decompress(s)
+        t5 = time.perf_counter()
+        self.instrumentation.record(
+            str(self), 'decompress',
+            [('utf8', t1 - t0 + t4 - t3), ('encoder', t2 - t1), ('data', t3 - t2), ('spectrum', t5 - t4),
+             ('total', t5 - t0)],
+            [('encoder', len(c)), ('data', len(b))])
+        return result
+
+    async def _run_data_stage(self, func, b: bytes, inline_bytes: int = 0) -> bytes:
+        if not self._offload_data or len(b) < inline_bytes:
+            return func(b)
+        import asyncio
+        from msms_compression.aio import data_executor
+        return await asyncio.get_running_loop().run_in_executor(data_executor(), func, b)
+
+    async def acompress(self, mzs: Peaks, intensities: Peaks) -> str:
+        """
+        ``compress`` for asyncio code. The spectrum compressor and encoder run on the calling task, the data
+        compressor on the shared thread pool of ``msms_compression.aio``, so concurrent calls overlap their
+        brotli / gzip work.
+        """
+        t0 = time.perf_counter()
+        s = self._spectrum_compressor.compress(mzs, intensities)
+        b = s if self._binary else s.encode('utf-8')
+        t1 = time.perf_counter()
+        c = await self._run_data_stage(self._compressor.compress, b)
+        t2 = time.perf_counter()
+        e = self._encoder.encode(c)
+        s = e.decode('utf-8')
+        if self.instrumentation is not None:
+            # the data stage includes the time spent waiting for a pool thread
+            t3 = time.perf_counter()
+            self.instrumentation.record(
+                str(self), 'acompress', [('spectrum', t1 - t0), ('data', t2 - t1), ('encoder', t3 - t2),
+                                         ('total', t3 - t0)],
+                [('spectrum', len(b)), ('data', len(c)), ('encoder', len(e))])
+        return s
+
+    async def adecompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
+        """``decompress`` for asyncio code, see ``acompress``."""
+        t0 = time.perf_counter()
+        c = self._encoder.decode(s.encode('utf-8'))
+        t1 = time.perf_counter()
+        b = await self._run_data_stage(self._compressor.decompress, c, _INLINE_DECOMPRESS_BYTES)
+        t2 = time.perf_counter()
+        s = b if self._binary else b.decode('utf-8')
+        if as_numpy:
+            result = self._spectrum_compressor.decompress(s, as_numpy=True)
+        else:
+            result = self._spectrum_compressor.decompress(s)
+        if self.instrumentation is not None:
+            t3 = time.perf_counter()
+            self.instrumentation.record(
+                str(self), 'adecompress', [('encoder', t1 - t0), ('data', t2 - t1), ('spectrum', t3 - t2),
+                                           ('total', t3 - t0)],
+                [('encoder', len(c)), ('data', len(b))])
+        return result
+
+    async def acompress_many(self, spectra: Iterable[Tuple[List[float], List[float]]],
+                             limit: int = 32) -> List[Union[str, Exception]]:
+        """``acompress`` every spectrum, at most ``limit`` at a time. Failed spectra return their exception."""
+        from msms_compression.aio import agather
+        return await agather((self.acompress(mzs, intensities) for mzs, intensities in spectra), limit)
+
+    async def adecompress_many(self, compressed: Iterable[str],
+                               limit: int = 32) -> List[Union[Tuple[Peaks, Peaks], Exception]]:
+        """``adecompress`` every string, at most ``limit`` at a time. Failed strings return their exception."""
+        from msms_compression.aio import agather
+        return await agather((self.adecompress(s) for s in compressed), limit)
+
+    def __getstate__(self):
+        # sinks hold locks / loggers and live in the parent process, workers of a process pool don't report
+        state = self.__dict__.copy()
+        state['instrumentation'] = None
+        return state
+
+    def compress_many(self, spectra: Iterable[Tuple[List[float], List[float]]],
+                      executor: Union[str, Executor] = 'process', max_workers: Optional[int] = None,
+                      chunk_size: int = 64) -> Iterator[Union[str, Exception]]:
+        """
+        Compress (mzs, intensities) pairs in parallel, yielding the compressed strings in input order.
+
+        ``executor`` is 'process', 'thread' or an existing ``concurrent.futures.Executor``. Spectra are scheduled in
+        chunks of ``chunk_size`` and only a few chunks per worker are in flight, so ``spectra`` can be a lazy
+        iterable of any length. A spectrum that fails to compress yields its exception instead of a string.
+        """
+        from msms_compression.batch import run_batched, _compress_chunk
+        return run_batched(_compress_chunk, self, spectra, executor, max_workers, chunk_size)
+
+    def decompress_many(self, compressed: Iterable[str], executor: Union[str, Executor] = 'process',
+                        max_workers: Optional[int] = None,
+                        chunk_size: int = 64) -> Iterator[Union[Tuple[List[float], List[float]], Exception]]:
+        """
+        Decompress strings in parallel, yielding (mzs, intensities) pairs in input order. See ``compress_many``.
+        """
+        from msms_compression.batch import run_batched, _decompress_chunk
+        return run_batched(_decompress_chunk, self, compressed, executor, max_workers, chunk_size)
+
     def __str__(self):
         return f'{str(self._spectrum_compressor)}_{str(self._compressor)}_{str(self._encoder)}'
@@ -0,0 +1,84 @@
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Union
+
+
+def _compress_chunk(compressor, chunk: List[tuple]) -> List[Union[str, Exception]]:
+    results = []
+    for mzs, intensities in chunk:
+        try:
+            results.append(compressor.compress(mzs, intensities))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _decompress_chunk(compressor, chunk: List[str]) -> List[Union[tuple, Exception]]:
+    results = []
+    for s in chunk:
+        try:
+            results.append(compressor.decompress(s))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _chunks(items: Iterable[Any], chunk_size: int) -> Iterator[List[Any]]:
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _make_executor(executor: str, max_workers: Optional[int]) -> Executor:
+    if executor == 'process':
+        return ProcessPoolExecutor(max_workers=max_workers)
+    if executor == 'thread':
+        return ThreadPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"executor must be 'process', 'thread' or an Executor instance, got {executor!r}")
+
+
+def run_batched(func: Callable, compressor, items: Iterable[Any], executor: Union[str, Executor] = 'process',
+                max_workers: Optional[int] = None, chunk_size: int = 64,
+                max_pending: Optional[int] = None) -> Iterator[Any]:
+    """
+    Apply ``func(compressor, chunk)`` to chunks of ``items`` on an executor and yield the per-item results in input
+    order.
+
+    At most ``max_pending`` chunks (default: two per worker) are in flight at once, so ``items`` is consumed lazily
+    and memory stays bounded for arbitrarily long inputs. ``func`` reports per-item failures by returning the
+    exception in place of the result; if a whole chunk fails (e.g. a worker process dies) its exception is yielded
+    once for every item of the chunk.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    own_executor = isinstance(executor, str)
+    pool = _make_executor(executor, max_workers) if own_executor else executor
+    if max_pending is None:
+        max_pending = 2 * (max_workers or os.cpu_count() or 1)
+
+    pending = deque()
+
+    def _results(future, n):
+        try:
+            return future.result()
+        except Exception as e:
+            return [e] * n
+
+    try:
+        for chunk in _chunks(items, chunk_size):
+            pending.append((pool.submit(func, compressor, chunk), len(chunk)))
+            if len(pending) >= max_pending:
+                yield from _results(*pending.popleft())
+        while pending:
+            yield from _results(*pending.popleft())
+    finally:
+        for future, _ in pending:
+            future.cancel()
+        if own_executor:
+            pool.shutdown(wait=True)
@@ -0,0 +1,90 @@
+"""
+Chunked compression for very large spectra (imaging / DIA spectra with 100k-1M peaks).
+
+The peaks are split into segments of ``chunk_size`` consecutive peaks, m/z segments for sorted input. Each segment
+goes through the spectrum compressor and the data compressor on its own, so segments are encoded, compressed and
+decoded concurrently on a thread pool (brotli, gzip and zlib release the GIL, as do numpy's array kernels). The
+compressed segments go behind an offset table and the encoder runs once over the whole payload::
+
+    '<I' segment count, count + 1 '<u4' offsets, data compressed segment payloads
+
+Decompressed segments are concatenated back into one spectrum. The peaks are the same as the unchunked pipeline's for
+every spectrum compressor that codes each peak on its own (the lossless ones, the m/z of ``SpectrumCompressorPpm``).
+Lossy intensities are quantized per segment instead of per spectrum, within the same error bound.
+"""
+
+import struct
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from msms_compression.base_compressor import BaseCompressor
+from msms_compression.spectrum_compressor import Peaks
+
+_CHUNKED_HEADER = struct.Struct('<I')
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class ChunkedCompressor:
+    def __init__(self, compressor: BaseCompressor, chunk_size: int = 65536, executor: Optional[Executor] = None):
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        self.compressor = compressor
+        self.chunk_size = chunk_size
+        # None: the shared pool of msms_compression.aio.data_executor, a thread per CPU
+        self.executor = executor
+
+    def _map(self, func: Callable[[T], R], items: Sequence[T]) -> List[R]:
+        if len(items) < 2:
+            return [func(item) for item in items]
+        executor = self.executor
+        if executor is None:
+            from msms_compression.aio import data_executor
+            executor = data_executor()
+        return list(executor.map(func, items))
+
+    def _compress_segment(self, segment: Tuple[np.ndarray, np.ndarray]) -> bytes:
+        s = self.compressor._spectrum_compressor.compress(*segment)
+        return self.compressor._compressor.compress(s if self.compressor._binary else s.encode('utf-8'))
+
+    def _decompress_segment(self, b: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        payload = self.compressor._compressor.decompress(b)
+        if not self.compressor._binary:
+            payload = payload.decode('utf-8')
+        return self.compressor._spectrum_compressor.decompress(payload, as_numpy=True)
+
+    def segments(self, mzs: Peaks, intensities: Peaks) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """The (mzs, intensities) segments ``compress`` codes independently, at least one (possibly empty)."""
+        mzs, intensities = np.asarray(mzs), np.asarray(intensities)
+        if len(mzs) != len(intensities):
+            raise ValueError(f"Got {len(mzs)} m/z values and {len(intensities)} intensities")
+        return [(mzs[i:i + self.chunk_size], intensities[i:i + self.chunk_size])
+                for i in range(0, max(len(mzs), 1), self.chunk_size)]
+
+    def compress(self, mzs: Peaks, intensities: Peaks) -> str:
+        payloads = self._map(self._compress_segment, self.segments(mzs, intensities))
+        offsets = np.zeros(len(payloads) + 1, dtype='<u4')
+        np.cumsum([len(b) for b in payloads], out=offsets[1:])
+        b = b''.join([_CHUNKED_HEADER.pack(len(payloads)), offsets.tobytes(), *payloads])
+        return self.compressor._encoder.encode(b).decode('utf-8')
+
+    def decompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
+        b = self.compressor._encoder.decode(s.encode('utf-8'))
+        n, = _CHUNKED_HEADER.unpack_from(b)
+        offsets = np.frombuffer(b, dtype='<u4', count=n + 1, offset=_CHUNKED_HEADER.size).tolist()
+        start = _CHUNKED_HEADER.size + 4 * (n + 1)
+        if start + offsets[-1] != len(b):
+            raise ValueError("Corrupt chunked payload: offsets don't match its length")
+        segments = self._map(self._decompress_segment,
+                             [b[start + offsets[i]:start + offsets[i + 1]] for i in range(n)])
+        mzs = np.concatenate([segment[0] for segment in segments])
+        intensities = np.concatenate([segment[1] for segment in segments])
+        if as_numpy:
+            return mzs, intensities
+        return mzs.tolist(), intensities.tolist()
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.compressor}|{self.chunk_size})'
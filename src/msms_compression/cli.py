@@ -0,0 +1,60 @@
+import argparse
+import sys
+from contextlib import contextmanager
+
+from msms_compression import SpectrumCompressorB85, SpectrumCompressorUrl, SpectrumCompressorBinaryB85
+from msms_compression.pipeline import read_spectra, compress_spectra, write_records, read_records, \
+    decompress_spectra, write_mgf
+
+PIPELINES = {
+    'b85': SpectrumCompressorB85,
+    'url': SpectrumCompressorUrl,
+    'binary-b85': SpectrumCompressorBinaryB85,
+}
+
+
+@contextmanager
+def _open(path: str, mode: str):
+    if path == '-':
+        yield sys.stdout if 'w' in mode else sys.stdin
+    else:
+        with open(path, mode) as f:
+            yield f
+
+
+def _compress(args):
+    spectra = read_spectra(args.input)
+    records = compress_spectra(spectra, PIPELINES[args.pipeline], workers=args.workers)
+    with _open(args.output, 'w') as f:
+        write_records(records, f)
+
+
+def _decompress(args):
+    with _open(args.input, 'r') as f_in, _open(args.output, 'w') as f_out:
+        write_mgf(decompress_spectra(read_records(f_in), PIPELINES[args.pipeline]), f_out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='msms-compression', description='Compress MS/MS spectra files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compress_parser = subparsers.add_parser('compress', help='MGF / mzML -> compressed records (JSON lines)')
+    compress_parser.add_argument('input', help='.mgf or .mzML file')
+    compress_parser.add_argument('-o', '--output', default='-', help='output file (default: stdout)')
+    compress_parser.add_argument('-p', '--pipeline', choices=sorted(PIPELINES), default='b85')
+    compress_parser.add_argument('-w', '--workers', type=int, default=0,
+                                 help='compress on this many processes (default: compress inline)')
+    compress_parser.set_defaults(func=_compress)
+
+    decompress_parser = subparsers.add_parser('decompress', help='compressed records -> MGF')
+    decompress_parser.add_argument('input', help='compressed records file, - for stdin')
+    decompress_parser.add_argument('-o', '--output', default='-', help='output .mgf file (default: stdout)')
+    decompress_parser.add_argument('-p', '--pipeline', choices=sorted(PIPELINES), default='b85')
+    decompress_parser.set_defaults(func=_decompress)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
-from typing import Protocol
-import brotli
-import gzip
+import os
+import struct
+import zlib
+from typing import Dict, Protocol
+
+# brotli and gzip are imported by the compressors that use them, on first call
 
 
 class DataCompressor(Protocol):
@@ -16,17 +19,21 @@ class DataCompressor(Protocol):
 
 class BrotliCompressor(DataCompressor):
     def compress(self, s: bytes) -> bytes:
+        import brotli
         return brotli.compress(s)
 
     def decompress(self, s: bytes) -> bytes:
+        import brotli
         return brotli.decompress(s)
 
 
 class GzipCompressor(DataCompressor):
     def compress(self, s: bytes) -> bytes:
+        import gzip
         return gzip.compress(s)
 
     def decompress(self, s: bytes) -> bytes:
+        import gzip
         return gzip.decompress(s)
 
 
@@ -36,3 +43,68 @@ class SkipCompressor(DataCompressor):
 
     def decompress(self, s: bytes) -> bytes:
         return s
+
+
+# dictionary id -> dictionary, shared by all DictionaryCompressors of the process
+_DICTIONARIES: Dict[int, bytes] = {}
+_DICTIONARY_ID = struct.Struct('>I')
+
+
+def register_dictionary(dictionary: bytes) -> int:
+    dictionary_id = zlib.crc32(dictionary)
+    if _DICTIONARIES.setdefault(dictionary_id, dictionary) != dictionary:
+        raise ValueError(f"Dictionary id {dictionary_id:08x} is already used by a different dictionary")
+    return dictionary_id
+
+
+class DictionaryCompressor(DataCompressor):
+    """
+    Raw deflate with a preset dictionary (see ``msms_compression.dictionary.train_dictionary``).
+
+    Every payload starts with the 4 byte id of its dictionary. Decompression looks the id up among the dictionaries
+    registered in this process, so payloads written with an older dictionary stay readable as long as it is loaded.
+    """
+
+    def __init__(self, dictionary: bytes, level: int = 6):
+        self.dictionary = bytes(dictionary)
+        self.dictionary_id = register_dictionary(self.dictionary)
+        self.level = level
+        # zlib preprocesses the dictionary when it is set, so keep primed streams around and copy them per call
+        self._compressobj = zlib.compressobj(self.level, zlib.DEFLATED, -15, zlib.DEF_MEM_LEVEL,
+                                             zlib.Z_DEFAULT_STRATEGY, self.dictionary)
+        self._decompressobjs = {}
+
+    @classmethod
+    def from_file(cls, path: str, level: int = 6) -> 'DictionaryCompressor':
+        path = os.path.abspath(path)
+        if (path, level) not in _LOADED:
+            with open(path, 'rb') as f:
+                _LOADED[(path, level)] = cls(f.read(), level)
+        return _LOADED[(path, level)]
+
+    def compress(self, s: bytes) -> bytes:
+        c = self._compressobj.copy()
+        return _DICTIONARY_ID.pack(self.dictionary_id) + c.compress(s) + c.flush()
+
+    def decompress(self, s: bytes) -> bytes:
+        dictionary_id, = _DICTIONARY_ID.unpack_from(s)
+        if dictionary_id not in self._decompressobjs:
+            if dictionary_id not in _DICTIONARIES:
+                raise ValueError(f"Unknown dictionary id {dictionary_id:08x}")
+            self._decompressobjs[dictionary_id] = zlib.decompressobj(-15, zdict=_DICTIONARIES[dictionary_id])
+        d = self._decompressobjs[dictionary_id].copy()
+        return d.decompress(memoryview(s)[_DICTIONARY_ID.size:]) + d.flush()
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.dictionary_id:08x})'
+
+    def __getstate__(self):
+        # zlib streams can't be pickled (process pools), they are rebuilt from the dictionary
+        return {'dictionary': self.dictionary, 'level': self.level}
+
+    def __setstate__(self, state):
+        self.__init__(state['dictionary'], state['level'])
+
+
+# (path, level) -> compressor, so dictionary files are read once per process
+_LOADED: Dict[tuple, DictionaryCompressor] = {}
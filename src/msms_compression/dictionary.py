@@ -0,0 +1,49 @@
+import heapq
+from collections import Counter
+from typing import Iterable, Union
+
+
+def train_dictionary(samples: Iterable[Union[str, bytes]], size: int = 4 * 1024, k: int = 4,
+                     segment_size: int = 64) -> bytes:
+    """
+    Build a preset dictionary for ``DictionaryCompressor`` from sample payloads (e.g. ``SpectrumCompressor`` outputs).
+
+    Samples are cut into overlapping segments which are greedily picked by how many samples share their k-mers
+    (similar to zstd's COVER trainer). The most useful segments are placed at the end of the dictionary, where
+    matches are cheapest to reference. Small dictionaries work best for payloads of a few hundred bytes; deflate
+    only looks back 32 KiB, so sizes above that don't help.
+    """
+    samples = [sample.encode('utf-8') if isinstance(sample, str) else bytes(sample) for sample in samples]
+
+    # number of samples each k-mer occurs in
+    frequency = Counter()
+    for sample in samples:
+        frequency.update({sample[i:i + k] for i in range(len(sample) - k + 1)})
+
+    heap = []
+    for sample in samples:
+        for start in range(0, max(len(sample) - segment_size, 0) + 1, segment_size // 2):
+            segment = sample[start:start + segment_size]
+            kmers = {segment[i:i + k] for i in range(len(segment) - k + 1) if frequency[segment[i:i + k]] > 1}
+            if kmers:
+                heap.append((-sum(frequency[kmer] for kmer in kmers), len(heap), segment, kmers))
+    heapq.heapify(heap)
+
+    # segment scores only drop as k-mers get covered, so stale heap entries are re-scored lazily
+    covered = set()
+    chosen = []
+    total = 0
+    while heap and total < size:
+        neg_score, i, segment, kmers = heapq.heappop(heap)
+        kmers -= covered
+        score = sum(frequency[kmer] for kmer in kmers)
+        if not score:
+            continue
+        if score < -neg_score:
+            heapq.heappush(heap, (-score, i, segment, kmers))
+            continue
+        chosen.append(segment)
+        covered |= kmers
+        total += len(segment)
+
+    return b''.join(reversed(chosen))[-size:]
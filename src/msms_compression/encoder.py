@@ -1,8 +1,6 @@
 import base64
 from typing import Protocol
 
-import lzstring
-
 
 class Encoder(Protocol):
     def encode(self, s: bytes) -> bytes:
@@ -31,26 +29,26 @@ class B85Encoder(Encoder):
         return base64.b85decode(s)
 
 
+# LZString works on text. Every byte becomes one character (latin-1), which keeps the output identical to compress.js
+# for the ASCII payloads of the text spectrum compressors and lets binary payloads through as well.
 class LzStringEncoder(Encoder):
-    def __init__(self):
-        self._lz = lzstring.LZString()
-
     def encode(self, s: bytes) -> bytes:
-        return self._lz.compressToBase64(s.decode('utf-8')).compress('utf-8')
+        from msms_compression import lz_string
+        return lz_string.compress_to_base64(str(s, 'latin-1')).encode('ascii')
 
     def decode(self, s: bytes) -> bytes:
-        return self._lz.decompressFromBase64(s.decode('utf-8')).compress('utf-8')
+        from msms_compression import lz_string
+        return lz_string.decompress_from_base64(str(s, 'ascii')).encode('latin-1')
 
 
 class LzStringUriEncoder(Encoder):
-    def __init__(self):
-        self._lz = lzstring.LZString()
-
     def encode(self, s: bytes) -> bytes:
-        return self._lz.compressToEncodedURIComponent(s.decode('utf-8')).compress('utf-8')
+        from msms_compression import lz_string
+        return lz_string.compress_to_encoded_uri_component(str(s, 'latin-1')).encode('ascii')
 
     def decode(self, s: bytes) -> bytes:
-        return self._lz.decompressFromEncodedURIComponent(s.decode('utf-8')).compress('utf-8')
+        from msms_compression import lz_string
+        return lz_string.decompress_from_encoded_uri_component(str(s, 'ascii')).encode('latin-1')
 
 
 class SkipEncoder(Encoder):
@@ -0,0 +1,93 @@
+"""
+Frames: groups of spectra compressed through one data compressor stream.
+
+Compressing spectra one at a time leaves brotli / gzip nothing to match across scans, while neighbouring MS2 scans of
+a run share many fragment ions. A frame puts the spectrum payloads of up to ``frame_size`` spectra behind an offset
+table and runs the data compressor and encoder once over all of it::
+
+    '<I' spectrum count, count + 1 '<u4' payload offsets, payloads
+
+Getting one spectrum out of a frame decompresses the whole frame but decodes only that spectrum's payload, so
+``frame_size`` trades compression ratio against the cost of random access.
+"""
+
+import struct
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from msms_compression.base_compressor import BaseCompressor
+from msms_compression.spectrum_compressor import Peaks
+
+_FRAME_HEADER = struct.Struct('<I')
+
+
+class FrameCompressor:
+    def __init__(self, compressor: BaseCompressor, frame_size: int = 16):
+        if frame_size < 1:
+            raise ValueError(f"frame_size must be at least 1, got {frame_size}")
+        self.compressor = compressor
+        self.frame_size = frame_size
+        # the last frame decompressed by get(), sequential reads of one frame only decompress it once
+        self._last: Optional[Tuple[str, bytes]] = None
+
+    def compress_frame(self, spectra: Sequence[Tuple[Peaks, Peaks]]) -> str:
+        """Compress up to ``frame_size`` (mzs, intensities) pairs into one frame."""
+        if len(spectra) > self.frame_size:
+            raise ValueError(f"A frame holds at most {self.frame_size} spectra, got {len(spectra)}")
+        spectrum_compressor = self.compressor._spectrum_compressor
+        payloads = [spectrum_compressor.compress(mzs, intensities) for mzs, intensities in spectra]
+        if not self.compressor._binary:
+            payloads = [s.encode('utf-8') for s in payloads]
+
+        offsets = np.zeros(len(payloads) + 1, dtype='<u4')
+        np.cumsum([len(b) for b in payloads], out=offsets[1:])
+        b = _FRAME_HEADER.pack(len(payloads)) + offsets.tobytes() + b''.join(payloads)
+        return self.compressor._encoder.encode(self.compressor._compressor.compress(b)).decode('utf-8')
+
+    def _frame_body(self, frame: str) -> bytes:
+        last = self._last
+        if last is not None and last[0] is frame:
+            return last[1]
+        b = self.compressor._compressor.decompress(self.compressor._encoder.decode(frame.encode('utf-8')))
+        self._last = (frame, b)
+        return b
+
+    def _payload(self, b: bytes, i: int) -> Union[str, bytes]:
+        n, = _FRAME_HEADER.unpack_from(b)
+        if not 0 <= i < n:
+            raise IndexError(f"Spectrum {i} out of range for a frame of {n}")
+        start, end = np.frombuffer(b, dtype='<u4', count=2, offset=_FRAME_HEADER.size + 4 * i).tolist()
+        payload = b[_FRAME_HEADER.size + 4 * (n + 1) + start:_FRAME_HEADER.size + 4 * (n + 1) + end]
+        return payload if self.compressor._binary else payload.decode('utf-8')
+
+    def get(self, frame: str, i: int, as_numpy: bool = False) -> (Peaks, Peaks):
+        """The ``i``-th spectrum of ``frame``, without decoding the other spectra in it."""
+        return self.compressor._spectrum_compressor.decompress(self._payload(self._frame_body(frame), i), as_numpy)
+
+    def decompress_frame(self, frame: str, as_numpy: bool = False) -> List[Tuple[Peaks, Peaks]]:
+        b = self._frame_body(frame)
+        n, = _FRAME_HEADER.unpack_from(b)
+        return [self.compressor._spectrum_compressor.decompress(self._payload(b, i), as_numpy) for i in range(n)]
+
+    def compress(self, spectra: Iterable[Tuple[Peaks, Peaks]]) -> List[str]:
+        """Compress spectra into frames of ``frame_size``, spectrum ``i`` ends up in frame ``i // frame_size``."""
+        frames, frame = [], []
+        for spectrum in spectra:
+            frame.append(spectrum)
+            if len(frame) == self.frame_size:
+                frames.append(self.compress_frame(frame))
+                frame = []
+        if frame:
+            frames.append(self.compress_frame(frame))
+        return frames
+
+    def decompress(self, frames: Iterable[str], as_numpy: bool = False) -> List[Tuple[Peaks, Peaks]]:
+        return [spectrum for frame in frames for spectrum in self.decompress_frame(frame, as_numpy)]
+
+    def get_spectrum(self, frames: Sequence[str], i: int, as_numpy: bool = False) -> (Peaks, Peaks):
+        """Spectrum ``i`` of the spectra passed to ``compress``, decompressing only the frame that holds it."""
+        return self.get(frames[i // self.frame_size], i % self.frame_size, as_numpy)
+
+    def __str__(self):
+        return f'{self.__class__.__name__}({self.compressor}|{self.frame_size})'
@@ -0,0 +1,320 @@
+"""
+Self-describing payloads: a short header in front of the compressed string names the pipeline that produced it.
+
+Header layout (all characters are URL safe)::
+
+    .<version><spectrum code><data code><encoder code>[param_param_...]~
+
+    .1fbk~          SpectrumCompressorF32, BrotliCompressor, B85Encoder
+    .1ibk3_1_~      SpectrumCompressorI32(3, 1), BrotliCompressor, B85Encoder
+
+The leading '.' is in none of the encoder alphabets (B85, URL safe base64, LZString) and can't start a JSON text
+payload, so headerless payloads are never mistaken for headers. Params are the constructor arguments of the spectrum
+compressor followed by those of the data compressor, in the order they were registered; unset (None) params are
+empty. Headers come from untrusted input, so every param has to be within the limits its codec was registered with.
+``decompress`` reads the header and dispatches to the matching pipeline, and ``AutoCompressor`` tries several
+pipelines per spectrum and keeps the smallest output.
+"""
+
+import inspect
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+from concurrent.futures import Executor
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from msms_compression.base_compressor import BaseCompressor
+from msms_compression.batch import run_batched, _compress_chunk, _decompress_chunk
+from msms_compression.data_compressor import DataCompressor, BrotliCompressor, GzipCompressor, SkipCompressor, \
+    DictionaryCompressor, _DICTIONARIES
+from msms_compression.encoder import Encoder, B85Encoder, UrlEncoder, LzStringEncoder, LzStringUriEncoder, \
+    SkipEncoder
+from msms_compression.instrumentation import Sink
+from msms_compression.quantize import MIN_BITS, MAX_BITS
+from msms_compression.spectrum_compressor import SpectrumCompressor, SpectrumCompressorF32, \
+    SpectrumCompressorF32Lossy, SpectrumCompressorString, SpectrumCompressorStringLossy, SpectrumCompressorI32, \
+    SpectrumCompressorBinary, SpectrumCompressorBinaryLossy, SpectrumCompressorPpm, SpectrumCompressorBinaryBlocks, \
+    SpectrumCompressorI32Binary, Peaks
+
+MARKER = '.'
+VERSION = 1
+TERMINATOR = '~'
+_SEPARATOR = '_'
+_HEADER_RE = re.compile(r'\.(\d)([a-z])([a-z])([a-z])([0-9a-z._-]{0,96})~')
+
+
+class _Codec(NamedTuple):
+    code: str
+    cls: type
+    # constructor arguments, read back from instances as attributes of the same name
+    attributes: Tuple[str, ...]
+    factory: Callable
+    # (min, max) per attribute; int bounds only accept ints
+    limits: Tuple[Tuple[Union[int, float], Union[int, float]], ...]
+    # attributes that may be None (the factory defaults them to None)
+    optional: frozenset
+
+
+_REGISTRY: Dict[str, Dict[str, _Codec]] = {'spectrum': {}, 'data': {}, 'encoder': {}}
+_CODES: Dict[type, _Codec] = {}
+
+
+def register(kind: str, code: str, cls: type, attributes: Sequence[str] = (), factory: Optional[Callable] = None,
+             limits: Optional[Dict[str, Tuple[Union[int, float], Union[int, float]]]] = None):
+    """
+    Give a compressor class a header code. ``kind`` is 'spectrum', 'data' or 'encoder' and codes are a single lower
+    case letter, unique per kind. ``factory`` builds an instance from the parsed attributes (default: ``cls``).
+    ``limits`` gives the (min, max) every attribute read from a header must be within.
+    """
+    if kind not in _REGISTRY:
+        raise ValueError(f"Unknown kind {kind!r}")
+    if not re.fullmatch('[a-z]', code):
+        raise ValueError(f"Codes are a single lower case letter, got {code!r}")
+    if code in _REGISTRY[kind] and _REGISTRY[kind][code].cls is not cls:
+        raise ValueError(f"Code {code!r} is already used by {_REGISTRY[kind][code].cls.__name__}")
+    limits = limits or {}
+    missing = [attribute for attribute in attributes if attribute not in limits]
+    if missing:
+        raise ValueError(f"No limits for {', '.join(missing)}")
+    factory = factory or cls
+    defaults = inspect.signature(factory).parameters
+    optional = frozenset(attribute for attribute in attributes
+                         if attribute in defaults and defaults[attribute].default is None)
+    codec = _Codec(code, cls, tuple(attributes), factory, tuple(limits[attribute] for attribute in attributes),
+                   optional)
+    _REGISTRY[kind][code] = codec
+    _CODES[cls] = codec
+
+
+def _load_dictionary(dictionary_id: int) -> DictionaryCompressor:
+    if dictionary_id not in _DICTIONARIES:
+        raise ValueError(f"Unknown dictionary id {dictionary_id:08x}")
+    return DictionaryCompressor(_DICTIONARIES[dictionary_id])
+
+
+# limits of the params the built-in codecs share
+_PRECISION = (0, 6)
+_MAX_ERROR = (1e-6, 100.0)
+_BLOCK_SIZE = (1, 1 << 16)
+_PRECISIONS = {'mz_precision': _PRECISION, 'intensity_precision': _PRECISION, 'max_error': _MAX_ERROR}
+
+register('spectrum', 'f', SpectrumCompressorF32)
+register('spectrum', 'l', SpectrumCompressorF32Lossy, ('n_bits', 'max_error'),
+         limits={'n_bits': (1, 4), 'max_error': _MAX_ERROR})
+register('spectrum', 's', SpectrumCompressorString, ('mz_precision', 'intensity_precision'), limits=_PRECISIONS)
+register('spectrum', 't', SpectrumCompressorStringLossy,
+         ('mz_precision', 'intensity_precision', 'max_error'), limits=_PRECISIONS)
+register('spectrum', 'i', SpectrumCompressorI32, ('mz_precision', 'intensity_precision', 'max_error'),
+         limits=_PRECISIONS)
+register('spectrum', 'j', SpectrumCompressorI32Binary,
+         ('mz_precision', 'intensity_precision', 'max_error', 'block_size'),
+         limits={**_PRECISIONS, 'block_size': _BLOCK_SIZE})
+register('spectrum', 'b', SpectrumCompressorBinary)
+register('spectrum', 'c', SpectrumCompressorBinaryLossy, ('bits', 'max_error'),
+         limits={'bits': (MIN_BITS, MAX_BITS), 'max_error': _MAX_ERROR})
+register('spectrum', 'p', SpectrumCompressorPpm, ('tolerance_ppm', 'max_error'),
+         limits={'tolerance_ppm': (0.01, 1000.0), 'max_error': _MAX_ERROR})
+register('spectrum', 'q', SpectrumCompressorBinaryBlocks, ('block_size',), limits={'block_size': _BLOCK_SIZE})
+
+register('data', 'b', BrotliCompressor)
+register('data', 'g', GzipCompressor)
+register('data', 'n', SkipCompressor)
+# the dictionary itself isn't in the header, it has to be registered in the reading process
+register('data', 'd', DictionaryCompressor, ('dictionary_id',), _load_dictionary,
+         limits={'dictionary_id': (0, 0xFFFFFFFF)})
+
+register('encoder', 'k', B85Encoder)
+register('encoder', 'u', UrlEncoder)
+register('encoder', 'l', LzStringEncoder)
+register('encoder', 'z', LzStringUriEncoder)
+register('encoder', 'n', SkipEncoder)
+
+
+def _codec(obj) -> _Codec:
+    codec = _CODES.get(type(obj))
+    if codec is None:
+        raise ValueError(f"{type(obj).__name__} has no header code, see msms_compression.header.register")
+    return codec
+
+
+def _format_param(value) -> str:
+    return '' if value is None else str(value)
+
+
+def _parse_param(value: str) -> Union[int, float, None]:
+    # optional params that aren't set are written as empty strings
+    if not value:
+        return None
+    return int(value) if value.lstrip('-').isdigit() else float(value)
+
+
+def _check_params(codec: _Codec, params: Sequence[Union[int, float, None]]) -> None:
+    for attribute, (lo, hi), value in zip(codec.attributes, codec.limits, params):
+        if value is None:
+            if attribute not in codec.optional:
+                raise ValueError(f"{codec.cls.__name__} needs {attribute}")
+        elif isinstance(lo, int) and isinstance(hi, int) and not isinstance(value, int):
+            raise ValueError(f"{codec.cls.__name__} {attribute} must be an integer, got {value}")
+        elif not lo <= value <= hi:
+            raise ValueError(f"{codec.cls.__name__} {attribute} must be between {lo} and {hi}, got {value}")
+
+
+def make_header(spectrum_compressor: SpectrumCompressor, data_compressor: DataCompressor, encoder: Encoder) -> str:
+    codecs = [_codec(spectrum_compressor), _codec(data_compressor), _codec(encoder)]
+    for obj, codec in zip((spectrum_compressor, data_compressor), codecs):
+        # readers would refuse a header with params out of range
+        _check_params(codec, [getattr(obj, attribute) for attribute in codec.attributes])
+    params = [_format_param(getattr(obj, attribute))
+              for obj, codec in zip((spectrum_compressor, data_compressor), codecs) for attribute in codec.attributes]
+    return f"{MARKER}{VERSION}{''.join(codec.code for codec in codecs)}{_SEPARATOR.join(params)}{TERMINATOR}"
+
+
+def split_header(s: str) -> Tuple[Optional[str], str]:
+    """Split a payload into (header, body). The header is None if the payload doesn't start with one."""
+    match = _HEADER_RE.match(s)
+    if match is None:
+        return None, s
+    return match.group(0), s[match.end():]
+
+
+@lru_cache(maxsize=256)
+def pipeline_for_header(header: str) -> BaseCompressor:
+    """The (cached) BaseCompressor that reads payloads with this header."""
+    match = _HEADER_RE.fullmatch(header)
+    if match is None:
+        raise ValueError(f"Invalid header {header!r}")
+    version, spectrum_code, data_code, encoder_code, params = match.groups()
+    if int(version) != VERSION:
+        raise ValueError(f"Unsupported header version {version}")
+
+    codecs = []
+    for kind, code in (('spectrum', spectrum_code), ('data', data_code), ('encoder', encoder_code)):
+        if code not in _REGISTRY[kind]:
+            raise ValueError(f"Unknown {kind} code {code!r}")
+        codecs.append(_REGISTRY[kind][code])
+
+    n_spectrum, n_data = len(codecs[0].attributes), len(codecs[1].attributes)
+    params = params.split(_SEPARATOR) if params else []
+    if len(params) != n_spectrum + n_data:
+        raise ValueError(f"Invalid header {header!r}: expected {n_spectrum + n_data} params")
+    params = [_parse_param(param) for param in params]
+    _check_params(codecs[0], params[:n_spectrum])
+    _check_params(codecs[1], params[n_spectrum:])
+
+    return BaseCompressor(codecs[0].factory(*params[:n_spectrum]), codecs[1].factory(*params[n_spectrum:]),
+                          codecs[2].factory())
+
+
+def _pipeline_for_payload(s: str, default: Optional[BaseCompressor]) -> (BaseCompressor, str):
+    header, body = split_header(s)
+    if header is not None:
+        try:
+            return pipeline_for_header(header), body
+        except ValueError:
+            # an unreadable header (unknown codec, params out of range), left to the default pipeline if there is one
+            if default is None:
+                raise
+            return default, s
+    if default is None:
+        raise ValueError("Payload has no header and no default compressor was given")
+    return default, body
+
+
+def decompress(s: str, as_numpy: bool = False, default: Optional[BaseCompressor] = None) -> (Peaks, Peaks):
+    """
+    Decompress a self-describing payload with the pipeline named in its header. Payloads without a header are
+    decompressed with ``default`` (e.g. ``SpectrumCompressorB85`` for data written before headers existed).
+    """
+    pipeline, body = _pipeline_for_payload(s, default)
+    if as_numpy:
+        return pipeline.decompress(body, as_numpy=True)
+    return pipeline.decompress(body)
+
+
+async def adecompress(s: str, as_numpy: bool = False, default: Optional[BaseCompressor] = None) -> (Peaks, Peaks):
+    """``decompress`` for asyncio code, see ``BaseCompressor.adecompress``."""
+    pipeline, body = _pipeline_for_payload(s, default)
+    return await pipeline.adecompress(body, as_numpy)
+
+
+class SelfDescribingCompressor(BaseCompressor):
+    """A BaseCompressor whose output starts with the header of its pipeline."""
+
+    def __init__(self, _compressor: SpectrumCompressor, _data_compressor: DataCompressor, _encoder: Encoder,
+                 instrumentation: Optional[Sink] = None):
+        super().__init__(_compressor, _data_compressor, _encoder, instrumentation)
+        self.header = make_header(_compressor, _data_compressor, _encoder)
+
+    def compress(self, mzs: Peaks, intensities: Peaks) -> str:
+        return self.header + super().compress(mzs, intensities)
+
+    def decompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
+        if not s.startswith(self.header):
+            # written by another pipeline
+            return decompress(s, as_numpy)
+        return super().decompress(s[len(self.header):], as_numpy)
+
+    async def acompress(self, mzs: Peaks, intensities: Peaks) -> str:
+        return self.header + await super().acompress(mzs, intensities)
+
+    async def adecompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
+        if not s.startswith(self.header):
+            return await adecompress(s, as_numpy)
+        return await super().adecompress(s[len(self.header):], as_numpy)
+
+    def __str__(self):
+        return f'SelfDescribing({super().__str__()})'
+
+
+class AutoCompressor:
+    """
+    Compress every spectrum with several candidate pipelines and keep the smallest (self-describing) output.
+
+    Candidates are tried in order until ``time_budget`` seconds have been spent on a spectrum, so put the pipelines
+    that are usually best first; the first candidate is always tried. ``chosen`` counts how often each pipeline won.
+    All candidates should be lossless, or equally lossy, since readers get whichever output was smallest.
+    """
+
+    def __init__(self, candidates: Optional[Sequence[BaseCompressor]] = None, time_budget: float = 0.005):
+        if candidates is None:
+            candidates = [BaseCompressor(SpectrumCompressorBinary(), BrotliCompressor(), B85Encoder()),
+                          BaseCompressor(SpectrumCompressorF32(), BrotliCompressor(), B85Encoder()),
+                          BaseCompressor(SpectrumCompressorBinary(), GzipCompressor(), B85Encoder())]
+        if not candidates:
+            raise ValueError("AutoCompressor needs at least one candidate")
+        self.candidates = [candidate if isinstance(candidate, SelfDescribingCompressor) else
+                           SelfDescribingCompressor(candidate._spectrum_compressor, candidate._compressor,
+                                                    candidate._encoder) for candidate in candidates]
+        self.time_budget = time_budget
+        self.chosen = Counter()
+
+    def compress(self, mzs: Peaks, intensities: Peaks) -> str:
+        start = time.perf_counter()
+        best, best_candidate = None, None
+        for candidate in self.candidates:
+            s = candidate.compress(mzs, intensities)
+            if best is None or len(s) < len(best):
+                best, best_candidate = s, candidate
+            if time.perf_counter() - start >= self.time_budget:
+                break
+        self.chosen[str(best_candidate)] += 1
+        return best
+
+    def decompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
+        return decompress(s, as_numpy)
+
+    def compress_many(self, spectra: Iterable[Tuple[List[float], List[float]]],
+                      executor: Union[str, Executor] = 'process', max_workers: Optional[int] = None,
+                      chunk_size: int = 64) -> Iterator[Union[str, Exception]]:
+        """See ``BaseCompressor.compress_many``. ``chosen`` is only updated for spectra compressed in this process."""
+        return run_batched(_compress_chunk, self, spectra, executor, max_workers, chunk_size)
+
+    def decompress_many(self, compressed: Iterable[str], executor: Union[str, Executor] = 'process',
+                        max_workers: Optional[int] = None,
+                        chunk_size: int = 64) -> Iterator[Union[Tuple[List[float], List[float]], Exception]]:
+        """See ``BaseCompressor.decompress_many``."""
+        return run_batched(_decompress_chunk, self, compressed, executor, max_workers, chunk_size)
+
+    def __str__(self):
+        return f"AutoCompressor({', '.join(str(candidate) for candidate in self.candidates)})"
@@ -0,0 +1,147 @@
+"""
+Per-stage timing and size instrumentation for ``BaseCompressor``.
+
+Set ``instrumentation`` on a BaseCompressor to a sink and every compress / decompress call reports the wall time of
+each stage (spectrum compressor, utf-8 conversion, data compressor, encoder) and the size of the intermediate
+payloads. Without a sink the compressor skips all of this, the only cost is one attribute check per call.
+
+    metrics = PrometheusSink()
+    compressor = BaseCompressor(SpectrumCompressorF32(), BrotliCompressor(), B85Encoder(), instrumentation=metrics)
+    ...
+    print(metrics.render())
+"""
+
+import logging
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Protocol, Sequence, Tuple
+
+TIME_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Fixed bucket histogram; ``counts[i]`` counts values <= ``buckets[i]``, the last count is the overflow."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf if it is the overflow bucket)."""
+        if not self.count:
+            return float('nan')
+        rank, total = q * self.count, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float('inf')
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else float('nan'),
+                'p50': self.quantile(0.5), 'p99': self.quantile(0.99)}
+
+
+class Sink(Protocol):
+    def record(self, pipeline: str, operation: str, timings: List[Tuple[str, float]],
+               sizes: List[Tuple[str, int]]) -> None:
+        # timings: (stage, seconds) in call order, sizes: (stage, bytes) of each stage's output
+        pass
+
+
+class InMemorySink(Sink):
+    """Aggregates every call into per (pipeline, operation, stage) histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings: Dict[Tuple[str, str, str], Histogram] = {}
+        self.sizes: Dict[Tuple[str, str, str], Histogram] = {}
+
+    def record(self, pipeline: str, operation: str, timings: List[Tuple[str, float]],
+               sizes: List[Tuple[str, int]]) -> None:
+        with self._lock:
+            for stage, seconds in timings:
+                key = (pipeline, operation, stage)
+                if key not in self.timings:
+                    self.timings[key] = Histogram(TIME_BUCKETS)
+                self.timings[key].observe(seconds)
+            for stage, size in sizes:
+                key = (pipeline, operation, stage)
+                if key not in self.sizes:
+                    self.sizes[key] = Histogram(SIZE_BUCKETS)
+                self.sizes[key].observe(size)
+
+    def snapshot(self) -> dict:
+        """{pipeline: {operation: {stage: {'seconds': {...}, 'bytes': {...}}}}}"""
+        result = {}
+        with self._lock:
+            for name, histograms in (('seconds', self.timings), ('bytes', self.sizes)):
+                for (pipeline, operation, stage), histogram in histograms.items():
+                    stages = result.setdefault(pipeline, {}).setdefault(operation, {})
+                    stages.setdefault(stage, {})[name] = histogram.to_dict()
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self.timings.clear()
+            self.sizes.clear()
+
+
+class LoggingSink(Sink):
+    """Logs one line per call, for tracing individual slow calls."""
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger('msms_compression')
+        self.level = level
+
+    def record(self, pipeline: str, operation: str, timings: List[Tuple[str, float]],
+               sizes: List[Tuple[str, int]]) -> None:
+        if self.logger.isEnabledFor(self.level):
+            stages = ' '.join(f'{stage}={seconds * 1e3:.3f}ms' for stage, seconds in timings)
+            payloads = ' '.join(f'{stage}={size}B' for stage, size in sizes)
+            self.logger.log(self.level, '%s %s %s %s', pipeline, operation, stages, payloads)
+
+
+def _labels(pipeline: str, operation: str, stage: str) -> str:
+    pipeline = pipeline.replace('\\', '\\\\').replace('"', '\\"')
+    return f'pipeline="{pipeline}",operation="{operation}",stage="{stage}"'
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound)) if bound != float('inf') else '+Inf'
+
+
+class PrometheusSink(InMemorySink):
+    """InMemorySink that renders its histograms in the Prometheus text exposition format."""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, namespace: str = 'msms_compression'):
+        super().__init__()
+        self.namespace = namespace
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, unit, histograms in (('stage_seconds', 'Wall time per compression stage', self.timings),
+                                           ('stage_bytes', 'Output size per compression stage', self.sizes)):
+                metric = f'{self.namespace}_{name}'
+                lines.append(f'# HELP {metric} {unit}')
+                lines.append(f'# TYPE {metric} histogram')
+                for key, histogram in sorted(histograms.items()):
+                    labels = _labels(*key)
+                    total = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        total += count
+                        lines.append(f'{metric}_bucket{{{labels},le="{_format_bound(bound)}"}} {total}')
+                    lines.append(f'{metric}_sum{{{labels}}} {histogram.sum!r}')
+                    lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,197 @@
+"""
+LZString (https://github.com/pieroxy/lz-string) compression, output compatible with the JavaScript library that
+``compress.js`` uses (``LZString.compressToEncodedURIComponent`` / ``compressToBase64``).
+
+The LZ pass has to walk the input one character at a time, but it keys its dictionary on (prefix code, character)
+pairs instead of growing strings, and only records (value, bit width) tokens. The bit stream is then assembled for
+all tokens at once with numpy and mapped onto the output alphabet through a lookup table. Decompression turns the
+input into a bit stream up front and reads every code out of a precomputed 64 bit window.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+_BASE64 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+_URI = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+-$'
+_BITS_PER_CHAR = 6
+
+
+def _alphabet_values(alphabet: str) -> np.ndarray:
+    values = np.full(128, 0xFF, dtype=np.uint8)
+    values[np.frombuffer(alphabet.encode('ascii'), dtype=np.uint8)] = np.arange(len(alphabet), dtype=np.uint8)
+    return values
+
+
+_BASE64_CHARS = np.frombuffer(_BASE64.encode('ascii'), dtype=np.uint8)
+_URI_CHARS = np.frombuffer(_URI.encode('ascii'), dtype=np.uint8)
+_BASE64_VALUES = _alphabet_values(_BASE64)
+_URI_VALUES = _alphabet_values(_URI)
+
+
+def _utf16_units(s: str) -> str:
+    # JavaScript strings are UTF-16, characters outside the BMP are two code units (a surrogate pair)
+    if s.isascii() or max(s) <= '\uffff':
+        return s
+    return ''.join(map(chr, np.frombuffer(s.encode('utf-16-le', 'surrogatepass'), dtype='<u2').tolist()))
+
+
+def _from_utf16_units(s: str) -> str:
+    if s.isascii() or not any('\ud800' <= c <= '\udfff' for c in s):
+        return s
+    return s.encode('utf-16-le', 'surrogatepass').decode('utf-16-le', 'surrogatepass')
+
+
+def _tokens(s: str) -> Tuple[List[int], List[int]]:
+    """The LZString code stream of ``s`` as parallel lists of values and bit widths."""
+    values, widths = [], []
+    chars = {}  # single characters -> code
+    codes = {}  # (prefix code, next character) -> code
+    pending = set()  # characters whose literal hasn't been written yet
+    dict_size, num_bits, enlarge_in = 3, 2, 2
+    w, w_char = None, None  # code of the current prefix, and its character if it is a single one
+
+    def emit_literal(char: str):
+        # first use of a character: a 0 / 1 code followed by its 8 / 16 bit literal, which takes a code of its own
+        nonlocal num_bits, enlarge_in
+        code = ord(char)
+        values.extend((0, code) if code < 256 else (1, code))
+        widths.extend((num_bits, 8 if code < 256 else 16))
+        enlarge_in -= 1
+        if enlarge_in == 0:
+            enlarge_in, num_bits = 1 << num_bits, num_bits + 1
+        pending.discard(char)
+
+    # the loop runs once per input character, it avoids attribute lookups and calls on the common paths
+    get_code, append_value, append_width = codes.get, values.append, widths.append
+    for c in s:
+        if c not in chars:
+            chars[c] = dict_size
+            dict_size += 1
+            pending.add(c)
+        if w is None:
+            w, w_char = chars[c], c
+            continue
+        wc = get_code((w, c))
+        if wc is not None:
+            w, w_char = wc, None
+            continue
+        if pending and w_char in pending:
+            emit_literal(w_char)
+        else:
+            append_value(w)
+            append_width(num_bits)
+        enlarge_in -= 1
+        if enlarge_in == 0:
+            enlarge_in, num_bits = 1 << num_bits, num_bits + 1
+        codes[(w, c)] = dict_size
+        dict_size += 1
+        w, w_char = chars[c], c
+
+    if w is not None:
+        if w_char in pending:
+            emit_literal(w_char)
+        else:
+            append_value(w)
+            append_width(num_bits)
+        enlarge_in -= 1
+        if enlarge_in == 0:
+            num_bits += 1
+    # end of stream
+    append_value(2)
+    append_width(num_bits)
+    return values, widths
+
+
+def _compress(s: str, alphabet: np.ndarray) -> str:
+    values, widths = _tokens(_utf16_units(s))
+    values, widths = np.array(values, dtype=np.uint32), np.array(widths, dtype=np.uint8)
+    # every value is written least significant bit first
+    shifts = np.arange(int(widths.max()), dtype=np.uint32)
+    bits = ((values[:, None] >> shifts) & 1).astype(np.uint8)[shifts < widths[:, None]]
+    # the last character is zero padded, and a whole zero character is added when the bits end on a boundary
+    n_chars = len(bits) // _BITS_PER_CHAR + 1
+    stream = np.zeros(n_chars * _BITS_PER_CHAR, dtype=np.uint8)
+    stream[:len(bits)] = bits
+    # characters hold their bits most significant first
+    char_values = np.packbits(stream.reshape(-1, _BITS_PER_CHAR), axis=1, bitorder='big') >> (8 - _BITS_PER_CHAR)
+    return alphabet[char_values.reshape(-1)].tobytes().decode('ascii')
+
+
+def _decompress(s: str, alphabet_values: np.ndarray) -> str:
+    if not s:
+        return ''
+    raw = np.frombuffer(s.encode('ascii'), dtype=np.uint8)
+    if np.any(alphabet_values[raw] == 0xFF):
+        raise ValueError("Invalid LZString character")
+    stream = np.unpackbits(alphabet_values[raw][:, None], axis=1)[:, 8 - _BITS_PER_CHAR:].reshape(-1)
+    # repacked least significant bit first, bit p of the stream is bit p % 8 of the little endian 64 bit window that
+    # starts at byte p // 8. Reads past the end return zeros, like the JavaScript decoder.
+    n_bytes = (len(stream) + 7) // 8
+    packed = np.zeros(n_bytes + 8, dtype=np.uint8)
+    packed[:n_bytes] = np.packbits(stream, bitorder='little')
+    windows = np.lib.stride_tricks.sliding_window_view(packed, 8)[:n_bytes + 1].copy().view('<u8').reshape(-1)
+    windows = windows.tolist()
+    n_bits = len(stream)
+
+    position = 2
+    first = windows[0] & 3
+    if first == 2:
+        return ''
+    if first > 1:
+        raise ValueError("Invalid LZString data")
+    literal_bits = 8 if first == 0 else 16
+    w = chr((windows[position >> 3] >> (position & 7)) & ((1 << literal_bits) - 1))
+    position += literal_bits
+    dictionary = ['', '', '', w]
+    result = [w]
+    num_bits, enlarge_in = 3, 4
+    while True:
+        if position >= n_bits:
+            raise ValueError("Truncated LZString data")
+        c = (windows[position >> 3] >> (position & 7)) & ((1 << num_bits) - 1)
+        position += num_bits
+        if c == 2:
+            return _from_utf16_units(''.join(result))
+        if c < 2:
+            # a new character: 8 / 16 bit literal
+            literal_bits = 8 if c == 0 else 16
+            dictionary.append(chr((windows[position >> 3] >> (position & 7)) & ((1 << literal_bits) - 1)))
+            position += literal_bits
+            c = len(dictionary) - 1
+            enlarge_in -= 1
+            if enlarge_in == 0:
+                enlarge_in, num_bits = 1 << num_bits, num_bits + 1
+
+        if c < len(dictionary):
+            entry = dictionary[c]
+        elif c == len(dictionary):
+            entry = w + w[0]
+        else:
+            raise ValueError("Invalid LZString data")
+        result.append(entry)
+        dictionary.append(w + entry[0])
+        w = entry
+        enlarge_in -= 1
+        if enlarge_in == 0:
+            enlarge_in, num_bits = 1 << num_bits, num_bits + 1
+
+
+def compress_to_base64(s: str) -> str:
+    """``LZString.compressToBase64``."""
+    compressed = _compress(s, _BASE64_CHARS)
+    return compressed + '=' * (-len(compressed) % 4)
+
+
+def decompress_from_base64(s: str) -> str:
+    return _decompress(s.rstrip('='), _BASE64_VALUES)
+
+
+def compress_to_encoded_uri_component(s: str) -> str:
+    """``LZString.compressToEncodedURIComponent``."""
+    return _compress(s, _URI_CHARS)
+
+
+def decompress_from_encoded_uri_component(s: str) -> str:
+    # '+' turns into a space when the string went through URL decoding
+    return _decompress(s.replace(' ', '+'), _URI_VALUES)
@@ -0,0 +1,303 @@
+"""
+NumPy implementations of the delta / hex encodings in :mod:`msms_compression.utils`.
+
+The functions here work on whole arrays instead of one peak at a time, but produce (and accept) exactly the same
+strings as their pure-python counterparts, so payloads stay compatible with ``utils`` and ``compress.js``.
+Decoders return numpy arrays rather than generators.
+"""
+
+from typing import List, Union
+
+import numpy as np
+
+_HEX_CHARS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+_NIBBLE_SHIFTS = np.arange(28, -4, -4, dtype=np.uint32)
+_NIBBLE_POSITIONS = np.arange(8)
+_BYTE_POSITIONS = np.arange(4)
+
+# ascii code -> nibble value (0xFF for non-hex characters)
+_HEX_VALUES = np.full(256, 0xFF, dtype=np.uint8)
+_HEX_VALUES[np.frombuffer(b'0123456789abcdef', dtype=np.uint8)] = np.arange(16, dtype=np.uint8)
+_HEX_VALUES[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16, dtype=np.uint8)
+
+
+def _float_bits(vals: Union[List[float], np.ndarray]) -> np.ndarray:
+    # struct.pack('!f', ...) refuses finite values outside the float32 range, do the same instead of writing inf
+    with np.errstate(over='raise'):
+        try:
+            vals = np.ascontiguousarray(vals, dtype=np.float32)
+        except FloatingPointError:
+            raise OverflowError("float too large to pack with f format") from None
+    return vals.view(np.uint32)
+
+
+def _int_bits(vals: Union[List[int], np.ndarray]) -> np.ndarray:
+    vals = np.asarray(vals, dtype=np.int64)
+    if vals.size and (vals.min() < -2 ** 31 or vals.max() > 0xFFFFFFFF):
+        raise ValueError("Values must fit in 32 bits")
+    return (vals & 0xFFFFFFFF).astype(np.uint32)
+
+
+def _nibbles(vals: np.ndarray) -> np.ndarray:
+    """(n,) uint32 -> (n, 8) array of nibbles, most significant first."""
+    return ((vals[:, None] >> _NIBBLE_SHIFTS) & 0xF).astype(np.uint8)
+
+
+def _from_nibbles(nibbles: np.ndarray) -> np.ndarray:
+    """(n, 8) array of nibbles -> (n,) uint32."""
+    return np.bitwise_or.reduce(nibbles.astype(np.uint32) << _NIBBLE_SHIFTS, axis=1).astype(np.uint32)
+
+
+def _hex_to_nibbles(s: Union[str, bytes]) -> np.ndarray:
+    if isinstance(s, str):
+        s = s.encode('ascii')
+    nibbles = _HEX_VALUES[np.frombuffer(s, dtype=np.uint8)]
+    if np.any(nibbles == 0xFF):
+        raise ValueError("Invalid hex string")
+    return nibbles
+
+
+def _count_leading_zeros(nibbles: np.ndarray) -> np.ndarray:
+    """Leading zero nibbles per row, 8 for an all-zero row (matches ``len(s) - len(s.lstrip('0'))``)."""
+    nonzero = nibbles != 0
+    return np.where(nonzero.any(axis=1), nonzero.argmax(axis=1), 8)
+
+
+def _delta_encode_single_chars(bits: np.ndarray) -> (np.ndarray, np.ndarray):
+    """The two parts of a delta encoded string as ascii arrays: the hex deltas and the reversed leading zero codes."""
+    deltas = np.empty_like(bits)
+    deltas[:1] = bits[:1]
+    np.subtract(bits[1:], bits[:-1], out=deltas[1:])  # uint32 arithmetic wraps like `& 0xFFFFFFFF`
+
+    nibbles = _nibbles(deltas)
+    leading_zeros = _count_leading_zeros(nibbles)
+    return _HEX_CHARS[nibbles[_NIBBLE_POSITIONS >= leading_zeros[:, None]]], _HEX_CHARS[leading_zeros[::-1]]
+
+
+def _delta_encode_single_string(bits: np.ndarray) -> str:
+    hex_delta_chars, leading_zero_chars = _delta_encode_single_chars(bits)
+    return (hex_delta_chars.tobytes() + leading_zero_chars.tobytes()).decode('ascii')
+
+
+def _delta_decode_single_string(s: str) -> np.ndarray:
+    codes = _hex_to_nibbles(s[::-1]).astype(np.int64)
+
+    # Each peak takes (8 - lz) hex chars + 1 leading zero char. Leading zero codes are read from the back of the
+    # string, so the number of peaks is the first n for which those widths add up to the string length.
+    consumed = np.cumsum(9 - codes)
+    matches = np.flatnonzero(consumed == len(s))
+    if not len(matches) or np.any(codes[:matches[0] + 1] > 8):
+        raise ValueError("Invalid delta encoded string")
+    leading_zeros = codes[:matches[0] + 1]
+
+    nibbles = np.zeros((len(leading_zeros), 8), dtype=np.uint8)
+    nibbles[_NIBBLE_POSITIONS >= leading_zeros[:, None]] = _hex_to_nibbles(s[:len(s) - len(leading_zeros)])
+    return np.cumsum(_from_nibbles(nibbles), dtype=np.uint32)
+
+
+def delta_encode_single_string_float(vals: Union[List[float], np.ndarray]) -> str:
+    return _delta_encode_single_string(_float_bits(vals))
+
+
+def delta_decode_single_string_float(s: str) -> np.ndarray:
+    return _delta_decode_single_string(s).view(np.float32)
+
+
+def delta_encode_single_string_int(vals: Union[List[int], np.ndarray]) -> str:
+    return _delta_encode_single_string(_int_bits(vals))
+
+
+def delta_decode_single_string_int(s: str) -> np.ndarray:
+    return _delta_decode_single_string(s).astype(np.int64)
+
+
+def _hex_chars(vals: Union[List[float], np.ndarray]) -> np.ndarray:
+    return _HEX_CHARS[_nibbles(_float_bits(vals))]
+
+
+def hex_encode(intensities: Union[List[float], np.ndarray]) -> str:
+    return _hex_chars(intensities).tobytes().decode('ascii')
+
+
+def hex_decode(s: str) -> np.ndarray:
+    if len(s) % 8:
+        raise ValueError("Invalid hex string")
+    return _from_nibbles(_hex_to_nibbles(s).reshape(-1, 8)).view(np.float32)
+
+
+def _binary_delta_parts(deltas: np.ndarray) -> (np.ndarray, np.ndarray):
+    """The leading zero byte count of every uint32 delta and the significant (big-endian) bytes of all deltas."""
+    delta_bytes = deltas.astype('>u4').view(np.uint8).reshape(-1, 4)
+    nonzero = delta_bytes != 0
+    leading_zeros = np.where(nonzero.any(axis=1), nonzero.argmax(axis=1), 4).astype(np.uint8)
+    return leading_zeros, delta_bytes[_BYTE_POSITIONS >= leading_zeros[:, None]]
+
+
+def _pack_nibbles(vals: np.ndarray) -> np.ndarray:
+    """Two 4-bit values per byte, high nibble first, padded with a zero nibble to whole bytes."""
+    nibbles = np.zeros(len(vals) + len(vals) % 2, dtype=np.uint8)
+    nibbles[:len(vals)] = vals
+    return (nibbles[0::2] << 4) | nibbles[1::2]
+
+
+def _unpack_nibbles(b: bytes, count: int, offset: int = 0, start: int = 0) -> np.ndarray:
+    """``count`` nibbles starting at nibble ``start`` of the ``_pack_nibbles`` output at byte ``offset`` of ``b``."""
+    skip = start % 2
+    packed = np.frombuffer(b, dtype=np.uint8, count=(skip + count + 1) // 2, offset=offset + start // 2)
+    nibbles = np.empty(2 * len(packed), dtype=np.uint8)
+    nibbles[0::2] = packed >> 4
+    nibbles[1::2] = packed & 0xF
+    return nibbles[skip:skip + count]
+
+
+def _binary_deltas(leading_zeros: np.ndarray, b: bytes, offset: int = 0) -> (np.ndarray, int):
+    """Rebuild uint32 deltas from their leading zero byte counts and the significant bytes at ``offset`` of ``b``,
+    returns the deltas and the number of significant bytes read."""
+    if np.any(leading_zeros > 4):
+        raise ValueError("Invalid delta encoded bytes")
+    n_delta_bytes = int(len(leading_zeros) * 4 - leading_zeros.sum(dtype=np.int64))
+    delta_bytes = np.zeros((len(leading_zeros), 4), dtype=np.uint8)
+    delta_bytes[_BYTE_POSITIONS >= leading_zeros[:, None]] = np.frombuffer(b, dtype=np.uint8, count=n_delta_bytes,
+                                                                           offset=offset)
+    return delta_bytes.view('>u4').reshape(-1).astype(np.uint32), n_delta_bytes
+
+
+def _delta_encode_binary_parts(bits: np.ndarray) -> (np.ndarray, np.ndarray):
+    """The packed leading zero byte codes and the significant delta bytes, the two parts of ``_delta_encode_binary``."""
+    deltas = np.empty_like(bits)
+    deltas[:1] = bits[:1]
+    np.subtract(bits[1:], bits[:-1], out=deltas[1:])
+    # two 4-bit leading zero byte codes per byte, followed by the significant bytes of every delta
+    leading_zeros, significant_bytes = _binary_delta_parts(deltas)
+    return _pack_nibbles(leading_zeros), significant_bytes
+
+
+def _delta_encode_binary(bits: np.ndarray) -> bytes:
+    packed_codes, significant_bytes = _delta_encode_binary_parts(bits)
+    return packed_codes.tobytes() + significant_bytes.tobytes()
+
+
+def _delta_decode_binary(b: bytes, n: int) -> (np.ndarray, int):
+    n_code_bytes = (n + 1) // 2
+    deltas, n_delta_bytes = _binary_deltas(_unpack_nibbles(b, n), b, n_code_bytes)
+    return np.cumsum(deltas, dtype=np.uint32), n_code_bytes + n_delta_bytes
+
+
+def delta_encode_binary_float(vals: Union[List[float], np.ndarray]) -> bytes:
+    return _delta_encode_binary(_float_bits(vals))
+
+
+def delta_decode_binary_float(b: bytes, n: int) -> (np.ndarray, int):
+    """Decode ``n`` values from the start of ``b``, returns the values and the number of bytes consumed."""
+    bits, size = _delta_decode_binary(b, n)
+    return bits.view(np.float32), size
+
+
+def float_encode_binary(vals: Union[List[float], np.ndarray]) -> bytes:
+    return _float_bits(vals).astype('>u4').tobytes()
+
+
+def float_decode_binary(b: bytes, n: int, offset: int = 0) -> np.ndarray:
+    return np.frombuffer(b, dtype='>u4', count=n, offset=offset).astype(np.uint32).view(np.float32)
+
+
+def pack_bits(vals: np.ndarray, bits: int) -> bytes:
+    """Pack unsigned ints of ``bits`` bits each, most significant bit first; the last byte is zero padded."""
+    vals = np.asarray(vals, dtype=np.uint32)
+    if bits == 8:
+        return vals.astype(np.uint8).tobytes()
+    shifts = np.arange(bits - 1, -1, -1, dtype=np.uint32)
+    return np.packbits(((vals[:, None] >> shifts) & 1).astype(np.uint8)).tobytes()
+
+
+def unpack_bits(b: bytes, n: int, bits: int, offset: int = 0) -> (np.ndarray, int):
+    """Unpack ``n`` values written by ``pack_bits``, returns the values and the number of bytes consumed."""
+    size = (n * bits + 7) // 8
+    packed = np.frombuffer(b, dtype=np.uint8, count=size, offset=offset)
+    if bits == 8:
+        return packed.astype(np.uint32), size
+    shifts = np.arange(bits - 1, -1, -1, dtype=np.uint32)
+    unpacked = np.unpackbits(packed, count=n * bits).reshape(n, bits).astype(np.uint32)
+    return (unpacked << shifts).sum(axis=1, dtype=np.uint32), size
+
+
+_VARINT_POSITIONS = np.arange(5)
+_VARINT_SHIFTS = np.arange(0, 35, 7, dtype=np.uint32)
+_BIT_SHIFTS = np.arange(31, -1, -1, dtype=np.uint32)
+
+
+def _bit_length(vals: np.ndarray) -> np.ndarray:
+    # frexp's exponent is the bit length for ints that are exact in float64, 0 for 0
+    return np.frexp(vals.astype(np.float64))[1]
+
+
+def varint_encode(vals: Union[List[int], np.ndarray]) -> bytes:
+    """
+    LEB128 varints of unsigned 32 bit ints: 7 bits per byte, least significant group first, with the high bit set on
+    every byte but the last of a value.
+    """
+    vals = np.asarray(vals).astype(np.uint32)
+    n_bytes = np.maximum((_bit_length(vals) + 6) // 7, 1)
+    groups = ((vals[:, None] >> _VARINT_SHIFTS) & 0x7F).astype(np.uint8)
+    groups[_VARINT_POSITIONS < n_bytes[:, None] - 1] |= 0x80
+    return groups[_VARINT_POSITIONS < n_bytes[:, None]].tobytes()
+
+
+def varint_decode(b: bytes, n: int, offset: int = 0) -> (np.ndarray, int):
+    """Decode ``n`` varints starting at ``offset``, returns the values and the number of bytes consumed."""
+    if n == 0:
+        return np.zeros(0, dtype=np.uint32), 0
+    # a 32 bit varint takes at most 5 bytes
+    data = np.frombuffer(b, dtype=np.uint8, count=min(5 * n, len(b) - offset), offset=offset)
+    ends = np.flatnonzero(data < 0x80)[:n]
+    if len(ends) < n:
+        raise ValueError("Truncated varint bytes")
+    size = int(ends[-1]) + 1
+    data = data[:size]
+    starts = np.empty(n, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    positions = np.arange(size) - np.repeat(starts, ends - starts + 1)
+    if np.any(positions > 4):
+        raise ValueError("Varint longer than 5 bytes")
+    groups = (data & 0x7F).astype(np.uint32) << _VARINT_SHIFTS[positions]
+    return np.bitwise_or.reduceat(groups, starts), size
+
+
+def for_encode(vals: Union[List[int], np.ndarray], block_size: int = 128) -> bytes:
+    """
+    Frame-of-reference bit packing of unsigned 32 bit ints: every block of ``block_size`` values stores its minimum
+    (as a varint) and the bit width of the largest offset from it (one byte), then all offsets are bit packed back to
+    back, most significant bit first.
+    """
+    vals = np.asarray(vals).astype(np.uint32)
+    if not len(vals):
+        return b''
+    starts = np.arange(0, len(vals), block_size)
+    mins = np.minimum.reduceat(vals, starts)
+    offsets = vals - np.repeat(mins, block_size)[:len(vals)]
+    widths = _bit_length(np.maximum.reduceat(offsets, starts)).astype(np.uint8)
+
+    bits = ((offsets[:, None] >> _BIT_SHIFTS) & 1).astype(np.uint8)
+    significant = _BIT_SHIFTS < np.repeat(widths, block_size)[:len(vals), None]
+    return varint_encode(mins) + widths.tobytes() + np.packbits(bits[significant]).tobytes()
+
+
+def for_decode(b: bytes, n: int, offset: int = 0, block_size: int = 128) -> (np.ndarray, int):
+    """Decode ``n`` values written by ``for_encode``, returns the values and the number of bytes consumed."""
+    if n == 0:
+        return np.zeros(0, dtype=np.uint32), 0
+    n_blocks = -(-n // block_size)
+    mins, size = varint_decode(b, n_blocks, offset)
+    widths = np.frombuffer(b, dtype=np.uint8, count=n_blocks, offset=offset + size)
+    if np.any(widths > 32):
+        raise ValueError("Invalid frame-of-reference bit width")
+    size += n_blocks
+
+    value_widths = np.repeat(widths, block_size)[:n]
+    n_bits = int(value_widths.sum(dtype=np.int64))
+    packed = np.frombuffer(b, dtype=np.uint8, count=(n_bits + 7) // 8, offset=offset + size)
+    bits = np.zeros((n, 32), dtype=np.uint8)
+    bits[_BIT_SHIFTS < value_widths[:, None]] = np.unpackbits(packed, count=n_bits)
+    vals = np.packbits(bits, axis=1).view('>u4').reshape(-1).astype(np.uint32)
+    return vals + np.repeat(mins, block_size)[:n], size + len(packed)
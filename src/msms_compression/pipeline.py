@@ -0,0 +1,188 @@
+"""
+Streaming conversion between MGF / mzML files and compressed spectrum records.
+
+Every stage is a generator that handles one spectrum at a time, so whole runs are converted in constant memory.
+Compressed records are written as JSON lines: ``{"params": {...}, "data": "<compressed spectrum>"}`` where params
+holds the MGF style spectrum parameters (TITLE, PEPMASS, CHARGE, RTINSECONDS, SCANS, ...).
+"""
+
+import base64
+import json
+import zlib
+from itertools import tee
+from typing import BinaryIO, Dict, Iterable, Iterator, NamedTuple, Optional, TextIO
+from xml.etree.ElementTree import iterparse
+
+import numpy as np
+
+from msms_compression.base_compressor import BaseCompressor
+
+
+class Spectrum(NamedTuple):
+    params: Dict[str, str]
+    mzs: np.ndarray
+    intensities: np.ndarray
+
+
+def _sorted_spectrum(params: Dict[str, str], mzs: np.ndarray, intensities: np.ndarray) -> Spectrum:
+    # the compressors expect m/z in ascending order
+    if len(mzs) > 1 and np.any(mzs[1:] < mzs[:-1]):
+        order = np.argsort(mzs, kind='stable')
+        mzs, intensities = mzs[order], intensities[order]
+    return Spectrum(params, mzs, intensities)
+
+
+def read_mgf(f: TextIO) -> Iterator[Spectrum]:
+    params, mzs, intensities = None, [], []
+    for line in f:
+        line = line.strip()
+        if not line or line[0] in '#;!/':
+            continue
+        if line == 'BEGIN IONS':
+            params, mzs, intensities = {}, [], []
+        elif line == 'END IONS':
+            if params is None:
+                raise ValueError("END IONS without BEGIN IONS")
+            yield _sorted_spectrum(params, np.array(mzs, dtype=np.float64), np.array(intensities, dtype=np.float64))
+            params = None
+        elif params is None:
+            continue  # global parameters
+        elif line[0].isdigit():
+            peak = line.split()
+            mzs.append(float(peak[0]))
+            intensities.append(float(peak[1]) if len(peak) > 1 else 0.0)
+        elif '=' in line:
+            key, value = line.split('=', 1)
+            params[key.upper()] = value
+
+
+def write_mgf(spectra: Iterable[Spectrum], f: TextIO) -> None:
+    for spectrum in spectra:
+        f.write('BEGIN IONS\n')
+        for key, value in spectrum.params.items():
+            f.write(f'{key}={value}\n')
+        for mz, intensity in zip(np.asarray(spectrum.mzs).tolist(), np.asarray(spectrum.intensities).tolist()):
+            f.write(f'{mz} {intensity}\n')
+        f.write('END IONS\n\n')
+
+
+_MZML_ARRAY_TYPES = {'MS:1000514': 'mzs', 'MS:1000515': 'intensities'}
+_MZML_DTYPES = {'MS:1000521': '<f4', 'MS:1000523': '<f8', 'MS:1000519': '<i4', 'MS:1000522': '<i8'}
+# elements that are dropped from the tree once read, everything else is small
+_MZML_STREAMED = {'spectrum', 'chromatogram', 'offset'}
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _decode_binary_array(element) -> (Optional[str], np.ndarray):
+    array_type, dtype, compressed, data = None, '<f8', False, ''
+    for child in element.iter():
+        name = _local_name(child.tag)
+        if name == 'cvParam':
+            accession = child.get('accession')
+            if accession in _MZML_ARRAY_TYPES:
+                array_type = _MZML_ARRAY_TYPES[accession]
+            elif accession in _MZML_DTYPES:
+                dtype = _MZML_DTYPES[accession]
+            elif accession == 'MS:1000574':
+                compressed = True
+            elif accession.startswith('MS:10023'):
+                raise ValueError(f"Unsupported mzML compression ({child.get('name')})")
+        elif name == 'binary':
+            data = child.text or ''
+    b = base64.b64decode(data)
+    if compressed:
+        b = zlib.decompress(b)
+    return array_type, np.frombuffer(b, dtype=dtype).astype(np.float64)
+
+
+def _mzml_spectrum(element) -> Spectrum:
+    params = {'TITLE': element.get('id', '')}
+    scan = [part[5:] for part in params['TITLE'].split() if part.startswith('scan=')]
+    if scan:
+        params['SCANS'] = scan[0]
+
+    arrays = {'mzs': np.empty(0), 'intensities': np.empty(0)}
+    for child in element.iter():
+        name = _local_name(child.tag)
+        if name == 'binaryDataArray':
+            array_type, values = _decode_binary_array(child)
+            if array_type:
+                arrays[array_type] = values
+        elif name == 'cvParam':
+            accession, value = child.get('accession'), child.get('value')
+            if accession == 'MS:1000511':
+                params['MSLEVEL'] = value
+            elif accession == 'MS:1000744':
+                params['PEPMASS'] = value
+            elif accession == 'MS:1000041':
+                params['CHARGE'] = f'{value}+'
+            elif accession == 'MS:1000016':
+                seconds = float(value) * (60 if child.get('unitName') == 'minute' else 1)
+                params['RTINSECONDS'] = repr(seconds)
+    return _sorted_spectrum(params, arrays['mzs'], arrays['intensities'])
+
+
+def read_mzml(f: BinaryIO) -> Iterator[Spectrum]:
+    parents = []
+    for event, element in iterparse(f, events=('start', 'end')):
+        if event == 'start':
+            parents.append(element)
+            continue
+        parents.pop()
+        name = _local_name(element.tag)
+        if name == 'spectrum':
+            yield _mzml_spectrum(element)
+        if name in _MZML_STREAMED and parents:
+            parents[-1].remove(element)
+
+
+def read_spectra(path: str) -> Iterator[Spectrum]:
+    if path.lower().endswith('.mzml'):
+        with open(path, 'rb') as f:
+            yield from read_mzml(f)
+    elif path.lower().endswith('.mgf'):
+        with open(path) as f:
+            yield from read_mgf(f)
+    else:
+        raise ValueError(f"Unsupported file type: {path} (expected .mgf or .mzML)")
+
+
+def compress_spectra(spectra: Iterable[Spectrum], compressor: BaseCompressor, workers: int = 0,
+                     chunk_size: int = 64) -> Iterator[dict]:
+    """
+    Compress spectra into records. With ``workers`` > 0 spectra are compressed on a process pool of that size
+    (see ``BaseCompressor.compress_many``); only the spectra in flight are buffered.
+    """
+    if not workers:
+        for spectrum in spectra:
+            yield {'params': spectrum.params, 'data': compressor.compress(spectrum.mzs, spectrum.intensities)}
+        return
+
+    spectra, peaks = tee(spectra)
+    compressed = compressor.compress_many(((spectrum.mzs, spectrum.intensities) for spectrum in peaks),
+                                          max_workers=workers, chunk_size=chunk_size)
+    for spectrum, data in zip(spectra, compressed):
+        if isinstance(data, Exception):
+            raise data
+        yield {'params': spectrum.params, 'data': data}
+
+
+def decompress_spectra(records: Iterable[dict], compressor: BaseCompressor) -> Iterator[Spectrum]:
+    for record in records:
+        mzs, intensities = compressor.decompress(record['data'], as_numpy=True)
+        yield Spectrum(record['params'], mzs, intensities)
+
+
+def write_records(records: Iterable[dict], f: TextIO) -> None:
+    for record in records:
+        f.write(json.dumps(record, separators=(',', ':')))
+        f.write('\n')
+
+
+def read_records(f: TextIO) -> Iterator[dict]:
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
@@ -0,0 +1,109 @@
+"""
+Vectorized quantization engine for the lossy spectrum compressors.
+
+Values are mapped onto ``2 ** bits - 1`` equal steps between their min and max (stored as float32) and rounded to
+the nearest step, so the round trip error is at most half a step. The compressors quantize log intensities, where an
+absolute error ``e`` is a relative intensity error of at most ``exp(e) - 1``.
+
+Text layout (``lossy_encode_hex``): min and max as 8 hex chars each, then ``bits // 4`` hex chars per value. With the
+default 8 bits this is the layout of ``utils.hex_encode_lossy``. Binary layout (``lossy_encode_binary``): min and max
+as big-endian float32, then the codes bit-packed with ``np_utils.pack_bits``.
+"""
+
+from typing import Iterable, List, Union
+
+import numpy as np
+
+from .np_utils import _float_bits, _nibbles, _from_nibbles, _hex_to_nibbles, _HEX_CHARS, float_decode_binary, \
+    pack_bits, unpack_bits
+
+MIN_BITS = 4
+MAX_BITS = 16
+# bit depths that fill whole hex characters
+HEX_BITS = (4, 8, 12, 16)
+
+
+def _check_bits(bits: int) -> None:
+    if not MIN_BITS <= bits <= MAX_BITS:
+        raise ValueError(f"bits must be between {MIN_BITS} and {MAX_BITS}, got {bits}")
+
+
+def _levels(bits: int) -> int:
+    return (1 << bits) - 1
+
+
+def quantize(vals: Union[List[float], np.ndarray], bits: int) -> (float, float, np.ndarray):
+    """Returns (min, max, codes); min and max are rounded to float32, the values they are stored as."""
+    _check_bits(bits)
+    vals = np.asarray(vals, dtype=np.float64)
+    if not np.all(np.isfinite(vals)):
+        raise ValueError("Can't quantize non-finite values")
+    lo, hi = _float_bits([vals.min(), vals.max()]).view(np.float32).astype(np.float64)
+    if hi == lo:
+        return lo, hi, np.zeros(len(vals), dtype=np.uint32)
+    codes = np.rint((vals - lo) * (_levels(bits) / (hi - lo)))
+    return lo, hi, np.clip(codes, 0, _levels(bits)).astype(np.uint32)
+
+
+def dequantize(codes: np.ndarray, lo: float, hi: float, bits: int) -> np.ndarray:
+    return codes / _levels(bits) * (hi - lo) + lo
+
+
+def quantization_error(vals: Union[List[float], np.ndarray], bits: int) -> float:
+    """Largest absolute round trip error of ``vals`` at this bit depth."""
+    vals = np.asarray(vals, dtype=np.float64)
+    if not len(vals):
+        return 0.0
+    lo, hi, codes = quantize(vals, bits)
+    return float(np.abs(dequantize(codes, lo, hi, bits) - vals).max())
+
+
+def bits_for_error(vals: Union[List[float], np.ndarray], max_error: float,
+                   candidates: Iterable[int] = range(MIN_BITS, MAX_BITS + 1)) -> int:
+    """Smallest bit depth among ``candidates`` whose absolute round trip error is at most ``max_error``."""
+    vals = np.asarray(vals, dtype=np.float64)
+    candidates = sorted(candidates)
+    if not len(vals):
+        return candidates[0]
+    value_range = float(vals.max() - vals.min())
+    for bits in candidates:
+        # half a step is the error bound, skip depths that can't meet it without quantizing
+        if value_range / _levels(bits) / 2 > max_error * (1 + 1e-9):
+            continue
+        if quantization_error(vals, bits) <= max_error:
+            return bits
+    raise ValueError(f"No bit depth up to {candidates[-1]} bits meets a maximum error of {max_error}")
+
+
+def lossy_encode_hex(vals: Union[List[float], np.ndarray], bits: int = 8) -> str:
+    if bits % 4:
+        raise ValueError(f"Hex encoding needs a multiple of 4 bits, got {bits}")
+    lo, hi, codes = quantize(vals, bits)
+    width = bits // 4
+    min_max = _HEX_CHARS[_nibbles(_float_bits([lo, hi]))].tobytes()
+    return (min_max + _HEX_CHARS[_nibbles(codes)[:, 8 - width:]].tobytes()).decode('ascii')
+
+
+def lossy_decode_hex(s: str, bits: int = 8) -> np.ndarray:
+    if bits % 4:
+        raise ValueError(f"Hex encoding needs a multiple of 4 bits, got {bits}")
+    width = bits // 4
+    if len(s) < 16 or (len(s) - 16) % width:
+        raise ValueError("Invalid lossy hex string")
+    lo, hi = _from_nibbles(_hex_to_nibbles(s[:16]).reshape(2, 8)).view(np.float32).astype(np.float64)
+    nibbles = np.zeros(((len(s) - 16) // width, 8), dtype=np.uint8)
+    nibbles[:, 8 - width:] = _hex_to_nibbles(s[16:]).reshape(-1, width)
+    return dequantize(_from_nibbles(nibbles), lo, hi, bits)
+
+
+def lossy_encode_binary(vals: Union[List[float], np.ndarray], bits: int = 8) -> bytes:
+    lo, hi, codes = quantize(vals, bits)
+    return _float_bits([lo, hi]).astype('>u4').tobytes() + pack_bits(codes, bits)
+
+
+def lossy_decode_binary(b: bytes, n: int, offset: int = 0, bits: int = 8) -> (np.ndarray, int):
+    """Decode ``n`` values at ``offset``, returns the values and the number of bytes consumed."""
+    _check_bits(bits)
+    lo, hi = float_decode_binary(b, 2, offset).astype(np.float64)
+    codes, size = unpack_bits(b, n, bits, offset + 8)
+    return dequantize(codes, lo, hi, bits), 8 + size
@@ -1,16 +1,95 @@
 import json
 import math
-from typing import List, Protocol
+import struct
+from typing import Iterator, List, Optional, Protocol, Sequence, Tuple, Union
 
-from .utils import delta_encode_single_string_float, hex_encode, delta_decode_single_string_float, hex_decode, \
-    hex_encode_lossy, hex_decode_lossy, delta_encode_single_string_int, delta_decode_single_string_int
+import numpy as np
+
+from .np_utils import delta_encode_single_string_float, hex_encode, delta_decode_single_string_float, hex_decode, \
+    delta_encode_single_string_int, delta_decode_single_string_int, delta_encode_binary_float, \
+    delta_decode_binary_float, float_encode_binary, float_decode_binary, varint_encode, varint_decode, for_encode, \
+    for_decode, _float_bits, _delta_encode_single_chars, _hex_chars, _delta_encode_binary_parts, _binary_delta_parts, \
+    _binary_deltas, _pack_nibbles, _unpack_nibbles
+from .quantize import HEX_BITS, bits_for_error, lossy_encode_hex, lossy_decode_hex, lossy_encode_binary, \
+    lossy_decode_binary
+
+# Peak arrays can be lists or anything exposing the buffer protocol (numpy arrays, array.array, memoryview). The
+# numpy backed encoders read buffers in place, float32 input is never copied.
+Peaks = Union[List[float], np.ndarray, memoryview]
+
+
+def _to_list(vals: Peaks) -> List[float]:
+    return vals if isinstance(vals, list) else np.asarray(vals, dtype=np.float64).tolist()
+
+
+def _to_output(vals: Union[List[float], np.ndarray], as_numpy: bool, dtype=np.float64) -> Peaks:
+    if as_numpy:
+        return np.ascontiguousarray(vals, dtype=dtype)
+    return vals.tolist() if isinstance(vals, np.ndarray) else vals
+
+
+def _log_intensities(intensities: Peaks) -> np.ndarray:
+    intensities = np.asarray(intensities, dtype=np.float64)
+    if np.any(intensities <= 0):
+        raise ValueError("Lossy compressors need positive intensities")
+    return np.log(intensities)
+
+
+def _encode_lossy_intensities(log_intensities: np.ndarray, bits: int, max_error: Optional[float]) -> str:
+    # with a maximum relative error the bit depth is picked per spectrum and written as one hex char up front
+    if max_error is None:
+        return lossy_encode_hex(log_intensities, bits)
+    bits = bits_for_error(log_intensities, math.log1p(max_error), HEX_BITS)
+    return f'{bits // 4:x}' + lossy_encode_hex(log_intensities, bits)
+
+
+def _decode_lossy_intensities(s: str, bits: int, max_error: Optional[float]) -> np.ndarray:
+    if max_error is None:
+        return lossy_decode_hex(s, bits)
+    return lossy_decode_hex(s[1:], int(s[0], 16) * 4)
+
+
+def _encode_lossy_binary(log_intensities: np.ndarray, bits: int, max_error: Optional[float]) -> bytes:
+    # binary counterpart of _encode_lossy_intensities, a picked bit depth takes one byte
+    if max_error is None:
+        return lossy_encode_binary(log_intensities, bits)
+    bits = bits_for_error(log_intensities, math.log1p(max_error))
+    return bytes([bits]) + lossy_encode_binary(log_intensities, bits)
+
+
+def _decode_lossy_binary(b: bytes, n: int, offset: int, bits: int, max_error: Optional[float]) -> np.ndarray:
+    if max_error is not None:
+        bits, offset = b[offset], offset + 1
+    return lossy_decode_binary(b, n, offset, bits)[0]
+
+
+def _write_parts(buf: bytearray, parts: Sequence[Union[bytes, np.ndarray]]) -> int:
+    """Copy bytes / 1-d uint8 arrays back to back to the start of ``buf``, growing it if needed. Returns the length."""
+    sizes = [len(part) for part in parts]
+    n = sum(sizes)
+    if len(buf) < n:
+        buf.extend(bytes(n - len(buf)))
+    offset = 0
+    with memoryview(buf) as view:
+        for part, size in zip(parts, sizes):
+            view[offset:offset + size] = part
+            offset += size
+    return n
 
 
 class SpectrumCompressor(Protocol):
-    def compress(self, mzs: List[float], intensities: List[float]) -> str:
+    # binary compressors return bytes from compress() and are handed bytes in decompress()
+    binary = False
+
+    # Compressors can also implement compress_into(mzs, intensities, buf: bytearray) -> int, which writes the bytes
+    # of compress() (utf-8 encoded for text compressors) to the start of a reusable buffer and returns their length.
+    # BaseCompressor.compress_bytes uses it to skip the intermediate copies.
+
+    def compress(self, mzs: Peaks, intensities: Peaks) -> Union[str, bytes]:
         pass
 
-    def decompress(self, s: str) -> (List[float], List[float]):
+    def decompress(self, s: Union[str, bytes], as_numpy: bool = False) -> (Peaks, Peaks):
+        # as_numpy returns contiguous numpy arrays instead of lists
         pass
 
     def __str__(self):
@@ -18,66 +97,78 @@ class SpectrumCompressor(Protocol):
 
 
 class SpectrumCompressorF32(SpectrumCompressor):
-    def compress(self, mzs: List[float], intensities: List[float]) -> str:
-        if mzs:
+    def compress(self, mzs: Peaks, intensities: Peaks) -> str:
+        if len(mzs):
             mz_str = delta_encode_single_string_float(mzs)
         else:
             mz_str = ''
 
-        if intensities:
+        if len(intensities):
             intensity_str = hex_encode(intensities)
         else:
             intensity_str = ''
         return json.dumps((mz_str, intensity_str))
 
-    def decompress(self, s: str) -> (List[float], List[float]):
+    def compress_into(self, mzs: Peaks, intensities: Peaks, buf: bytearray) -> int:
+        # the same JSON as compress(), assembled from the ascii arrays of the two strings
+        mz_parts = _delta_encode_single_chars(_float_bits(mzs)) if len(mzs) else ()
+        intensity_parts = (_hex_chars(intensities).reshape(-1),) if len(intensities) else ()
+        return _write_parts(buf, (b'["', *mz_parts, b'", "', *intensity_parts, b'"]'))
+
+    def decompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
         mz_str, intensity_str = json.loads(s)
         if mz_str:
-            mzs = list(delta_decode_single_string_float(mz_str))
+            mzs = delta_decode_single_string_float(mz_str)
         else:
             mzs = []
 
         if intensity_str:
-            intensities = list(hex_decode(intensity_str))
+            intensities = hex_decode(intensity_str)
         else:
             intensities = []
-        return mzs, intensities
+        return _to_output(mzs, as_numpy, np.float32), _to_output(intensities, as_numpy, np.float32)
 
 
 class SpectrumCompressorF32Lossy(SpectrumCompressor):
-
-    def __init__(self, n_bits):
+    """
+    Lossless m/z, log intensities quantized to ``n_bits`` hex chars (4 * n_bits bits) per peak. With ``max_error``
+    the smallest bit depth that keeps every intensity within that relative error is used instead.
+    """
+
+    def __init__(self, n_bits, max_error: Optional[float] = None):
+        if not 1 <= n_bits <= 4:
+            raise ValueError(f"n_bits is the number of hex chars per intensity (1-4), got {n_bits}")
         self.n_bits = n_bits
+        self.max_error = max_error
 
-    def compress(self, mzs: List[float], intensities: List[float]) -> str:
-        if mzs:
+    def compress(self, mzs: Peaks, intensities: Peaks) -> str:
+        if len(mzs):
             mz_str = delta_encode_single_string_float(mzs)
         else:
             mz_str = ''
 
-        if intensities:
-            intensities = [math.log(x) for x in intensities]
-            intensity_str = hex_encode_lossy(intensities, self.n_bits)
+        if len(intensities):
+            intensity_str = _encode_lossy_intensities(_log_intensities(intensities), self.n_bits * 4, self.max_error)
         else:
             intensity_str = ''
         return json.dumps((mz_str, intensity_str))
 
-    def decompress(self, s: str) -> (List[float], List[float]):
+    def decompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
         mz_str, intensity_str = json.loads(s)
         if mz_str:
-            mzs = list(delta_decode_single_string_float(mz_str))
+            mzs = delta_decode_single_string_float(mz_str)
         else:
             mzs = []
 
         if intensity_str:
-            intensities = list(hex_decode_lossy(intensity_str, self.n_bits))
-            intensities = [math.exp(x) for x in intensities]
-
+            intensities = np.exp(_decode_lossy_intensities(intensity_str, self.n_bits * 4, self.max_error))
         else:
             intensities = []
-        return mzs, intensities
+        return _to_output(mzs, as_numpy, np.float32), _to_output(intensities, as_numpy)
 
     def __str__(self):
+        if self.max_error is not None:
+            return self.__class__.__name__ + f'({str(self.n_bits)}|{self.max_error})'
         return self.__class__.__name__ + f'({str(self.n_bits)})'
 
 
@@ -87,19 +178,20 @@ class SpectrumCompressorString(SpectrumCompressor):
         self.mz_precision = mz_precision
         self.intensity_precision = intensity_precision
 
-    def compress(self, mzs: List[float], intensities: List[float]) -> str:
-        if mzs:
-            mz_str = ','.join([str(round(x, self.mz_precision)).replace('.', '') for x in mzs])
+    def compress(self, mzs: Peaks, intensities: Peaks) -> str:
+        if len(mzs):
+            mz_str = ','.join([str(round(x, self.mz_precision)).replace('.', '') for x in _to_list(mzs)])
         else:
             mz_str = ''
 
-        if intensities:
-            intensity_str = ','.join([str(round(x, self.intensity_precision)).replace('.', '') for x in intensities])
+        if len(intensities):
+            intensity_str = ','.join([str(round(x, self.intensity_precision)).replace('.', '')
+                                      for x in _to_list(intensities)])
         else:
             intensity_str = ''
         return json.dumps((mz_str, intensity_str))
 
-    def decompress(self, s: str) -> (List[float], List[float]):
+    def decompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
         mz_str, intensity_str = json.loads(s)
         if mz_str:
             mzs = [float(x[:-2] + '.' + x[-2:]) for x in mz_str.split(',')]
@@ -110,7 +202,7 @@ class SpectrumCompressorString(SpectrumCompressor):
             intensities = [float(x[:-2] + '.' + x[-2:]) for x in intensity_str.split(',')]
         else:
             intensities = []
-        return mzs, intensities
+        return _to_output(mzs, as_numpy), _to_output(intensities, as_numpy)
 
     def __str__(self):
         return self.__class__.__name__ + f'({self.mz_precision}|{self.intensity_precision})'
@@ -118,24 +210,24 @@ class SpectrumCompressorString(SpectrumCompressor):
 
 class SpectrumCompressorStringLossy(SpectrumCompressor):
 
-    def __init__(self, mz_precision, intensity_precision):
+    def __init__(self, mz_precision, intensity_precision, max_error: Optional[float] = None):
         self.mz_precision = mz_precision
         self.intensity_precision = intensity_precision
+        self.max_error = max_error
 
-    def compress(self, mzs: List[float], intensities: List[float]) -> str:
-        if mzs:
-            mz_str = ','.join([f"{x:.{self.mz_precision}f}".replace(".", "") for x in mzs])
+    def compress(self, mzs: Peaks, intensities: Peaks) -> str:
+        if len(mzs):
+            mz_str = ','.join([f"{x:.{self.mz_precision}f}".replace(".", "") for x in _to_list(mzs)])
         else:
             mz_str = ''
 
-        if intensities:
-            intensities = [math.log(x) for x in intensities]
-            intensity_str = hex_encode_lossy(intensities)
+        if len(intensities):
+            intensity_str = _encode_lossy_intensities(_log_intensities(intensities), 8, self.max_error)
         else:
             intensity_str = ''
         return json.dumps((mz_str, intensity_str))
 
-    def decompress(self, s: str) -> (List[float], List[float]):
+    def decompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
         mz_str, intensity_str = json.loads(s)
         if mz_str:
             mzs = [float(x[:-2] + '.' + x[-2:]) for x in mz_str.split(',')]
@@ -143,52 +235,334 @@ class SpectrumCompressorStringLossy(SpectrumCompressor):
             mzs = []
 
         if intensity_str:
-            intensities = list(hex_decode_lossy(intensity_str))
-            intensities = [math.exp(x) for x in intensities]
+            intensities = np.exp(_decode_lossy_intensities(intensity_str, 8, self.max_error))
         else:
             intensities = []
-        return mzs, intensities
+        return _to_output(mzs, as_numpy), _to_output(intensities, as_numpy)
 
     def __str__(self):
-        return self.__class__.__name__ + f'({self.mz_precision}|{self.intensity_precision})'
+        max_error = f'|{self.max_error}' if self.max_error is not None else ''
+        return self.__class__.__name__ + f'({self.mz_precision}|{self.intensity_precision}{max_error})'
 
 
 class SpectrumCompressorI32(SpectrumCompressor):
 
-    def __init__(self, mz_precision=2, intensity_precision=1):
+    def __init__(self, mz_precision=2, intensity_precision=1, max_error: Optional[float] = None):
         self.mz_precision = mz_precision
         self.intensity_precision = intensity_precision
+        self.max_error = max_error
 
-    def compress(self, mzs: List[float], intensities: List[float]) -> str:
-        if mzs:
-            mzs = [round(mz, self.mz_precision) for mz in mzs]
+    def compress(self, mzs: Peaks, intensities: Peaks) -> str:
+        if len(mzs):
+            mzs = [round(mz, self.mz_precision) for mz in _to_list(mzs)]
             mzs = [int(x * (10 ** self.mz_precision)) for x in mzs]
             mz_str = delta_encode_single_string_int(mzs)
         else:
             mz_str = ''
 
-        if intensities:
-            intensities = [round(i, self.intensity_precision) for i in intensities]
-            intensities = [math.log(x) for x in intensities]
-            intensity_str = hex_encode_lossy(intensities)
+        if len(intensities):
+            intensities = [round(i, self.intensity_precision) for i in _to_list(intensities)]
+            intensity_str = _encode_lossy_intensities(_log_intensities(intensities), 8, self.max_error)
         else:
             intensity_str = ''
         return json.dumps((mz_str, intensity_str))
 
-    def decompress(self, s: str) -> (List[float], List[float]):
+    def decompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
         mz_str, intensity_str = json.loads(s)
         if mz_str:
-            mzs = list(delta_decode_single_string_int(mz_str))
+            mzs = delta_decode_single_string_int(mz_str).tolist()
             mzs = [round(x / (10 ** self.mz_precision), self.mz_precision) for x in mzs]
         else:
             mzs = []
 
         if intensity_str:
-            intensities = list(hex_decode_lossy(intensity_str))
-            intensities = [round(math.exp(x), self.intensity_precision) for x in intensities]
+            intensities = np.exp(_decode_lossy_intensities(intensity_str, 8, self.max_error))
+            intensities = np.round(intensities, self.intensity_precision)
         else:
             intensities = []
-        return mzs, intensities
+        return _to_output(mzs, as_numpy), _to_output(intensities, as_numpy)
+
+    def __str__(self):
+        max_error = f'|{self.max_error}' if self.max_error is not None else ''
+        return f'{self.__class__.__name__}({self.mz_precision}|{self.intensity_precision}{max_error})'
+
+
+class SpectrumCompressorI32Binary(SpectrumCompressor):
+    """
+    Binary SpectrumCompressorI32: m/z scaled to integers and delta encoded, with the deltas written as LEB128 varints
+    or, with ``block_size``, bit packed in frames of that many deltas. Varints compress better with brotli, frames are
+    smaller without a data compressor (see benchmarks/int_packing.py). Intensities are quantized to 8 bits, or to the
+    smallest depth that meets ``max_error``, like SpectrumCompressorBinaryLossy.
+    """
+    binary = True
+
+    def __init__(self, mz_precision=2, intensity_precision=1, max_error: Optional[float] = None,
+                 block_size: Optional[int] = None):
+        self.mz_precision = mz_precision
+        self.intensity_precision = intensity_precision
+        self.max_error = max_error
+        self.block_size = block_size
+
+    def compress(self, mzs: Peaks, intensities: Peaks) -> bytes:
+        b = _BINARY_HEADER.pack(len(mzs), len(intensities))
+        if len(mzs):
+            ints = np.rint(np.asarray(mzs, dtype=np.float64) * 10 ** self.mz_precision).astype(np.int64)
+            if ints.min() < 0 or ints.max() >= 2 ** 32:
+                raise ValueError("m/z values don't fit 32 bit integers at this precision")
+            # the first value is absolute and would widen the first frame, it gets a varint of its own. Unsorted
+            # m/z give negative deltas, they wrap around as uint32 and wrap back in the cumulative sum
+            deltas = np.diff(ints).astype(np.uint32)
+            b += varint_encode(ints[:1])
+            b += varint_encode(deltas) if self.block_size is None else for_encode(deltas, self.block_size)
+        if len(intensities):
+            intensities = np.round(np.asarray(intensities, dtype=np.float64), self.intensity_precision)
+            b += _encode_lossy_binary(_log_intensities(intensities), 8, self.max_error)
+        return b
+
+    def decompress(self, b: bytes, as_numpy: bool = False) -> (Peaks, Peaks):
+        n_mzs, n_intensities = _BINARY_HEADER.unpack_from(b)
+        offset = _BINARY_HEADER.size
+        mzs = np.zeros(0)
+        if n_mzs:
+            first, size = varint_decode(b, 1, offset)
+            offset += size
+            if self.block_size is None:
+                deltas, size = varint_decode(b, n_mzs - 1, offset)
+            else:
+                deltas, size = for_decode(b, n_mzs - 1, offset, self.block_size)
+            offset += size
+            ints = np.empty(n_mzs, dtype=np.uint32)
+            ints[0] = first[0]
+            np.cumsum(deltas, dtype=np.uint32, out=ints[1:])
+            ints[1:] += first[0]
+            mzs = np.round(ints / 10 ** self.mz_precision, self.mz_precision)
+
+        intensities = np.zeros(0)
+        if n_intensities:
+            intensities = np.exp(_decode_lossy_binary(b, n_intensities, offset, 8, self.max_error))
+            intensities = np.round(intensities, self.intensity_precision)
+        return _to_output(mzs, as_numpy), _to_output(intensities, as_numpy)
+
+    def __str__(self):
+        max_error = f'|{self.max_error}' if self.max_error is not None else ''
+        packing = 'varint' if self.block_size is None else f'for{self.block_size}'
+        return f'{self.__class__.__name__}({self.mz_precision}|{self.intensity_precision}{max_error}|{packing})'
+
+
+class SpectrumCompressorPpm(SpectrumCompressor):
+    """
+    m/z quantized onto a logarithmic grid spaced 2 * ``tolerance_ppm`` apart, so every m/z decodes to within
+    ``tolerance_ppm`` of its input. The grid indices are delta encoded like the F32 m/z values, but the deltas are
+    small integers and take a few hex chars instead of a float. Intensities are stored as float32, or quantized with
+    the lossy engine when ``max_error`` is given.
+    """
+
+    def __init__(self, tolerance_ppm: float = 5.0, max_error: Optional[float] = None):
+        if tolerance_ppm <= 0:
+            raise ValueError(f"tolerance_ppm must be positive, got {tolerance_ppm}")
+        self.tolerance_ppm = tolerance_ppm
+        self.max_error = max_error
+        # log m/z step of the grid, rounding to the nearest step is off by at most half a step
+        self._step = math.log1p(2 * tolerance_ppm * 1e-6)
+
+    def compress(self, mzs: Peaks, intensities: Peaks) -> str:
+        if len(mzs):
+            mzs = np.asarray(mzs, dtype=np.float64)
+            if np.any(mzs <= 0):
+                raise ValueError("SpectrumCompressorPpm needs positive m/z values")
+            indexes = np.rint(np.log(mzs) / self._step).astype(np.int64)
+            mz_str = delta_encode_single_string_int(indexes)
+        else:
+            mz_str = ''
+
+        if len(intensities):
+            if self.max_error is None:
+                intensity_str = hex_encode(intensities)
+            else:
+                intensity_str = _encode_lossy_intensities(_log_intensities(intensities), 8, self.max_error)
+        else:
+            intensity_str = ''
+        return json.dumps((mz_str, intensity_str))
+
+    def decompress(self, s: str, as_numpy: bool = False) -> (Peaks, Peaks):
+        mz_str, intensity_str = json.loads(s)
+        if mz_str:
+            # indexes of m/z < 1 are negative, they come back as wrapped uint32
+            indexes = delta_decode_single_string_int(mz_str).astype(np.uint32).view(np.int32)
+            mzs = np.exp(indexes * self._step)
+        else:
+            mzs = []
+
+        if not intensity_str:
+            intensities = []
+        elif self.max_error is None:
+            intensities = hex_decode(intensity_str)
+        else:
+            intensities = np.exp(_decode_lossy_intensities(intensity_str, 8, self.max_error))
+        intensity_dtype = np.float32 if self.max_error is None else np.float64
+        return _to_output(mzs, as_numpy), _to_output(intensities, as_numpy, intensity_dtype)
+
+    def __str__(self):
+        max_error = f'|{self.max_error}' if self.max_error is not None else ''
+        return f'{self.__class__.__name__}({self.tolerance_ppm}{max_error})'
+
+
+# Binary layout: peak counts ('<II'), 4-bit leading zero byte codes for the m/z deltas, the significant bytes of
+# each m/z delta and then the intensity block.
+_BINARY_HEADER = struct.Struct('<II')
+
+
+class SpectrumCompressorBinary(SpectrumCompressor):
+    binary = True
+
+    def compress(self, mzs: Peaks, intensities: Peaks) -> bytes:
+        return _BINARY_HEADER.pack(len(mzs), len(intensities)) + delta_encode_binary_float(mzs) + \
+            float_encode_binary(intensities)
+
+    def compress_into(self, mzs: Peaks, intensities: Peaks, buf: bytearray) -> int:
+        codes, delta_bytes = _delta_encode_binary_parts(_float_bits(mzs))
+        intensity_bytes = _float_bits(intensities).astype('>u4').view(np.uint8)
+        return _write_parts(buf, (_BINARY_HEADER.pack(len(mzs), len(intensities)), codes, delta_bytes,
+                                  intensity_bytes))
+
+    def decompress(self, b: bytes, as_numpy: bool = False) -> (Peaks, Peaks):
+        n_mzs, n_intensities = _BINARY_HEADER.unpack_from(b)
+        mzs, size = delta_decode_binary_float(memoryview(b)[_BINARY_HEADER.size:], n_mzs)
+        intensities = float_decode_binary(b, n_intensities, _BINARY_HEADER.size + size)
+        return _to_output(mzs, as_numpy, np.float32), _to_output(intensities, as_numpy, np.float32)
+
+
+class SpectrumCompressorBinaryLossy(SpectrumCompressor):
+    """
+    Binary layout with log intensities quantized to ``bits`` (4-16) bits per peak. With ``max_error`` the smallest
+    bit depth that keeps every intensity within that relative error is used instead, and stored in one byte in front
+    of the intensity block.
+    """
+    binary = True
+
+    def __init__(self, bits: int = 8, max_error: Optional[float] = None):
+        self.bits = bits
+        self.max_error = max_error
+
+    def compress(self, mzs: Peaks, intensities: Peaks) -> bytes:
+        b = _BINARY_HEADER.pack(len(mzs), len(intensities)) + delta_encode_binary_float(mzs)
+        if len(intensities):
+            b += _encode_lossy_binary(_log_intensities(intensities), self.bits, self.max_error)
+        return b
+
+    def decompress(self, b: bytes, as_numpy: bool = False) -> (Peaks, Peaks):
+        n_mzs, n_intensities = _BINARY_HEADER.unpack_from(b)
+        mzs, size = delta_decode_binary_float(memoryview(b)[_BINARY_HEADER.size:], n_mzs)
+        offset = _BINARY_HEADER.size + size
+        if n_intensities:
+            intensities = np.exp(_decode_lossy_binary(b, n_intensities, offset, self.bits, self.max_error))
+        else:
+            intensities = []
+        return _to_output(mzs, as_numpy, np.float32), _to_output(intensities, as_numpy)
+
+    def __str__(self):
+        if self.max_error is not None:
+            return f'{self.__class__.__name__}(max_error={self.max_error})'
+        if self.bits != 8:
+            return f'{self.__class__.__name__}({self.bits})'
+        return self.__class__.__name__
+
+
+# Block layout: '<III' peak count, block size, block count, then one _BLOCK_INDEX_DTYPE entry per block (first m/z
+# of the block, offset of its first significant m/z delta byte), then three sections covering every peak: the packed
+# 4-bit leading zero byte codes of the m/z deltas, the intensities ('>f4') and the significant m/z delta bytes. The
+# m/z deltas restart at each block, so any run of blocks decodes independently, and the whole spectrum in one pass.
+_BLOCK_HEADER = struct.Struct('<III')
+_BLOCK_INDEX_DTYPE = np.dtype([('mz', '<f4'), ('offset', '<u4')])
+
+
+class SpectrumCompressorBinaryBlocks(SpectrumCompressor):
+    """
+    Binary layout split into blocks of ``block_size`` peaks with an index of the first m/z of every block, so
+    ``query`` and ``iter_peaks`` only decode the blocks they need.
+    """
+    binary = True
+
+    def __init__(self, block_size: int = 64):
+        if block_size < 1:
+            raise ValueError(f"block_size must be positive, got {block_size}")
+        self.block_size = block_size
+
+    def compress(self, mzs: Peaks, intensities: Peaks) -> bytes:
+        if len(mzs) != len(intensities):
+            raise ValueError("SpectrumCompressorBinaryBlocks needs as many intensities as m/z values")
+        mzs = _float_bits(mzs).view(np.float32)
+        # the block index is searched by m/z, query would silently miss peaks of unsorted spectra
+        if np.any(mzs[1:] < mzs[:-1]):
+            raise ValueError("SpectrumCompressorBinaryBlocks needs m/z values sorted in ascending order")
+        bits = mzs.view(np.uint32)
+        starts = np.arange(0, len(bits), self.block_size)
+        deltas = np.empty_like(bits)
+        deltas[:1] = bits[:1]
+        np.subtract(bits[1:], bits[:-1], out=deltas[1:])
+        deltas[starts] = bits[starts]
+        leading_zeros, delta_bytes = _binary_delta_parts(deltas)
+
+        index = np.zeros(len(starts), dtype=_BLOCK_INDEX_DTYPE)
+        index['mz'] = mzs[starts]
+        if len(starts) > 1:
+            block_bytes = np.add.reduceat(4 - leading_zeros.astype(np.int64), starts)
+            np.cumsum(block_bytes[:-1], out=index['offset'][1:])
+        return b''.join([_BLOCK_HEADER.pack(len(mzs), self.block_size, len(index)), index.tobytes(),
+                         _pack_nibbles(leading_zeros).tobytes(), float_encode_binary(intensities),
+                         delta_bytes.tobytes()])
+
+    def _index(self, b: bytes) -> (int, int, np.ndarray, int):
+        """Peak count, block size, block index and the offset of the leading zero codes."""
+        n, block_size, n_blocks = _BLOCK_HEADER.unpack_from(b)
+        index = np.frombuffer(b, dtype=_BLOCK_INDEX_DTYPE, count=n_blocks, offset=_BLOCK_HEADER.size)
+        return n, block_size, index, _BLOCK_HEADER.size + index.nbytes
+
+    def _decode_blocks(self, b: bytes, parsed: Tuple[int, int, np.ndarray, int], first: int,
+                       last: int) -> (np.ndarray, np.ndarray):
+        """Decode blocks first..last (inclusive) of ``b``, given its ``_index``."""
+        n, block_size, index, codes_offset = parsed
+        if last < first:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+        start, end = first * block_size, min((last + 1) * block_size, n)
+        intensities_offset = codes_offset + (n + 1) // 2
+        deltas_offset = intensities_offset + 4 * n
+        delta_start = deltas_offset + int(index['offset'][first])
+        delta_end = deltas_offset + int(index['offset'][last + 1]) if last + 1 < len(index) else len(b)
+        deltas, size = _binary_deltas(_unpack_nibbles(b, end - start, codes_offset, start), b, delta_start)
+        if delta_start + size != delta_end:
+            raise ValueError("Corrupt block payload: m/z deltas don't match the block index")
+
+        # one running sum over all blocks, minus the sum up to the start of each block
+        bits = np.cumsum(deltas, dtype=np.uint32)
+        block_ends = np.arange(block_size, end - start, block_size)
+        restarts = np.zeros(len(block_ends) + 1, dtype=np.uint32)
+        restarts[1:] = bits[block_ends - 1]
+        bits -= np.repeat(restarts, np.diff(np.concatenate(([0], block_ends, [end - start]))))
+        return bits.view(np.float32), float_decode_binary(b, end - start, intensities_offset + 4 * start)
+
+    def decompress(self, b: bytes, as_numpy: bool = False) -> (Peaks, Peaks):
+        parsed = self._index(b)
+        mzs, intensities = self._decode_blocks(b, parsed, 0, len(parsed[2]) - 1)
+        return _to_output(mzs, as_numpy, np.float32), _to_output(intensities, as_numpy, np.float32)
+
+    def query(self, b: bytes, mz_lo: float, mz_hi: float, as_numpy: bool = False) -> (Peaks, Peaks):
+        """Peaks with mz_lo <= m/z <= mz_hi, decoding only the blocks that can hold them."""
+        parsed = self._index(b)
+        index = parsed[2]
+        # the block before the first one starting at or after mz_lo may still hold peaks >= mz_lo
+        first = max(int(np.searchsorted(index['mz'], mz_lo, side='left')) - 1, 0)
+        last = int(np.searchsorted(index['mz'], mz_hi, side='right')) - 1
+        mzs, intensities = self._decode_blocks(b, parsed, first, last)
+        mask = (mzs >= mz_lo) & (mzs <= mz_hi)
+        return _to_output(mzs[mask], as_numpy, np.float32), _to_output(intensities[mask], as_numpy, np.float32)
+
+    def iter_peaks(self, b: bytes) -> Iterator[Tuple[float, float]]:
+        """Yield (mz, intensity) pairs, decoding one block at a time."""
+        parsed = self._index(b)
+        for i in range(len(parsed[2])):
+            mzs, intensities = self._decode_blocks(b, parsed, i, i)
+            yield from zip(mzs.tolist(), intensities.tolist())
 
     def __str__(self):
-        return f'{self.__class__.__name__}({self.mz_precision}|{self.intensity_precision})'
+        return f'{self.__class__.__name__}({self.block_size})'
@@ -80,21 +80,19 @@ def _delta_encode(vals: List[float], encode_func: Callable) -> (str, str):
 
 def _delta_decode(delta_str: str, lz_str: str, decode_func: Callable) -> Generator[float, None, None]:
     initial_lz = _decode_leading_zero(lz_str[0])
-    lz_str = lz_str[1:]
-    initial_hex = '0' * initial_lz + delta_str[:8 - initial_lz]
-    delta_str = delta_str[8 - initial_lz:]
+    pos = 8 - initial_lz
+    initial_hex = '0' * initial_lz + delta_str[:pos]
     yield decode_func(initial_hex)
 
     curr_value = initial_hex
-    while lz_str != '':
-        lz = _decode_leading_zero(lz_str[0])
-        lz_str = lz_str[1:]
+    for lz_chr in lz_str[1:]:
+        lz = _decode_leading_zero(lz_chr)
 
-        hex_diff = '0' * lz + delta_str[:8 - lz]
+        hex_diff = '0' * lz + delta_str[pos:pos + 8 - lz]
         hex = _hex_delta_rev(curr_value, hex_diff)
         curr_value = hex
 
-        delta_str = delta_str[8 - lz:]
+        pos += 8 - lz
 
         yield decode_func(hex)
 
@@ -106,20 +104,23 @@ def _delta_encode_single_string(vals: List[Union[float, int]], encode_func: Call
 
 
 def _delta_decode_single_string(s: str, decode_func: Callable) -> Generator[Union[float, int], None, None]:
-    initial_lz = _decode_leading_zero(s[-1])
-    initial_hex = '0' * initial_lz + s[:8 - initial_lz]
-    s = s[8 - initial_lz:-1]
+    # hex deltas are read from the front of the string and leading zero codes from the back
+    end = len(s) - 1
+    initial_lz = _decode_leading_zero(s[end])
+    pos = 8 - initial_lz
+    initial_hex = '0' * initial_lz + s[:pos]
     yield decode_func(initial_hex)
 
     curr_value = initial_hex
-    while s:
-        lz = _decode_leading_zero(s[-1])
-        hex_diff = '0' * lz + s[:8 - lz]
+    while pos < end:
+        end -= 1
+        lz = _decode_leading_zero(s[end])
+        hex_diff = '0' * lz + s[pos:pos + 8 - lz]
 
         hex = _hex_delta_rev(curr_value, hex_diff)
         curr_value = hex
 
-        s = s[8 - lz:-1]
+        pos += 8 - lz
 
         yield decode_func(hex)
 
@@ -129,10 +130,8 @@ def _encode_indexes(indexes: List[int]) -> str:
 
 
 def _decode_indexes(s: str) -> Generator[int, None, None]:
-    while s:
-        index = int(s[:4], 16)
-        s = s[4:]
-        yield index
+    for pos in range(0, len(s), 4):
+        yield int(s[pos:pos + 4], 16)
 
 
 def compress_string(string: str, encode_function) -> str:
@@ -157,6 +156,9 @@ def _scale_intensity(intensity, min_intensity, max_intensity, reverse=False):
 def _hex_encode_lossy(intensities: List[float], n: int) -> str:
     min_intensity = min(intensities)
     max_intensity = max(intensities)
+    if min_intensity == max_intensity:
+        # constant intensities, every value decodes to min_intensity
+        return _int_to_hex(0, n) * len(intensities)
     intensities_hex = [
         _int_to_hex(int(_scale_intensity(intensity, min_intensity, max_intensity) * 255), n)
         for intensity in intensities
@@ -165,10 +167,9 @@ def _hex_encode_lossy(intensities: List[float], n: int) -> str:
 
 
 def _hex_decode_lossy(s: str, min_intensity: float, max_intensity: float, n : int = 2) -> Generator[float, None, None]:
-    while s:
-        hex_str = s[:n]
+    for pos in range(0, len(s), n):
+        hex_str = s[pos:pos + n]
         intensity = _scale_intensity(_hex_to_int(hex_str, n=8) / 255, min_intensity, max_intensity, reverse=True)
-        s = s[n:]
         yield intensity
 
 
@@ -220,8 +221,5 @@ def hex_encode(intensities: List[float]) -> str:
 
 
 def hex_decode(s: str) -> Generator[float, None, None]:
-    while s:
-        hex = s[:8]
-        intensity = _hex_to_float(hex)
-        s = s[8:]
-        yield intensity
\ No newline at end of file
+    for pos in range(0, len(s), 8):
+        yield _hex_to_float(s[pos:pos + 8])
\ No newline at end of file
@@ -0,0 +1,253 @@
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+# main reads its configuration on import, keep its database out of the working directory
+_TMP = tempfile.mkdtemp()
+os.environ.setdefault('MSMS_DB_FILE', os.path.join(_TMP, 'spectra.db'))
+
+try:
+    from fastapi.testclient import TestClient
+    import main
+except ImportError:  # the API dependencies are optional for the package
+    main = None
+
+
+def tearDownModule():
+    shutil.rmtree(_TMP, ignore_errors=True)
+
+
+good = {'mzs': [200.0, 100.0], 'intensities': [2.0, 1.0]}
+mismatched = {'mzs': [100.0, 200.0], 'intensities': [1.0]}
+
+
+@unittest.skipIf(main is None, "fastapi / aiosqlite aren't installed")
+class ApiTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.client = self.api()
+
+    def api(self, executor: str = 'thread', cache_bytes: int = 1 << 20, dedup_entries: int = 1000,
+            db_file: str = 'spectra.db', max_pending: int = 8) -> 'TestClient':
+        """A started app with its own database, executor, response cache and dedup index."""
+        for name, value in (('db', main.Database(os.path.join(self.tmp.name, db_file), readers=2)),
+                            ('offload', main.CompressionExecutor(executor, 2, max_pending)),
+                            ('response_cache', main.ResponseCache(cache_bytes)),
+                            ('dedup_index', main.DedupIndex(dedup_entries))):
+            patcher = mock.patch.object(main, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        client = TestClient(main.app)
+        client.__enter__()
+        self.addCleanup(client.__exit__, None, None, None)
+        return client
+
+
+class TestValidation(ApiTestCase):
+    def test_single_spectrum(self):
+        for endpoint in ('/compress', '/compress/url', '/compress/auto', '/store'):
+            self.assertEqual(422, self.client.post(endpoint, json=mismatched).status_code, endpoint)
+            self.assertEqual(200, self.client.post(endpoint, json=good).status_code, endpoint)
+
+    def test_mixed_batch(self):
+        for endpoint, field in (('/compress/batch', 'compressed_data'), ('/store/batch', 'key')):
+            response = self.client.post(endpoint, json={'spectra': [good, mismatched, good]})
+            self.assertEqual(200, response.status_code, endpoint)
+            results = response.json()['results']
+            self.assertIn(field, results[0])
+            self.assertEqual({'error': 'Got 2 mzs and 1 intensities'}, results[1])
+            self.assertEqual(results[0], results[2])
+
+    def test_mixed_batch_async(self):
+        self.client = self.api('async')
+        results = self.client.post('/store/batch', json={'spectra': [mismatched, good]}).json()['results']
+        self.assertIn('error', results[0])
+        self.assertIn('key', results[1])
+
+
+class TestDatabase(ApiTestCase):
+    def test_store_retrieve(self):
+        key = self.client.post('/store', json=good).json()['key']
+        response = self.client.get(f'/retrieve/{key}')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'mzs': [100.0, 200.0], 'intensities': [1.0, 2.0]}, response.json())
+        self.assertEqual(404, self.client.get('/retrieve/unknown').status_code)
+
+    def test_batch_store_resubmitted(self):
+        key = self.client.post('/store', json=good).json()['key']
+        other = {'mzs': [300.0], 'intensities': [3.0]}
+        results = self.client.post('/store/batch', json={'spectra': [other, good, other]}).json()['results']
+        self.assertEqual(key, results[1]['key'])
+        self.assertEqual(results[0], results[2])
+        with sqlite3.connect(main.db.path) as connection:
+            self.assertEqual('wal', connection.execute('PRAGMA journal_mode').fetchone()[0])
+            self.assertEqual(2, connection.execute('SELECT COUNT(*) FROM spectra').fetchone()[0])
+            self.assertEqual(2, connection.execute('SELECT COUNT(*) FROM digests').fetchone()[0])
+
+    def test_insert_many(self):
+        database = main.Database(os.path.join(self.tmp.name, 'insert.db'), readers=2)
+
+        async def run():
+            await database.open()
+            try:
+                # INSERT OR IGNORE: storing a key again keeps the first row
+                await database.insert_many([('a', 'first'), ('b', 'second')], [(b'digest', 'a')])
+                await database.insert_many([('a', 'again')], [(b'digest', 'b')])
+                # a failing batch leaves nothing behind, not even the rows before the failure
+                with self.assertRaises(Exception):
+                    await database.insert_many([('c', 'third'), ('d', {'not': 'bindable'})])
+                await database.insert_many([('e', 'fifth')])
+                # more concurrent reads than reader connections wait for a free one
+                return await asyncio.gather(*(database.get(key) for key in 'abcde' * 4),
+                                            database.get_key(b'digest'), database.exists('c'), database.exists('e'))
+            finally:
+                await database.close()
+
+        results = asyncio.run(run())
+        self.assertEqual(['first', 'second', None, None, 'fifth'] * 4, results[:20])
+        self.assertEqual(['a', False, True], results[20:])
+
+
+class TestRetrieveCache(ApiTestCase):
+    def test_response_cache_eviction(self):
+        cache = main.ResponseCache(10)
+        cache.put('a', b'1234')
+        cache.put('b', b'1234')
+        self.assertEqual(b'1234', cache.get('a'))  # 'b' is now the least recently used
+        cache.put('c', b'1234')
+        self.assertIsNone(cache.get('b'))
+        self.assertIn('a', cache)
+        self.assertIn('c', cache)
+        cache.put('d', b'12345678901')  # larger than the cache, not kept
+        self.assertNotIn('d', cache)
+        self.assertEqual({'hits': 1, 'misses': 1, 'evictions': 1, 'entries': 2, 'size_bytes': 8, 'max_bytes': 10},
+                         cache.stats())
+
+    def test_etag_matches(self):
+        etag = '"abc"'
+        for if_none_match in ('"abc"', '*', 'W/"abc"', '"x", "abc"', '"x",W/"abc"'):
+            self.assertTrue(main.etag_matches(etag, if_none_match), if_none_match)
+        for if_none_match in (None, '', '"x"', 'abc', '"abcd"', '"x", W/"y"'):
+            self.assertFalse(main.etag_matches(etag, if_none_match), if_none_match)
+
+    def test_not_modified(self):
+        key = self.client.post('/store', json=good).json()['key']
+        # before and after the response is cached
+        for _ in range(2):
+            for if_none_match in (f'"{key}"', '*', f'"other", W/"{key}"'):
+                response = self.client.get(f'/retrieve/{key}', headers={'If-None-Match': if_none_match})
+                self.assertEqual(304, response.status_code, if_none_match)
+                self.assertEqual(f'"{key}"', response.headers['ETag'])
+                self.assertEqual(b'', response.content)
+            response = self.client.get(f'/retrieve/{key}', headers={'If-None-Match': '"other"'})
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(f'"{key}"', response.headers['ETag'])
+        # only keys that exist are not modified
+        self.assertEqual(404, self.client.get('/retrieve/unknown', headers={'If-None-Match': '*'}).status_code)
+
+    def test_cache_stats(self):
+        self.client = self.api(cache_bytes=64)
+        keys = [self.client.post('/store', json={'mzs': [100.0 + i], 'intensities': [1.0]}).json()['key']
+                for i in range(2)]
+        for key in (keys[0], keys[0], keys[1], keys[0]):
+            self.assertEqual(200, self.client.get(f'/retrieve/{key}').status_code)
+        # a 304 doesn't touch the counters
+        self.client.get(f'/retrieve/{keys[0]}', headers={'If-None-Match': f'"{keys[0]}"'})
+        stats = self.client.get('/cache/stats').json()
+        # each response is ~40 bytes, so the cache only holds one of them
+        self.assertEqual({'hits': 1, 'misses': 3, 'evictions': 2, 'entries': 1, 'max_bytes': 64},
+                         {name: value for name, value in stats.items() if name != 'size_bytes'})
+
+
+class TestDedupIndex(ApiTestCase):
+    def test_eviction(self):
+        self.client = self.api(dedup_entries=2)
+        spectra = [{'mzs': [100.0 + i], 'intensities': [1.0]} for i in range(3)]
+        keys = [self.client.post('/store', json=spectrum).json()['key'] for spectrum in spectra]
+        # the first spectrum was evicted, it's found in the digests table and becomes the most recently used again
+        self.assertEqual(keys[0], self.client.post('/store', json=spectra[0]).json()['key'])
+        self.assertEqual(keys[2], self.client.post('/store', json=spectra[2]).json()['key'])
+        self.assertEqual({'hits': 1, 'db_hits': 1, 'misses': 3, 'evictions': 2, 'hit_rate': 0.4, 'entries': 2,
+                          'max_entries': 2}, self.client.get('/store/stats').json())
+
+    def test_restart(self):
+        spectra = [{'mzs': [100.0 + i], 'intensities': [1.0]} for i in range(3)]
+        keys = [result['key'] for result in
+                self.client.post('/store/batch', json={'spectra': spectra}).json()['results']]
+        # a new process starts with an empty index over the same database
+        self.client = self.api()
+        with mock.patch.object(main.db, 'get_keys', wraps=main.db.get_keys) as get_keys, \
+                mock.patch.object(main.offload, 'compress_many', wraps=main.offload.compress_many) as compress_many:
+            new = {'mzs': [500.0], 'intensities': [5.0]}
+            batch = [spectra[2], new, spectra[0], new, spectra[2]]
+            results = self.client.post('/store/batch', json={'spectra': batch}).json()['results']
+        self.assertEqual([keys[2], results[1]['key'], keys[0], results[1]['key'], keys[2]],
+                         [result['key'] for result in results])
+        # one lookup for every digest that isn't in memory, each distinct new spectrum is compressed once
+        self.assertEqual(1, get_keys.call_count)
+        self.assertEqual(1, len(compress_many.call_args.args[0]))
+        stats = self.client.get('/store/stats').json()
+        self.assertEqual((0, 2, 1, 3), (stats['hits'], stats['db_hits'], stats['misses'], stats['entries']))
+
+    def test_get_keys(self):
+        # more digests than fit in one IN (...) lookup
+        n = main.DIGEST_LOOKUP_CHUNK + 10
+        database = main.Database(os.path.join(self.tmp.name, 'digests.db'), readers=1)
+
+        async def run():
+            await database.open()
+            try:
+                await database.insert_many([], [(i.to_bytes(4, 'big'), str(i)) for i in range(0, n, 2)])
+                return await database.get_keys([i.to_bytes(4, 'big') for i in range(n)])
+            finally:
+                await database.close()
+
+        self.assertEqual({i.to_bytes(4, 'big'): str(i) for i in range(0, n, 2)}, asyncio.run(run()))
+
+
+class TestCompressionExecutor(ApiTestCase):
+    def test_backpressure(self):
+        executor = main.CompressionExecutor('inline', 1, 2)
+
+        async def run():
+            async with executor.slot(), executor.slot():
+                self.assertEqual(2, executor.pending)
+                with self.assertRaises(main.HTTPException) as context:
+                    async with executor.slot():
+                        pass
+            return context.exception
+
+        exception = asyncio.run(run())
+        self.assertEqual(503, exception.status_code)
+        self.assertEqual({'Retry-After': '1'}, exception.headers)
+        self.assertEqual(0, executor.pending)
+
+    def test_busy_endpoint(self):
+        self.client = self.api(max_pending=0)
+        response = self.client.post('/store', json=good)
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('1', response.headers['Retry-After'])
+
+    def test_modes(self):
+        expected = {'mzs': [100.0, 200.0], 'intensities': [1.0, 2.0]}
+        other = {'mzs': [300.0], 'intensities': [3.0]}
+        for mode in ('thread', 'process', 'inline', 'async'):
+            with self.subTest(mode=mode):
+                self.client = self.api(mode, db_file=f'{mode}.db')
+                key = self.client.post('/store', json=good).json()['key']
+                self.assertEqual(expected, self.client.get(f'/retrieve/{key}').json())
+                results = self.client.post('/store/batch', json={'spectra': [other, mismatched]}).json()['results']
+                self.assertIn('error', results[1])
+                self.assertEqual({'mzs': [300.0], 'intensities': [3.0]},
+                                 self.client.get(f"/retrieve/{results[0]['key']}").json())
+        with self.assertRaises(ValueError):
+            main.CompressionExecutor('fibers', 1, 1).start()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import mmap
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from msms_compression import SpectrumCompressorF32, GzipCompressor
+from msms_compression.archive import Archive, ArchiveWriter
+
+random.seed(0)
+spectra = {}
+for scan in random.sample(range(1, 10_000), 50):
+    mzs = np.sort(np.random.uniform(100, 2000, random.randint(0, 100))).astype(np.float32)
+    intensities = np.random.uniform(1, 1e4, len(mzs)).astype(np.float32)
+    spectra[scan] = (random.uniform(300, 1500), mzs.tolist(), intensities.tolist())
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.msca')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def _write(self, **kwargs):
+        with ArchiveWriter(self.path, **kwargs) as writer:
+            for scan, (precursor_mz, mzs, intensities) in spectra.items():
+                writer.add(scan, precursor_mz, mzs, intensities)
+
+    def test_random_access(self):
+        self._write()
+        with Archive(self.path) as archive:
+            self.assertEqual(len(spectra), len(archive))
+            self.assertEqual(sorted(spectra), archive.scans.tolist())
+            for scan, (_, mzs, intensities) in spectra.items():
+                self.assertIn(scan, archive)
+                self.assertEqual((mzs, intensities), archive[scan])
+            self.assertNotIn(10_001, archive)
+            with self.assertRaises(KeyError):
+                archive.get(10_001)
+
+    def test_query_precursor(self):
+        self._write(spectrum_compressor=SpectrumCompressorF32(), data_compressor=GzipCompressor())
+        with Archive(self.path, SpectrumCompressorF32(), GzipCompressor()) as archive:
+            scans = sorted(scan for scan, _, _ in archive.query_precursor(500, 800))
+        self.assertEqual(sorted(scan for scan, (precursor_mz, _, _) in spectra.items() if 500 <= precursor_mz <= 800),
+                         scans)
+
+    def test_compressor_mismatch(self):
+        self._write()
+        maps, real_mmap = [], mmap.mmap
+
+        def mapped(*args, **kwargs):
+            maps.append(real_mmap(*args, **kwargs))
+            return maps[-1]
+
+        with mock.patch('mmap.mmap', side_effect=mapped), self.assertRaises(ValueError):
+            Archive(self.path, SpectrumCompressorF32())
+        # the map isn't left open when the archive is rejected
+        self.assertTrue(maps[0].closed)
+
+    def test_not_an_archive(self):
+        for content, message in ((b'', 'not a spectrum archive'), (b'MSCA', 'not a spectrum archive'),
+                                 (b'x' * 64, 'not a spectrum archive'), (b'MSCA\x01' + bytes(64), 'truncated')):
+            with open(self.path, 'wb') as f:
+                f.write(content)
+            with self.assertRaisesRegex(ValueError, message):
+                Archive(self.path)
+
+    def test_close_with_scans(self):
+        self._write()
+        archive = Archive(self.path)
+        scans = archive.scans
+        archive.close()
+        self.assertEqual(sorted(spectra), scans.tolist())
+
+    def test_duplicate_scan(self):
+        with ArchiveWriter(self.path) as writer:
+            writer.add(1, 500.0, [100.0], [1.0])
+            with self.assertRaises(ValueError):
+                writer.add(1, 500.0, [100.0], [1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
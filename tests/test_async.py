@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+
+from msms_compression import BaseCompressor, SpectrumCompressorB85, SpectrumCompressorF32, SkipCompressor, \
+    B85Encoder, SelfDescribingCompressor, BrotliCompressor, agather, adecompress
+from msms_compression.instrumentation import InMemorySink
+
+mz_values = [100.0, 200.0, 300.0]
+intensity_values = [50.0, 20.0, 30.0]
+
+
+class TestAsync(unittest.TestCase):
+    def test_acompress(self):
+        compressed = asyncio.run(SpectrumCompressorB85.acompress(mz_values, intensity_values))
+        self.assertEqual(SpectrumCompressorB85.compress(mz_values, intensity_values), compressed)
+        self.assertEqual((mz_values, intensity_values), asyncio.run(SpectrumCompressorB85.adecompress(compressed)))
+
+        compressor = BaseCompressor(SpectrumCompressorF32(), SkipCompressor(), B85Encoder())
+        compressed = asyncio.run(compressor.acompress(mz_values, intensity_values))
+        self.assertEqual((mz_values, intensity_values), compressor.decompress(compressed))
+
+    def test_acompress_many(self):
+        spectra = [(mz_values, intensity_values), (mz_values, ['not a number']), (mz_values[:1], intensity_values[:1])]
+        results = asyncio.run(SpectrumCompressorB85.acompress_many(spectra, limit=2))
+        self.assertEqual(SpectrumCompressorB85.compress(mz_values, intensity_values), results[0])
+        self.assertIsInstance(results[1], Exception)
+
+        decompressed = asyncio.run(SpectrumCompressorB85.adecompress_many([results[0], results[2]]))
+        self.assertEqual([(mz_values, intensity_values), (mz_values[:1], intensity_values[:1])], decompressed)
+
+    def test_agather_order(self):
+        async def delayed(i):
+            await asyncio.sleep(0.001 * (5 - i))
+            return i
+        self.assertEqual(list(range(5)), asyncio.run(agather((delayed(i) for i in range(5)), limit=3)))
+
+    def test_self_describing(self):
+        sink = InMemorySink()
+        compressor = SelfDescribingCompressor(SpectrumCompressorF32(), BrotliCompressor(), B85Encoder(),
+                                              instrumentation=sink)
+        compressed = asyncio.run(compressor.acompress(mz_values, intensity_values))
+        self.assertEqual(compressor.compress(mz_values, intensity_values), compressed)
+        self.assertEqual((mz_values, intensity_values), asyncio.run(adecompress(compressed)))
+        self.assertIn('acompress', sink.snapshot()[str(compressor)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from msms_compression import ChunkedCompressor, BaseCompressor, SpectrumCompressorB85, SpectrumCompressorBinaryB85, \
+    SpectrumCompressorPpm, GzipCompressor, B85Encoder
+
+rng = np.random.default_rng(0)
+mzs = np.sort(rng.uniform(100, 2000, 5003))
+intensities = rng.lognormal(8, 2, 5003)
+
+
+class TestChunkedCompressor(unittest.TestCase):
+    def test_same_as_unchunked(self):
+        ppm = BaseCompressor(SpectrumCompressorPpm(5), GzipCompressor(), B85Encoder())
+        for compressor in (SpectrumCompressorB85, SpectrumCompressorBinaryB85, ppm):
+            chunked = ChunkedCompressor(compressor, 1000)
+            for spectrum in ((mzs, intensities), (mzs.tolist(), intensities.tolist()), (mzs[:3], intensities[:3])):
+                compressed = chunked.compress(*spectrum)
+                unchunked = compressor.compress(*spectrum)
+                self.assertEqual(compressor.decompress(unchunked), chunked.decompress(compressed))
+                for expected, actual in zip(compressor.decompress(unchunked, as_numpy=True),
+                                            chunked.decompress(compressed, as_numpy=True)):
+                    self.assertEqual(expected.dtype, actual.dtype)
+                    np.testing.assert_array_equal(expected, actual)
+
+    def test_segments(self):
+        chunked = ChunkedCompressor(SpectrumCompressorBinaryB85, 1000)
+        self.assertEqual([1000] * 5 + [3], [len(m) for m, _ in chunked.segments(mzs, intensities)])
+        self.assertEqual(1, len(chunked.segments([], [])))
+        self.assertEqual(([], []), chunked.decompress(chunked.compress([], [])))
+        with self.assertRaises(ValueError):
+            chunked.segments(mzs, intensities[:-1])
+        with self.assertRaises(ValueError):
+            ChunkedCompressor(SpectrumCompressorBinaryB85, 0)
+
+    def test_executor(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            chunked = ChunkedCompressor(SpectrumCompressorBinaryB85, 512, executor)
+            compressed = chunked.compress(mzs, intensities)
+            self.assertEqual(ChunkedCompressor(SpectrumCompressorBinaryB85, 512).compress(mzs, intensities),
+                             compressed)
+            decompressed_mzs, decompressed_intensities = chunked.decompress(compressed, as_numpy=True)
+        np.testing.assert_array_equal(mzs.astype(np.float32), decompressed_mzs)
+        np.testing.assert_array_equal(intensities.astype(np.float32), decompressed_intensities)
+
+    def test_corrupt(self):
+        compressed = B85Encoder().decode(ChunkedCompressor(SpectrumCompressorBinaryB85, 1000)
+                                         .compress(mzs, intensities).encode('utf-8'))
+        with self.assertRaises(ValueError):
+            ChunkedCompressor(SpectrumCompressorBinaryB85).decompress(
+                B85Encoder().encode(compressed[:-10]).decode('utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
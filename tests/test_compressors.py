@@ -1,8 +1,14 @@
+import array
 import unittest
+from unittest import mock
 import numpy as np
 
 from msms_compression import SpectrumCompressorB85 as SpectrumCompressorF32
 from msms_compression import SpectrumCompressorUrl as SpectrumCompressorF32Url
+from msms_compression import SpectrumCompressorBinaryB85, SpectrumCompressorPpm, SpectrumCompressorBinaryBlocks, \
+    SpectrumCompressorI32Binary, SpectrumCompressorI32, BaseCompressor, BrotliCompressor, B85Encoder, SkipCompressor, \
+    SpectrumCompressorBinary, SpectrumCompressorF32LzstringUri
+from msms_compression.encoder import SkipEncoder
 
 mz_values = list(np.array([100.0, 100.0, 200.0, 300.0, 300.0], dtype=np.float32))
 intensity_values = list(np.array([50.0, 20.0, 30.0, 20.0, 50.0], dtype=np.float32))
@@ -24,6 +30,140 @@ class TestCompressor(unittest.TestCase):
         self.assertEqual(mz_values, decompressed_mz)
         self.assertEqual(intensity_values, decompressed_intensity)
 
+    def test_compress_decompress_binary(self):
+        compressed = SpectrumCompressorBinaryB85.compress(mz_values, intensity_values)
+        decompressed_mz, decompressed_intensity = SpectrumCompressorBinaryB85.decompress(compressed)
+
+        self.assertEqual(mz_values, decompressed_mz)
+        self.assertEqual(intensity_values, decompressed_intensity)
+        self.assertEqual(([], []), SpectrumCompressorBinaryB85.decompress(SpectrumCompressorBinaryB85.compress([], [])))
+
+    def test_compress_buffers(self):
+        expected = SpectrumCompressorF32.compress(mz_values, intensity_values)
+        for convert in (np.array, lambda x: array.array('f', x), lambda x: memoryview(array.array('f', x))):
+            self.assertEqual(expected, SpectrumCompressorF32.compress(convert(mz_values), convert(intensity_values)))
+
+    def test_decompress_numpy(self):
+        compressed = SpectrumCompressorF32.compress(mz_values, intensity_values)
+        decompressed_mz, decompressed_intensity = SpectrumCompressorF32.decompress(compressed, as_numpy=True)
+
+        self.assertIsInstance(decompressed_mz, np.ndarray)
+        self.assertEqual(np.float32, decompressed_mz.dtype)
+        np.testing.assert_array_equal(mz_values, decompressed_mz)
+        np.testing.assert_array_equal(intensity_values, decompressed_intensity)
+
+    def test_compress_many(self):
+        spectra = [(mz_values, intensity_values), (mz_values, ['not a number']), (mz_values[:2], intensity_values[:2])]
+        results = list(SpectrumCompressorF32.compress_many(spectra, executor='thread', chunk_size=2))
+
+        self.assertEqual(results[0], SpectrumCompressorF32.compress(mz_values, intensity_values))
+        self.assertIsInstance(results[1], Exception)
+        self.assertEqual(results[2], SpectrumCompressorF32.compress(mz_values[:2], intensity_values[:2]))
+
+        decompressed = list(SpectrumCompressorF32.decompress_many([results[0], results[2]], executor='thread'))
+        self.assertEqual(decompressed[0], (mz_values, intensity_values))
+        self.assertEqual(decompressed[1], (mz_values[:2], intensity_values[:2]))
+
+    def test_ppm_tolerance(self):
+        mzs = sorted(np.random.default_rng(0).uniform(0.5, 4000, 1000))
+        intensities = list(np.arange(1, 1001, dtype=np.float32))
+        for tolerance in (0.5, 5, 20):
+            compressor = SpectrumCompressorPpm(tolerance)
+            decompressed_mz, decompressed_intensity = compressor.decompress(compressor.compress(mzs, intensities))
+            self.assertLessEqual(np.max(np.abs(np.array(decompressed_mz) - mzs) / mzs), tolerance * 1e-6)
+            self.assertEqual(intensities, decompressed_intensity)
+        self.assertEqual(([], []), compressor.decompress(compressor.compress([], [])))
+        with self.assertRaises(ValueError):
+            compressor.compress([0.0, 1.0], [1.0, 1.0])
+
+    def test_i32_binary(self):
+        mzs = np.sort(np.random.default_rng(2).uniform(100, 2000, 300)).round(3).tolist()
+        intensities = np.random.default_rng(3).lognormal(8, 2, 300).round(1).tolist()
+        text_mzs, text_intensities = SpectrumCompressorI32(3, 1).decompress(
+            SpectrumCompressorI32(3, 1).compress(mzs, intensities))
+        for block_size in (None, 32):
+            compressor = SpectrumCompressorI32Binary(3, 1, block_size=block_size)
+            decompressed_mz, decompressed_intensity = compressor.decompress(compressor.compress(mzs, intensities))
+            self.assertEqual(mzs, decompressed_mz)
+            np.testing.assert_allclose(text_intensities, decompressed_intensity, rtol=0.02)
+        self.assertEqual(([300.0, 100.0], [1.0, 2.0]), compressor.decompress(compressor.compress([300, 100], [1, 2])))
+        self.assertEqual(([], []), compressor.decompress(compressor.compress([], [])))
+
+    def test_block_query(self):
+        mzs = np.round(np.sort(np.random.default_rng(1).uniform(100, 2000, 1000)), 1)
+        mzs[60:70] = mzs[64]  # duplicates across the 64 peak block boundary
+        intensities = np.arange(1, 1001, dtype=np.float32)
+        compressor = SpectrumCompressorBinaryBlocks(64)
+        b = compressor.compress(mzs, intensities)
+        decompressed_mz, decompressed_intensity = compressor.decompress(b, as_numpy=True)
+        np.testing.assert_array_equal(mzs.astype(np.float32), decompressed_mz)
+        np.testing.assert_array_equal(intensities, decompressed_intensity)
+
+        for lo, hi in ((mzs[64], mzs[64]), (0, 50), (99, 150.25), (mzs[500], mzs[700]), (1999, 3000), (300, 200)):
+            mask = (decompressed_mz >= lo) & (decompressed_mz <= hi)
+            queried_mz, queried_intensity = compressor.query(b, lo, hi, as_numpy=True)
+            np.testing.assert_array_equal(decompressed_mz[mask], queried_mz)
+            np.testing.assert_array_equal(decompressed_intensity[mask], queried_intensity)
+
+        peaks = list(zip(*compressor.decompress(b)))
+        with mock.patch.object(compressor, '_index', wraps=compressor._index) as index:
+            self.assertEqual(peaks, list(compressor.iter_peaks(b)))
+        self.assertEqual(1, index.call_count)  # not once per block
+        self.assertEqual(([], []), compressor.decompress(compressor.compress([], [])))
+        self.assertEqual(([], []), compressor.query(compressor.compress([], []), 0, 1000))
+
+    def test_block_sizes(self):
+        mzs = np.sort(np.random.default_rng(2).uniform(100, 2000, 101)).astype(np.float32)
+        intensities = np.random.default_rng(3).uniform(1, 1e5, 101).astype(np.float32)
+        for block_size in (1, 3, 7, 100, 101, 500):
+            compressor = SpectrumCompressorBinaryBlocks(block_size)
+            b = compressor.compress(mzs, intensities)
+            for actual, expected in zip(compressor.decompress(b, as_numpy=True), (mzs, intensities)):
+                np.testing.assert_array_equal(expected, actual)
+            # odd block sizes start blocks in the middle of a leading zero code byte
+            queried_mz, queried_intensity = compressor.query(b, mzs[10], mzs[50], as_numpy=True)
+            np.testing.assert_array_equal(mzs[10:51], queried_mz)
+            np.testing.assert_array_equal(intensities[10:51], queried_intensity)
+            with self.assertRaises(ValueError):
+                compressor.decompress(b[:-1])
+
+    def test_block_unsorted(self):
+        compressor = SpectrumCompressorBinaryBlocks(4)
+        with self.assertRaises(ValueError):
+            compressor.compress([500.0, 100.0, 900.0, 300.0, 200.0, 800.0, 150.0, 600.0, 700.0], [1.0] * 9)
+        # repeated m/z values are sorted
+        self.assertEqual(mz_values, compressor.decompress(compressor.compress(mz_values, intensity_values))[0])
+
+    def test_pipeline_query(self):
+        for spectrum_compressor in (SpectrumCompressorBinaryBlocks(16), SpectrumCompressorPpm(5)):
+            compressor = BaseCompressor(spectrum_compressor, BrotliCompressor(), B85Encoder())
+            compressed = compressor.compress(mz_values, intensity_values)
+            queried_mz, queried_intensity = compressor.query(compressed, 150, 300)
+            self.assertEqual(3, len(queried_mz))
+            self.assertEqual([30.0, 20.0, 50.0], queried_intensity)
+            self.assertEqual(5, len(list(compressor.iter_peaks(compressed))))
+
+    def test_compress_bytes(self):
+        mzs = np.sort(np.random.default_rng(0).uniform(100, 2000, 300)).astype(np.float32)
+        intensities = np.random.default_rng(1).uniform(1, 1e5, 300).astype(np.float32)
+        ppm = BaseCompressor(SpectrumCompressorPpm(5), BrotliCompressor(), B85Encoder())
+        for compressor in (SpectrumCompressorF32, SpectrumCompressorF32Url, SpectrumCompressorBinaryB85,
+                           SpectrumCompressorF32LzstringUri, ppm):
+            for spectrum in ((mzs, intensities), ([], []), (mz_values, intensity_values)):
+                b = compressor.compress_bytes(*spectrum)
+                self.assertIsInstance(b, bytes)
+                self.assertEqual(compressor.compress(*spectrum).encode('utf-8'), b)
+                self.assertEqual(compressor.decompress(b.decode('utf-8')), compressor.decompress_bytes(b))
+                self.assertEqual(compressor.decompress_bytes(b), compressor.decompress_bytes(memoryview(b)))
+
+    def test_compress_bytes_owned(self):
+        # without a data compressor / encoder the buffer view is passed through, the result must still be a copy
+        compressor = BaseCompressor(SpectrumCompressorBinary(), SkipCompressor(), SkipEncoder())
+        b = compressor.compress_bytes(mz_values, intensity_values)
+        compressor.compress_bytes([1.0] * 50, [2.0] * 50)
+        self.assertEqual(SpectrumCompressorBinary().compress(mz_values, intensity_values), b)
+        self.assertEqual((mz_values, intensity_values), compressor.decompress_bytes(b))
+
 
 if __name__ == '__main__':
     unittest.main()
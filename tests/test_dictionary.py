@@ -0,0 +1,48 @@
+import pickle
+import random
+import unittest
+
+from msms_compression import BaseCompressor, DictionaryCompressor, SpectrumCompressorF32, B85Encoder, \
+    train_dictionary
+
+random.seed(0)
+
+
+def random_spectrum(n_peaks):
+    mzs = sorted(round(random.uniform(100, 2000), 4) for _ in range(n_peaks))
+    intensities = [round(random.uniform(1, 10_000), 1) for _ in range(n_peaks)]
+    return mzs, intensities
+
+
+spectrum_compressor = SpectrumCompressorF32()
+samples = [spectrum_compressor.compress(*random_spectrum(random.randint(10, 50))) for _ in range(100)]
+
+
+class TestDictionaryCompressor(unittest.TestCase):
+    def test_train_dictionary(self):
+        dictionary = train_dictionary(samples, size=1024)
+        self.assertLessEqual(len(dictionary), 1024)
+        self.assertIn(b'", "', dictionary)
+
+    def test_compress_decompress(self):
+        compressor = BaseCompressor(spectrum_compressor, DictionaryCompressor(train_dictionary(samples)), B85Encoder())
+        mzs, intensities = random_spectrum(20)
+        compressed = compressor.compress(mzs, intensities)
+        self.assertEqual(spectrum_compressor.decompress(spectrum_compressor.compress(mzs, intensities)),
+                         compressor.decompress(compressed))
+
+    def test_unknown_dictionary(self):
+        data_compressor = DictionaryCompressor(b'unregistered dictionary')
+        payload = bytearray(data_compressor.compress(samples[0].encode()))
+        payload[0] ^= 0xFF
+        with self.assertRaises(ValueError):
+            data_compressor.decompress(bytes(payload))
+
+    def test_pickle(self):
+        data_compressor = pickle.loads(pickle.dumps(DictionaryCompressor(train_dictionary(samples))))
+        b = samples[0].encode()
+        self.assertEqual(b, data_compressor.decompress(data_compressor.compress(b)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from msms_compression import FrameCompressor, SpectrumCompressorB85, SpectrumCompressorBinaryB85
+
+rng = np.random.default_rng(0)
+spectra = [(np.sort(rng.uniform(100, 2000, n)).astype(np.float32).tolist(),
+            rng.uniform(1, 1000, n).astype(np.float32).tolist()) for n in (10, 0, 50, 1, 30, 20, 5)]
+
+
+class TestFrameCompressor(unittest.TestCase):
+    def test_round_trip(self):
+        for compressor in (SpectrumCompressorB85, SpectrumCompressorBinaryB85):
+            for frame_size in (1, 3, 16):
+                frames = FrameCompressor(compressor, frame_size)
+                compressed = frames.compress(spectra)
+                self.assertEqual(-(-len(spectra) // frame_size), len(compressed))
+                self.assertEqual([compressor.decompress(compressor.compress(*s)) for s in spectra],
+                                 frames.decompress(compressed))
+
+    def test_random_access(self):
+        frames = FrameCompressor(SpectrumCompressorBinaryB85, 3)
+        compressed = frames.compress(spectra)
+        for i in (6, 0, 4, 5, 2):
+            self.assertEqual(spectra[i], frames.get_spectrum(compressed, i))
+        with self.assertRaises(IndexError):
+            frames.get(compressed[-1], 1)
+
+    def test_shared_peaks(self):
+        # repeated scans of a precursor compress better in one frame than one by one
+        repeated = [spectra[2]] * 8
+        single = sum(len(SpectrumCompressorBinaryB85.compress(*s)) for s in repeated)
+        framed = sum(len(s) for s in FrameCompressor(SpectrumCompressorBinaryB85, 8).compress(repeated))
+        self.assertLess(framed, single / 4)
+
+    def test_frame_size(self):
+        with self.assertRaises(ValueError):
+            FrameCompressor(SpectrumCompressorB85, 2).compress_frame(spectra[:3])
+        with self.assertRaises(ValueError):
+            FrameCompressor(SpectrumCompressorB85, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
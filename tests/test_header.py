@@ -0,0 +1,91 @@
+import unittest
+
+import numpy as np
+
+from msms_compression import SelfDescribingCompressor, AutoCompressor, decompress, SpectrumCompressorB85, \
+    SpectrumCompressorF32, SpectrumCompressorI32, SpectrumCompressorBinary, BrotliCompressor, GzipCompressor, \
+    SpectrumCompressorPpm, DictionaryCompressor, B85Encoder, UrlEncoder
+from msms_compression.header import make_header, split_header, pipeline_for_header
+
+mz_values = list(np.array([100.0, 100.0, 200.0, 300.0, 300.0], dtype=np.float32))
+intensity_values = list(np.array([50.0, 20.0, 30.0, 20.0, 50.0], dtype=np.float32))
+
+# legacy headerless F32 / Brotli / B85 payload that starts like a header without the marker: '8zcf~'
+legacy_payload = ('8zcf~jME*p2$rC^)F3QdU36@w{*V}(z*|Jcbq5l4>-IH2fIezr|LM_zFv7$<a2qzF<Mx(<@RR!F_voBUum`L6O+agQDWDoRGl<qg'
+                  ')~*##xvvidXDx?kE$_bvsO4+lL=m&szwp8q-V&6^b%^|Hd1!VenuGbRInf-~s}^=Ew{H>|_xNqh!LzQ=xtzC7MTAbSo67x2-c6Dc'
+                  'MT#zWI_V@yitenJZl8RT-7zyMD$co*{`dba_ck+=Sm>()ASoudaCw}F2<%0$%fQ5Dc0D3uY2;QnNy_K3kkceiE*y;kucQ1IQSWbo'
+                  'NcjttktzV%-JYsZBJnWoz={^59KR=I`-S+wO?+{T6VPQ{6K<aS4F')
+legacy_mzs = [
+    110.15, 141.53, 232.27, 252.64, 258.04, 286.29, 326.67, 373.76, 387.67, 414.03, 450.47, 487.41, 508.62, 508.81,
+    528.58, 561.36, 583.69, 607.77, 628.79, 634.63, 729.01, 754.24, 782.65, 904.91, 962.57, 1196.91, 1418.05,
+    1419.4, 1606.83, 1715.89, 1716.86, 1784.01, 1815.49, 1819.69, 1857.92, 1861.56, 1869.16, 1978.76
+]
+legacy_intensities = [
+    567.5, 929.7, 807.9, 42.5, 736.4, 900.3, 243.7, 667.1, 621.3, 746.0, 966.9, 564.6, 212.9, 282.9, 119.6, 468.4,
+    761.8, 16.2, 672.3, 998.0, 830.4, 901.6, 701.5, 237.7, 518.6, 160.1, 896.9, 967.8, 815.5, 617.7, 562.6, 441.4,
+    651.4, 319.4, 493.5, 474.3, 554.1, 258.1
+]
+
+
+class TestHeader(unittest.TestCase):
+    def test_make_header(self):
+        self.assertEqual('.1fbk~', make_header(SpectrumCompressorF32(), BrotliCompressor(), B85Encoder()))
+        self.assertEqual('.1igu3_1_~', make_header(SpectrumCompressorI32(3, 1), GzipCompressor(), UrlEncoder()))
+        self.assertEqual(('.1igu3_1_~', 'abc'), split_header('.1igu3_1_~abc'))
+        self.assertEqual((None, 'abc'), split_header('abc'))
+        self.assertEqual((None, '1igu3_1_~abc'), split_header('1igu3_1_~abc'))
+        with self.assertRaises(ValueError):
+            make_header(SpectrumCompressorI32(300000, 1), BrotliCompressor(), B85Encoder())
+
+    def test_round_trip(self):
+        pipelines = [SelfDescribingCompressor(SpectrumCompressorF32(), BrotliCompressor(), B85Encoder()),
+                     SelfDescribingCompressor(SpectrumCompressorI32(3, 1), GzipCompressor(), UrlEncoder()),
+                     SelfDescribingCompressor(SpectrumCompressorPpm(2.5, 0.01), BrotliCompressor(), B85Encoder()),
+                     SelfDescribingCompressor(SpectrumCompressorBinary(),
+                                              DictionaryCompressor(b'header test dictionary'), B85Encoder())]
+        for pipeline in pipelines:
+            compressed = pipeline.compress(mz_values, intensity_values)
+            self.assertTrue(compressed.startswith(pipeline.header))
+            expected = pipeline.decompress(compressed)
+            self.assertEqual(expected, decompress(compressed))
+            self.assertEqual(str(pipeline), 'SelfDescribing(' + str(pipeline_for_header(pipeline.header)) + ')')
+
+    def test_legacy_payload(self):
+        compressed = SpectrumCompressorB85.compress(mz_values, intensity_values)
+        self.assertEqual((mz_values, intensity_values), decompress(compressed, default=SpectrumCompressorB85))
+        with self.assertRaises(ValueError):
+            decompress(compressed)
+
+    def test_legacy_payload_like_header(self):
+        self.assertEqual((None, legacy_payload), split_header(legacy_payload))
+        expected = (np.float32(legacy_mzs).tolist(), np.float32(legacy_intensities).tolist())
+        self.assertEqual(expected, SpectrumCompressorB85.decompress(legacy_payload))
+        self.assertEqual(expected, decompress(legacy_payload, default=SpectrumCompressorB85))
+
+    def test_invalid_header(self):
+        for header in ('.9fbk~', '.1xbk~', '.1ibk3_1~', '.1ibk300000_1_~', '.1ibk2.5_1_~', '.1sbk_1~', '.1pbknan_~',
+                       '.1lbk1_0_~', '.1qbk100000000~', '1fbk~'):
+            with self.assertRaises(ValueError, msg=header):
+                pipeline_for_header(header)
+        # a header that can't be read falls back to the default pipeline
+        compressed = '.1ibk300000_1_~' + SpectrumCompressorB85.compress(mz_values, intensity_values)
+        with self.assertRaises(ValueError):
+            decompress(compressed)
+        with self.assertRaises(ValueError):
+            decompress(compressed, default=SpectrumCompressorB85)  # the default can't read it either
+
+    def test_auto_compressor(self):
+        compressor = AutoCompressor(time_budget=1.0)
+        compressed = compressor.compress(mz_values, intensity_values)
+        smallest = min(len(candidate.compress(mz_values, intensity_values)) for candidate in compressor.candidates)
+        self.assertEqual(smallest, len(compressed))
+        self.assertEqual((mz_values, intensity_values), compressor.decompress(compressed))
+        self.assertEqual(1, sum(compressor.chosen.values()))
+
+        # with no time budget only the first candidate is tried
+        compressor = AutoCompressor(time_budget=0)
+        self.assertTrue(compressor.compress(mz_values, intensity_values).startswith(compressor.candidates[0].header))
+
+
+if __name__ == '__main__':
+    unittest.main()
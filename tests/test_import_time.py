@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# import time budget of msms_compression in ms, generous for slow CI machines; MSMS_IMPORT_BUDGET_MS overrides it
+IMPORT_BUDGET_MS = float(os.environ.get("MSMS_IMPORT_BUDGET_MS", "50"))
+
+
+def run(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *options, "-c", code], capture_output=True, text=True, check=True)
+
+
+def import_time_us(stderr: str, module: str) -> int:
+    """Cumulative import time of ``module`` from ``python -X importtime`` output."""
+    for line in stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if line.startswith("import time:") and len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise AssertionError(f"{module} not found in -X importtime output")
+
+
+class TestImportTime(unittest.TestCase):
+    def test_import_budget(self):
+        # best of a few runs, the first one may pay for a cold disk cache
+        times = [import_time_us(run("import msms_compression", "-X", "importtime").stderr, "msms_compression")
+                 for _ in range(3)]
+        self.assertLess(min(times) / 1000, IMPORT_BUDGET_MS)
+
+    def test_backends_load_on_first_use(self):
+        code = ("import sys\n"
+                "import msms_compression\n"
+                "from msms_compression import BaseCompressor, brotli_compressor\n"
+                "print(sorted(m for m in ('numpy', 'brotli', 'gzip', 'asyncio') if m in sys.modules))\n"
+                "msms_compression.SpectrumCompressorB85.compress([100.0], [1.0])\n"
+                "print(sorted(m for m in ('numpy', 'brotli') if m in sys.modules))\n")
+        before, after = run(code).stdout.splitlines()
+        self.assertEqual("[]", before)
+        self.assertEqual("['brotli', 'numpy']", after)
+
+    def test_lazy_attributes(self):
+        import msms_compression
+        self.assertIs(msms_compression.spectrum_compressor_f32, msms_compression.spectrum_compressor_f32)
+        self.assertIn("SpectrumCompressorB85", dir(msms_compression))
+        with self.assertRaises(AttributeError):
+            msms_compression.not_a_compressor
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import logging
+import pickle
+import unittest
+
+from msms_compression import BaseCompressor, SpectrumCompressorF32, SpectrumCompressorBinary, BrotliCompressor, \
+    B85Encoder
+from msms_compression.instrumentation import Histogram, InMemorySink, LoggingSink, PrometheusSink
+
+mz_values = [100.0, 200.0, 300.0]
+intensity_values = [50.0, 20.0, 30.0]
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram([1, 10, 100])
+        for value in (0.5, 1, 5, 50, 500):
+            histogram.observe(value)
+        self.assertEqual([2, 1, 1, 1], histogram.counts)
+        self.assertEqual(10, histogram.quantile(0.5))
+        self.assertEqual(float('inf'), histogram.quantile(1.0))
+
+    def test_in_memory_sink(self):
+        sink = InMemorySink()
+        compressor = BaseCompressor(SpectrumCompressorF32(), BrotliCompressor(), B85Encoder(), instrumentation=sink)
+        compressed = compressor.compress(mz_values, intensity_values)
+        self.assertEqual((mz_values, intensity_values), compressor.decompress(compressed))
+
+        stages = sink.snapshot()[str(compressor)]
+        self.assertEqual({'spectrum', 'utf8', 'data', 'encoder', 'total'}, set(stages['compress']))
+        self.assertEqual(1, stages['compress']['total']['seconds']['count'])
+        self.assertEqual(len(compressed), stages['compress']['encoder']['bytes']['sum'])
+        self.assertEqual(stages['compress']['data']['bytes']['sum'], stages['decompress']['encoder']['bytes']['sum'])
+
+    def test_prometheus_sink(self):
+        sink = PrometheusSink()
+        compressor = BaseCompressor(SpectrumCompressorBinary(), BrotliCompressor(), B85Encoder(),
+                                    instrumentation=sink)
+        compressor.decompress(compressor.compress(mz_values, intensity_values))
+        text = sink.render()
+        self.assertIn('# TYPE msms_compression_stage_seconds histogram', text)
+        self.assertIn('msms_compression_stage_seconds_count{pipeline="SpectrumCompressorBinary_BrotliCompressor_'
+                      'B85Encoder",operation="compress",stage="total"} 1', text)
+        self.assertIn('le="+Inf"} 1', text)
+
+    def test_logging_sink(self):
+        compressor = BaseCompressor(SpectrumCompressorF32(), BrotliCompressor(), B85Encoder(),
+                                    instrumentation=LoggingSink(level=logging.INFO))
+        with self.assertLogs('msms_compression', level='INFO') as logs:
+            compressor.compress(mz_values, intensity_values)
+        self.assertIn('compress', logs.output[0])
+
+    def test_pickle_drops_sink(self):
+        compressor = BaseCompressor(SpectrumCompressorF32(), BrotliCompressor(), B85Encoder(),
+                                    instrumentation=InMemorySink())
+        self.assertIsNone(pickle.loads(pickle.dumps(compressor)).instrumentation)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import random
+import unittest
+
+from msms_compression import lz_string, SpectrumCompressorF32LzstringUri, BaseCompressor, \
+    spectrum_compressor_binary, brotli_compressor, lzstring_encoder
+
+random.seed(0)
+hex_text = ''.join(random.choice('0123456789abcdef') for _ in range(5000))
+
+
+class TestLzString(unittest.TestCase):
+    def test_matches_javascript(self):
+        # outputs of the lz-string JavaScript library
+        self.assertEqual('BIUwNmD2A0AEDukBOYAmBCIA', lz_string.compress_to_encoded_uri_component('Hello, world!'))
+        self.assertEqual('BIUwNmD2A0AEDukBOYAmBCIA', lz_string.compress_to_base64('Hello, world!'))
+        self.assertEqual('Q===', lz_string.compress_to_base64(''))
+
+    def test_round_trip(self):
+        for s in ('', 'a', 'aaaaaaaaaa', 'TOBEORNOTTOBEORTOBEORNOT' * 10, hex_text, 'héllo ✓ 𝄞', '✓' * 50,
+                  ''.join(chr(i) for i in range(256))):
+            self.assertEqual(s, lz_string.decompress_from_encoded_uri_component(
+                lz_string.compress_to_encoded_uri_component(s)))
+            self.assertEqual(s, lz_string.decompress_from_base64(lz_string.compress_to_base64(s)))
+
+    def test_url_decoded_plus(self):
+        compressed = lz_string.compress_to_encoded_uri_component(hex_text)
+        self.assertIn('+', compressed)
+        self.assertEqual(hex_text, lz_string.decompress_from_encoded_uri_component(compressed.replace('+', ' ')))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            lz_string.decompress_from_encoded_uri_component('a/b')
+        with self.assertRaises(ValueError):
+            lz_string.decompress_from_encoded_uri_component(lz_string.compress_to_encoded_uri_component(hex_text)[:50])
+
+    def test_encoders(self):
+        mzs, intensities = [100.5, 200.25, 300.0], [1.0, 2.0, 3.0]
+        compressed = SpectrumCompressorF32LzstringUri.compress(mzs, intensities)
+        self.assertEqual((mzs, intensities), SpectrumCompressorF32LzstringUri.decompress(compressed))
+        # binary payloads go through as one character per byte
+        compressor = BaseCompressor(spectrum_compressor_binary, brotli_compressor, lzstring_encoder)
+        self.assertEqual((mzs, intensities), compressor.decompress(compressor.compress(mzs, intensities)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import base64
+import io
+import unittest
+import zlib
+
+import numpy as np
+
+from msms_compression import SpectrumCompressorB85
+from msms_compression.pipeline import read_mgf, read_mzml, write_mgf, compress_spectra, decompress_spectra, \
+    write_records, read_records
+
+MGF = """MASS=Monoisotopic
+BEGIN IONS
+TITLE=spectrum 1
+PEPMASS=500.25
+CHARGE=2+
+SCANS=1
+300.5 10.0
+100.25 20.0
+200.0 30.5
+END IONS
+
+BEGIN IONS
+TITLE=spectrum 2
+PEPMASS=600.5
+END IONS
+"""
+
+
+def _binary_array(values, accession, dtype):
+    data = base64.b64encode(zlib.compress(np.asarray(values, dtype=dtype).tobytes())).decode()
+    precision = 'MS:1000523' if dtype == '<f8' else 'MS:1000521'
+    return f"""<binaryDataArray encodedLength="{len(data)}">
+        <cvParam cvRef="MS" accession="{precision}" name="float"/>
+        <cvParam cvRef="MS" accession="MS:1000574" name="zlib compression"/>
+        <cvParam cvRef="MS" accession="{accession}" name="array"/>
+        <binary>{data}</binary>
+      </binaryDataArray>"""
+
+
+MZML = f"""<?xml version="1.0" encoding="utf-8"?>
+<mzML xmlns="http://psi.hupo.org/ms/mzml" version="1.1.0">
+  <run id="run">
+    <spectrumList count="1">
+      <spectrum index="0" id="controllerType=0 controllerNumber=1 scan=17" defaultArrayLength="3">
+        <cvParam cvRef="MS" accession="MS:1000511" name="ms level" value="2"/>
+        <scanList count="1"><scan>
+          <cvParam cvRef="MS" accession="MS:1000016" name="scan start time" value="1.5" unitName="minute"/>
+        </scan></scanList>
+        <precursorList count="1"><precursor><selectedIonList count="1"><selectedIon>
+          <cvParam cvRef="MS" accession="MS:1000744" name="selected ion m/z" value="445.12"/>
+          <cvParam cvRef="MS" accession="MS:1000041" name="charge state" value="3"/>
+        </selectedIon></selectedIonList></precursor></precursorList>
+        <binaryDataArrayList count="2">
+          {_binary_array([100.5, 200.25, 150.0], 'MS:1000514', '<f8')}
+          {_binary_array([1.0, 2.0, 3.0], 'MS:1000515', '<f4')}
+        </binaryDataArrayList>
+      </spectrum>
+    </spectrumList>
+  </run>
+</mzML>
+"""
+
+
+class TestPipeline(unittest.TestCase):
+    def test_read_mgf(self):
+        spectra = list(read_mgf(io.StringIO(MGF)))
+        self.assertEqual(2, len(spectra))
+        self.assertEqual({'TITLE': 'spectrum 1', 'PEPMASS': '500.25', 'CHARGE': '2+', 'SCANS': '1'},
+                         spectra[0].params)
+        self.assertEqual([100.25, 200.0, 300.5], spectra[0].mzs.tolist())
+        self.assertEqual([20.0, 30.5, 10.0], spectra[0].intensities.tolist())
+        self.assertEqual(0, len(spectra[1].mzs))
+
+    def test_read_mzml(self):
+        spectrum, = read_mzml(io.BytesIO(MZML.encode()))
+        self.assertEqual('17', spectrum.params['SCANS'])
+        self.assertEqual('445.12', spectrum.params['PEPMASS'])
+        self.assertEqual('3+', spectrum.params['CHARGE'])
+        self.assertEqual(90.0, float(spectrum.params['RTINSECONDS']))
+        self.assertEqual([100.5, 150.0, 200.25], spectrum.mzs.tolist())
+        self.assertEqual([1.0, 3.0, 2.0], spectrum.intensities.tolist())
+
+    def test_round_trip(self):
+        records = io.StringIO()
+        write_records(compress_spectra(read_mgf(io.StringIO(MGF)), SpectrumCompressorB85), records)
+        records.seek(0)
+
+        mgf = io.StringIO()
+        write_mgf(decompress_spectra(read_records(records), SpectrumCompressorB85), mgf)
+        mgf.seek(0)
+
+        for expected, spectrum in zip(read_mgf(io.StringIO(MGF)), read_mgf(mgf)):
+            self.assertEqual(expected.params, spectrum.params)
+            self.assertEqual(expected.mzs.tolist(), spectrum.mzs.tolist())
+            self.assertEqual(expected.intensities.tolist(), spectrum.intensities.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
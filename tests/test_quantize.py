@@ -0,0 +1,99 @@
+import math
+import random
+import unittest
+
+import numpy as np
+
+from msms_compression import utils, SpectrumCompressorF32Lossy, SpectrumCompressorStringLossy, \
+    SpectrumCompressorI32, SpectrumCompressorBinaryLossy
+from msms_compression.np_utils import pack_bits, unpack_bits
+from msms_compression.quantize import quantize, dequantize, quantization_error, bits_for_error, lossy_encode_hex, \
+    lossy_decode_hex, lossy_encode_binary, lossy_decode_binary
+
+random.seed(0)
+mz_values = sorted(round(random.uniform(100, 2000), 4) for _ in range(200))
+intensity_values = [round(random.lognormvariate(8, 2), 1) + 1 for _ in range(200)]
+log_intensities = np.log(intensity_values)
+
+
+def max_relative_error(expected, actual):
+    expected, actual = np.asarray(expected), np.asarray(actual)
+    return float(np.max(np.abs(actual - expected) / expected))
+
+
+class TestQuantize(unittest.TestCase):
+    def test_error_bound(self):
+        for bits in range(4, 17):
+            lo, hi, codes = quantize(log_intensities, bits)
+            self.assertLessEqual(int(codes.max()), 2 ** bits - 1)
+            step = (hi - lo) / (2 ** bits - 1)
+            self.assertLessEqual(quantization_error(log_intensities, bits), step / 2 + 1e-6)
+            np.testing.assert_allclose(dequantize(codes, lo, hi, bits), log_intensities, atol=step / 2 + 1e-6)
+
+    def test_bits_for_error(self):
+        bits = bits_for_error(log_intensities, 0.01)
+        self.assertLessEqual(quantization_error(log_intensities, bits), 0.01)
+        self.assertGreater(quantization_error(log_intensities, bits - 1), 0.01)
+        self.assertEqual(16, bits_for_error(log_intensities, 1e-4, (4, 8, 12, 16)))
+        with self.assertRaises(ValueError):
+            bits_for_error(log_intensities, 1e-9)
+
+    def test_constant_values(self):
+        for s in (lossy_encode_hex([2.5] * 4), utils.hex_encode_lossy([2.5] * 4)):
+            self.assertEqual([2.5] * 4, lossy_decode_hex(s).tolist())
+
+    def test_hex_matches_utils_layout(self):
+        # 8 bit payloads keep the layout of utils.hex_encode_lossy and decode with either implementation
+        s = lossy_encode_hex(log_intensities, 8)
+        self.assertEqual(len(utils.hex_encode_lossy(list(log_intensities))), len(s))
+        np.testing.assert_allclose(list(utils.hex_decode_lossy(s)), lossy_decode_hex(s, 8))
+        # bit depth matches the output width
+        self.assertEqual(16 + 3 * len(log_intensities), len(lossy_encode_hex(log_intensities, 12)))
+
+    def test_pack_bits(self):
+        for bits in range(1, 17):
+            vals = np.random.default_rng(bits).integers(0, 2 ** bits, size=37)
+            b = pack_bits(vals, bits)
+            self.assertEqual((37 * bits + 7) // 8, len(b))
+            self.assertEqual(vals.tolist(), unpack_bits(b, 37, bits)[0].tolist())
+
+    def test_binary(self):
+        for bits in (4, 7, 8, 13, 16):
+            b = lossy_encode_binary(log_intensities, bits)
+            vals, size = lossy_decode_binary(b, len(log_intensities), 0, bits)
+            self.assertEqual(len(b), size)
+            self.assertLessEqual(np.abs(vals - log_intensities).max(), quantization_error(log_intensities, bits) + 1e-9)
+
+
+class TestLossyCompressors(unittest.TestCase):
+    def test_max_error(self):
+        for compressor in (SpectrumCompressorF32Lossy(2, max_error=0.005), SpectrumCompressorStringLossy(2, 1, 0.005),
+                           SpectrumCompressorBinaryLossy(max_error=0.005)):
+            mzs, intensities = compressor.decompress(compressor.compress(mz_values, intensity_values))
+            self.assertEqual(len(mz_values), len(mzs))
+            self.assertLessEqual(max_relative_error(intensity_values, intensities), 0.005)
+
+    def test_bit_depths(self):
+        errors = []
+        for n_bits in (1, 2, 3, 4):
+            compressor = SpectrumCompressorF32Lossy(n_bits)
+            _, intensities = compressor.decompress(compressor.compress(mz_values, intensity_values))
+            errors.append(max_relative_error(intensity_values, intensities))
+        self.assertEqual(sorted(errors, reverse=True), errors)
+        self.assertLess(errors[2], math.expm1(np.ptp(log_intensities) / 4095))
+
+        sizes = [len(SpectrumCompressorBinaryLossy(bits).compress(mz_values, intensity_values)) for bits in (4, 8, 16)]
+        self.assertEqual([100, 200], [sizes[1] - sizes[0], sizes[2] - sizes[1]])
+
+    def test_constant_intensities(self):
+        for compressor in (SpectrumCompressorF32Lossy(2), SpectrumCompressorI32(2, 1), SpectrumCompressorBinaryLossy()):
+            _, intensities = compressor.decompress(compressor.compress([100.0, 200.0], [5.0, 5.0]))
+            np.testing.assert_allclose([5.0, 5.0], intensities, rtol=1e-6)
+
+    def test_non_positive_intensities(self):
+        with self.assertRaises(ValueError):
+            SpectrumCompressorF32Lossy(2).compress([100.0, 200.0], [5.0, 0.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import random
+import unittest
+
+from msms_compression import utils, np_utils
+
+random.seed(42)
+mz_values = sorted(random.random() * 2000 for _ in range(500))
+int_values = [random.randint(0, 2 ** 32 - 1) for _ in range(500)]
+
+
+class TestNumpyUtils(unittest.TestCase):
+    def test_delta_encode_float_matches_utils(self):
+        for mzs in (mz_values, mz_values[:1], [0.0] + mz_values, [100.0] * 5, mz_values[::-1]):
+            s = utils.delta_encode_single_string_float(mzs)
+            self.assertEqual(s, np_utils.delta_encode_single_string_float(mzs))
+            self.assertEqual(list(utils.delta_decode_single_string_float(s)),
+                             np_utils.delta_decode_single_string_float(s).tolist())
+
+    def test_delta_encode_int_matches_utils(self):
+        s = utils.delta_encode_single_string_int(int_values)
+        self.assertEqual(s, np_utils.delta_encode_single_string_int(int_values))
+        self.assertEqual(int_values, np_utils.delta_decode_single_string_int(s).tolist())
+
+    def test_hex_encode_matches_utils(self):
+        s = utils.hex_encode(mz_values)
+        self.assertEqual(s, np_utils.hex_encode(mz_values))
+        self.assertEqual(list(utils.hex_decode(s)), np_utils.hex_decode(s).tolist())
+
+    def test_varint(self):
+        self.assertEqual(b'\xac\x02', np_utils.varint_encode([300]))
+        for vals in (int_values, [0, 127, 128, 2 ** 32 - 1], []):
+            b = np_utils.varint_encode(vals)
+            decoded, size = np_utils.varint_decode(b + b'\x01', len(vals))
+            self.assertEqual(vals, decoded.tolist())
+            self.assertEqual(len(b), size)
+        with self.assertRaises(ValueError):
+            np_utils.varint_decode(b'\x80\x80', 1)
+
+    def test_frame_of_reference(self):
+        deltas = [random.randint(0, 500) for _ in range(300)] + [0] * 64 + [2 ** 32 - 1]
+        for block_size in (1, 16, 128):
+            b = np_utils.for_encode(deltas, block_size)
+            vals, size = np_utils.for_decode(b'\xff' + b, len(deltas), 1, block_size)
+            self.assertEqual(deltas, vals.tolist())
+            self.assertEqual(len(b), size)
+
+
+class TestStreamingDecoders(unittest.TestCase):
+    def test_delta_decode_is_lazy(self):
+        s = utils.delta_encode_single_string_float(mz_values)
+        decoder = utils.delta_decode_single_string_float(s)
+        self.assertEqual(next(decoder), np_utils.delta_decode_single_string_float(s)[0])
+        self.assertEqual(len(list(decoder)), len(mz_values) - 1)
+
+    def test_delta_decode_two_strings(self):
+        hex_delta_str, leading_zero_str = utils._delta_encode(mz_values, utils._float_to_hex)
+        decoded = list(utils._delta_decode(hex_delta_str, leading_zero_str, utils._hex_to_float))
+        self.assertEqual(decoded, list(utils.delta_decode_single_string_float(
+            utils.delta_encode_single_string_float(mz_values))))
+
+    def test_decode_indexes(self):
+        indexes = [0, 1, 255, 4096, 65535]
+        self.assertEqual(indexes, list(utils._decode_indexes(utils._encode_indexes(indexes))))
+
+
+if __name__ == '__main__':
+    unittest.main()